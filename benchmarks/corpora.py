@@ -0,0 +1,54 @@
+"""Synthetic documents for the benchmarks."""
+from typing import Callable, Iterator
+
+from push_api_clientpy import DocumentBuilder, GroupSecurityIdentityBuilder, UserSecurityIdentityBuilder
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore".split()
+
+
+def text(size: int, seed: int) -> str:
+    words = []
+    length = 0
+    i = seed
+    while length < size:
+        word = WORDS[i % len(WORDS)]
+        words.append(word)
+        length += len(word) + 1
+        i += 7
+    return " ".join(words)[:size]
+
+
+def small(i: int) -> DocumentBuilder:
+    return DocumentBuilder(f"https://my.site.com/small/{i}", f"Small document {i}").withData(text(200, i))
+
+
+def large(i: int) -> DocumentBuilder:
+    return DocumentBuilder(f"https://my.site.com/large/{i}", f"Large document {i}") \
+        .withData(text(100_000, i)).withDate("2021-03-04T10:20:30Z").withAuthor("bob")
+
+
+def permissions(i: int) -> DocumentBuilder:
+    users = UserSecurityIdentityBuilder([f"user{(i + j) % 500}@my.site.com" for j in range(50)])
+    groups = GroupSecurityIdentityBuilder([f"group{(i + j) % 20}" for j in range(5)], "my provider")
+    return small(i).withAllowedPermissions(users).withAllowedPermissions(groups) \
+        .withDeniedPermissions(UserSecurityIdentityBuilder(f"user{i % 500}@other.site.com"))
+
+
+def metadata(i: int) -> DocumentBuilder:
+    values = {f"field{j}": text(40, i + j) for j in range(50)}
+    values["tags"] = [f"tag{(i + j) % 100}" for j in range(20)]
+    values["size"] = i
+    return small(i).withMetadata(values).withModifiedDate(1614853230000 + i)
+
+
+CORPORA: dict[str, Callable[[int], DocumentBuilder]] = {
+    "small": small,
+    "large": large,
+    "permissions": permissions,
+    "metadata": metadata,
+}
+
+
+def corpus(name: str, count: int) -> Iterator[DocumentBuilder]:
+    build = CORPORA[name]
+    return (build(i) for i in range(count))
@@ -0,0 +1,35 @@
+"""Measure the memory held by a large in-memory batch of DocumentBuilder.
+
+Usage: python benchmarks/documentmemory.py [number_of_documents]
+"""
+import sys
+import tracemalloc
+
+from push_api_clientpy import DocumentBuilder, GroupSecurityIdentityBuilder
+
+
+def buildBatch(count: int, withPermissions: bool):
+    group = GroupSecurityIdentityBuilder("everyone", "my provider")
+    batch = []
+    for i in range(count):
+        docBuilder = DocumentBuilder(f"https://my.document.uri?ref={i}", f"Document {i}").withData("some words")
+        if withPermissions:
+            docBuilder.withAllowedPermissions(group)
+        batch.append(docBuilder)
+    return batch
+
+
+def measure(count: int, withPermissions: bool) -> float:
+    tracemalloc.start()
+    batch = buildBatch(count, withPermissions)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del batch
+    return current / count
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{count} documents")
+    print(f"  without permissions: {measure(count, False):.0f} bytes/document")
+    print(f"  with permissions:    {measure(count, True):.0f} bytes/document")
@@ -0,0 +1,67 @@
+"""Measure the cold import time of the package, as paid by every cold start of a serverless function.
+
+Every import runs in a fresh interpreter; the median of the runs is reported along with the heavy modules it loaded.
+
+Usage: python benchmarks/importtime.py [--runs 20] [--json results.json]
+"""
+from dataclasses import asdict, dataclass
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = {
+    "package": "import push_api_clientpy",
+    "DocumentBuilder": "from push_api_clientpy import DocumentBuilder",
+    "Source": "from push_api_clientpy import Source",
+    "AsyncSource": "from push_api_clientpy import AsyncSource",
+}
+HEAVY_MODULES = ("requests", "urllib3", "httpx", "dateutil.parser", "importlib.metadata", "http.server", "sqlite3")
+
+_MEASURE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+print(" ".join(module for module in {heavy!r} if module in sys.modules))
+"""
+
+
+@dataclass
+class Result:
+    name: str
+    milliseconds: float
+    heavy_modules: list
+
+
+def measure(name: str, runs: int) -> Result:
+    code = _MEASURE.format(statement=STATEMENTS[name], heavy=HEAVY_MODULES)
+    timings = []
+    for _ in range(runs):
+        seconds, modules = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout.split("\n", 1)
+        timings.append(float(seconds) * 1000)
+    return Result(name, statistics.median(timings), modules.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--import", dest="names", choices=STATEMENTS, action="append", help="default: every import")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--json", help="also write the results to this file, to compare releases")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'import':<16} {'median ms':>10}  heavy modules loaded")
+    for name in args.names or STATEMENTS:
+        result = measure(name, args.runs)
+        results.append(result)
+        print(f"{name:<16} {result.milliseconds:>10.1f}  {' '.join(result.heavy_modules)}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
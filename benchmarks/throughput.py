@@ -0,0 +1,116 @@
+"""Measure documents/sec, bytes/sec and peak RSS of marshaling, serializing and pushing synthetic corpora.
+
+Pushes go to a PushAPIEmulator, a local stand-in for the Push API that can add latency and throttle requests.
+Every measurement runs in a fresh process, so that peak RSS is not inherited from the previous one.
+
+Usage: python benchmarks/throughput.py [--corpus small] [--count 1000] [--latency 0.01] [--throttle-rate 0.05] [--json results.json]
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+from corpora import CORPORA, corpus
+from push_api_clientpy import BatchOptions, EndpointOptions, PushAPIEmulator, Source
+
+DEFAULT_COUNTS = {"small": 20_000, "large": 500, "permissions": 5_000, "metadata": 5_000}
+OPERATIONS = ("marshal", "serialize", "push")
+
+
+@dataclass
+class Result:
+    operation: str
+    corpus: str
+    documents: int
+    bytes: int
+    seconds: float
+    peak_rss_mb: float
+
+    @property
+    def documentsPerSecond(self) -> float:
+        return self.documents / self.seconds
+
+    @property
+    def megabytesPerSecond(self) -> float:
+        return self.bytes / self.seconds / 1024 / 1024
+
+
+def peakRSS() -> float:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return float("nan")
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+
+
+def marshal(corpusName: str, count: int) -> Result:
+    documents = list(corpus(corpusName, count))
+    start = time.perf_counter()
+    for doc in documents:
+        doc.marshal()
+    seconds = time.perf_counter() - start
+    return Result("marshal", corpusName, count, 0, seconds, peakRSS())
+
+
+def serialize(corpusName: str, count: int) -> Result:
+    documents = list(corpus(corpusName, count))
+    start = time.perf_counter()
+    size = sum(len(doc.serialize()) for doc in documents)
+    seconds = time.perf_counter() - start
+    return Result("serialize", corpusName, count, size, seconds, peakRSS())
+
+
+def push(corpusName: str, count: int, latency: float, throttleRate: float, maxInFlight: int) -> Result:
+    with PushAPIEmulator(latency=latency, throttle_rate=throttleRate, retry_after=0.05) as emulator:
+        source = Source("my_api_key", "my_org",
+                        batch_options=BatchOptions(max_file_container_size=5 * 1024 * 1024, max_in_flight=maxInFlight),
+                        endpoint_options=EndpointOptions(platform_url=emulator.url, api_url=emulator.url))
+
+        start = time.perf_counter()
+        source.streamBatchUpdate("my_source", corpus(corpusName, count))
+        seconds = time.perf_counter() - start
+        source.close()
+        return Result("push", corpusName, count, emulator.uploaded_bytes, seconds, peakRSS())
+
+
+def run(operation: str, corpusName: str, count: int, args: argparse.Namespace) -> Result:
+    # A new process for every measurement, started from scratch
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        if operation == "push":
+            return executor.submit(push, corpusName, count, args.latency, args.throttle_rate, args.max_in_flight).result()
+        return executor.submit(globals()[operation], corpusName, count).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", choices=CORPORA, action="append", help="default: every corpus")
+    parser.add_argument("--operation", choices=OPERATIONS, action="append", help="default: every operation")
+    parser.add_argument("--count", type=int, help="documents per corpus, default depends on the corpus")
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds added to every request of the server")
+    parser.add_argument("--throttle-rate", type=float, default=0.05, help="share of Push API requests throttled with a 429")
+    parser.add_argument("--max-in-flight", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file, to compare releases")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'operation':<10} {'corpus':<12} {'documents':>10} {'docs/s':>10} {'MB/s':>8} {'peak RSS MB':>12}")
+    for corpusName in args.corpus or CORPORA:
+        for operation in args.operation or OPERATIONS:
+            result = run(operation, corpusName, args.count or DEFAULT_COUNTS[corpusName], args)
+            results.append(result)
+            megabytesPerSecond = "" if operation == "marshal" else f"{result.megabytesPerSecond:.1f}"
+            print(f"{operation:<10} {corpusName:<12} {result.documents:>10} {result.documentsPerSecond:>10.0f} "
+                  f"{megabytesPerSecond:>8} {result.peak_rss_mb:>12.1f}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,105 @@
-import sys
-
-if sys.version_info[:2] >= (3, 8):
-    # TODO: Import directly (no need for conditional) when `python_requires = >= 3.8`
-    from importlib.metadata import PackageNotFoundError, version  # pragma: no cover
-else:
-    from importlib_metadata import PackageNotFoundError, version  # pragma: no cover
-
-try:
-    # Change here if project is renamed and does not equal the package name
-    dist_name = "coveo-push-api-client.py"
-    __version__ = version(dist_name)
-except PackageNotFoundError:  # pragma: no cover
-    __version__ = "unknown"
-finally:
-    del version, PackageNotFoundError
-
-from .document import *
-from .documentbuilder import *
-from .source import *
-from .platformclient import *
-from .securityidentitybuilder import *
+from typing import TYPE_CHECKING
+
+# Submodules are imported on first use of one of their names (PEP 562), so that e.g.
+# importing DocumentBuilder does not load requests, httpx or http.server.
+_EXPORTS = {
+    "dates": ("DATE_CACHE_SIZE", "EPOCH_MILLISECONDS_THRESHOLD", "normalizeDate"),
+    "document": (
+        "MetadataValue", "CompressionType", "SecurityIdentityType", "SecurityIdentity",
+        "Permission", "CompressedBinaryData", "Document",
+    ),
+    "emulator": ("PushAPIEmulator",),
+    "documentbuilder": (
+        "PERMANENT_ID_CACHE_SIZE", "Error", "generatePermanentId",
+        "generatePermanentIds", "DocumentBuilder",
+    ),
+    "source": (
+        "BatchUpdate", "BatchChunkError", "nextOrderingId", "Source", "RebuildSession",
+    ),
+    "spool": ("SpoolOptions", "Spool"),
+    "chunker": (
+        "DEFAULT_MAX_FILE_CONTAINER_SIZE", "MARSHAL_GROUP_SIZE", "MarshalExecutor",
+        "DOCUMENT_SECTIONS", "SECURITY_IDENTITY_SECTIONS", "BatchOptions", "BatchChunk",
+        "ChunkReader", "BatchChunker",
+    ),
+    "compression": (
+        "AutomaticCompressionType", "DEFAULT_COMPRESSION_THRESHOLD",
+        "DEFAULT_COMPRESSION_WORKERS", "CompressionOptions", "compress",
+        "compressDocument",
+    ),
+    "fingerprint": ("FINGERPRINT_GROUP_SIZE", "fingerprint", "FingerprintStore"),
+    "serializer": (
+        "FRAGMENT_CACHE_SIZE", "toJSONBytes", "serializeDocument", "marshalDocument",
+        "marshalPermission", "marshalSecurityIdentity",
+    ),
+    "ratelimiter": (
+        "DEFAULT_MAX_RATE", "DEFAULT_MIN_RATE", "RateLimitOptions", "RateLimiter",
+        "parseRetryAfter",
+    ),
+    "asyncplatformclient": ("DEFAULT_MAX_CONCURRENCY", "AsyncPlatformClient"),
+    "asyncsource": ("AsyncSource",),
+    "platformclient": (
+        "SourceVisibility", "SourceStatus", "Environment", "ApiKey", "Region",
+        "DEFAULT_RETRY_AFTER", "DEFAULT_MAX_RETRIES", "DEFAULT_TIME_BUDGET",
+        "DEFAULT_BACKOFF_MAX", "DEFAULT_POOL_CONNECTIONS", "DEFAULT_POOL_MAXSIZE",
+        "DEFAULT_TRANSIENT_RETRIES", "DEFAULT_TRANSIENT_STATUSES", "IdentityModel",
+        "AliasMapping", "SecurityIdentityModelBase", "SecurityIdentityModel",
+        "SecurityIdentityAliasModel", "SecurityIdentityDelete",
+        "SecurityIdentityDeleteOptions", "SecurityIdentityBatchConfig", "FileContainer",
+        "BatchDelete", "BatchUpdateDocuments", "BackoffOptions", "backoffTime",
+        "RetryPolicy", "NO_RETRY", "RetryOptions", "ConnectionOptions",
+        "EndpointOptions", "clientVersion", "PlatformClient",
+    ),
+    "securityidentitybuilder": (
+        "IDENTITY_CACHE_SIZE", "internSecurityIdentity", "SecurityIdentityBuilder",
+        "AnySecurityIdentityBuilder", "UserSecurityIdentityBuilder",
+        "GroupSecurityIdentityBuilder", "VirtualGroupSecurityIdentityBuilder",
+    ),
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+__all__ = [*_MODULES]
+_SUBMODULES = (*_EXPORTS, "pipeline")
+
+# Imported now: the fingerprint function shares the name of its module, which would
+# replace it once imported
+from .fingerprint import fingerprint
+
+
+def __getattr__(name: str):
+    from importlib import import_module
+
+    if name == "__version__":
+        # Imported here only: platformclient loads requests
+        from .platformclient import clientVersion
+
+        value = clientVersion()
+    elif name in _MODULES:
+        value = getattr(import_module(f".{_MODULES[name]}", __name__), name)
+    elif name in _SUBMODULES:
+        return import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), "__version__", *_MODULES})
+
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .dates import *
+    from .document import *
+    from .emulator import *
+    from .documentbuilder import *
+    from .source import *
+    from .spool import *
+    from .chunker import *
+    from .compression import *
+    from .fingerprint import *
+    from .serializer import *
+    from .ratelimiter import *
+    from .asyncplatformclient import *
+    from .asyncsource import *
+    from .platformclient import *
+    from .securityidentitybuilder import *
@@ -0,0 +1,396 @@
+from .platformclient import (
+    ApiKey,
+    BackoffOptions,
+    BatchUpdateDocuments,
+    EndpointOptions,
+    FileContainer,
+    RetryOptions,
+    RetryPolicy,
+    SecurityIdentityAliasModel,
+    SecurityIdentityBatchConfig,
+    SecurityIdentityDelete,
+    SecurityIdentityDeleteOptions,
+    SecurityIdentityModel,
+    SourceStatus,
+    SourceVisibility,
+    backoffTime,
+    clientVersion,
+)
+from .ratelimiter import RateLimiter, RateLimitOptions, parseRetryAfter
+from .serializer import toJSONBytes
+from dataclasses import asdict
+from typing import Optional
+import asyncio
+import time
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+DEFAULT_MAX_CONCURRENCY = 10
+
+
+class AsyncPlatformClient:
+    """Asyncio counterpart of PlatformClient, built on a pooled httpx.AsyncClient.
+
+    Throttled requests and transient failures are retried, and requests are rate
+    limited when rate_limit_options is passed, the same way as PlatformClient. At
+    most max_concurrency requests are sent at the same time.
+    """
+
+    def __init__(
+        self,
+        apikey: ApiKey,
+        organizationid: str,
+        backoff_options: BackoffOptions = BackoffOptions(),
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        client: Optional["httpx.AsyncClient"] = None,
+        endpoint_options: EndpointOptions = EndpointOptions(),
+        rate_limit_options: Optional[RateLimitOptions] = None,
+        retry_options: RetryOptions = RetryOptions(),
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        if httpx is None:
+            raise ImportError(
+                "AsyncPlatformClient requires httpx: "
+                "pip install coveo-push-api-client.py[async]"
+            )
+        self.apikey = apikey
+        self.organizationid = organizationid
+        self.backoff_options = backoff_options
+        self.max_concurrency = max_concurrency
+        self.endpoint_options = endpoint_options
+        self.retry_options = retry_options
+        # Same as PlatformClient: only shared when the caller passes the same limiter
+        # to several clients, and disabled without options nor limiter
+        if rate_limiter is None and rate_limit_options is not None:
+            rate_limiter = RateLimiter(rate_limit_options)
+        self.rate_limiter = rate_limiter
+        self.__pushURL = (
+            f'{endpoint_options.apiURL()}/push/v1/organizations/{organizationid}'
+        )
+        self.__sourceURL = (
+            f'{endpoint_options.platformURL()}/rest/organizations/{organizationid}'
+            '/sources'
+        )
+        # Only close clients this client created: a client passed by the caller may
+        # be shared
+        self.__ownsClient = client is None
+        self.client = client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            )
+        )
+        self.version = clientVersion()
+        self.__staticHeaders = (
+            self.__contentTypeApplicationJSONHeader() | self.__userAgentHeader()
+        )
+        self.__fixedHeaders = (
+            None
+            if callable(apikey)
+            else self.__authorizationHeader() | self.__staticHeaders
+        )
+        self.__semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.__ownsClient:
+            await self.client.aclose()
+
+    async def createSource(self, name: str, sourceVisibility: SourceVisibility):
+        data = {
+            "sourceType": "PUSH",
+            "pushEnabled": True,
+            "name": name,
+            "sourceVisibility": sourceVisibility,
+        }
+        url = self.__sourceURL
+        return await self.__request(
+            "POST",
+            url,
+            self.retry_options.create_source,
+            json=data,
+            headers=self.__headers(),
+        )
+
+    async def createOrUpdateSecurityIdentity(
+        self, securityProviderId: str, securityIdentityModel: SecurityIdentityModel
+    ):
+        url = f'{self.__baseProviderURL(securityProviderId)}/permissions'
+        return await self.__request(
+            "PUT",
+            url,
+            self.retry_options.other,
+            json=securityIdentityModel.toJSON(),
+            headers=self.__headers(),
+        )
+
+    async def createOrUpdateSecurityIdentityAlias(
+        self,
+        securityProviderId: str,
+        securityIdentityAlias: SecurityIdentityAliasModel,
+    ):
+        url = f'{self.__baseProviderURL(securityProviderId)}/mappings'
+        return await self.__request(
+            "PUT",
+            url,
+            self.retry_options.other,
+            json=securityIdentityAlias.toJSON(),
+            headers=self.__headers(),
+        )
+
+    async def deleteSecurityIdentity(
+        self, securityProviderId: str, securityIdentityToDelete: SecurityIdentityDelete
+    ):
+        url = f'{self.__baseProviderURL(securityProviderId)}/permissions'
+        return await self.__request(
+            "DELETE",
+            url,
+            self.retry_options.other,
+            json=securityIdentityToDelete.toJSON(),
+            headers=self.__headers(),
+        )
+
+    async def deleteOldSecurityIdentities(
+        self, securityProviderId: str, batchDelete: SecurityIdentityDeleteOptions
+    ):
+        url = f'{self.__baseProviderURL(securityProviderId)}/permissions/olderthan'
+        queryParams = {
+            "orderingId": batchDelete.OrderingID,
+            "queueDelay": batchDelete.QueueDelay,
+        }
+        return await self.__request(
+            "DELETE",
+            url,
+            self.retry_options.other,
+            params=queryParams,
+            headers=self.__headers(),
+        )
+
+    async def manageSecurityIdentities(
+        self, securityProviderId: str, batchConfig: SecurityIdentityBatchConfig
+    ):
+        url = f'{self.__baseProviderURL(securityProviderId)}/permissions/batch'
+        queryParams = {
+            "fileId": batchConfig.FileID,
+            "orderingId": batchConfig.OrderingID,
+        }
+        return await self.__request(
+            "PUT",
+            url,
+            self.retry_options.other,
+            params=queryParams,
+            headers=self.__headers(),
+        )
+
+    async def updateSourceStatus(self, sourceId: str, status: SourceStatus):
+        url = f'{self.__pushURL}/sources/{sourceId}/status'
+        queryParams = {"statusType": status}
+        return await self.__request(
+            "POST",
+            url,
+            self.retry_options.other,
+            params=queryParams,
+            headers=self.__headers(),
+        )
+
+    async def pushDocument(self, sourceId: str, doc, orderingId: Optional[int] = None):
+        url = f'{self.__pushURL}/sources/{sourceId}/documents'
+        queryParams = {"documentId": doc["documentId"]}
+        if orderingId is not None:
+            queryParams["orderingId"] = orderingId
+        # Serialized in a worker thread to keep the event loop responsive
+        content = await asyncio.to_thread(toJSONBytes, doc)
+        return await self.__request(
+            "PUT",
+            url,
+            self.retry_options.documents,
+            headers=self.__headers(),
+            content=content,
+            params=queryParams,
+        )
+
+    async def deleteDocument(
+        self,
+        sourceId: str,
+        documentId: str,
+        deleteChildren: bool,
+        orderingId: Optional[int] = None,
+    ):
+        url = f'{self.__pushURL}/sources/{sourceId}/documents'
+        queryParams = {
+            "deleteChildren": str(deleteChildren).lower(),
+            "documentId": documentId,
+        }
+        if orderingId is not None:
+            queryParams["orderingId"] = orderingId
+        return await self.__request(
+            "DELETE",
+            url,
+            self.retry_options.documents,
+            headers=self.__headers(),
+            params=queryParams,
+        )
+
+    async def deleteOlderThan(
+        self, sourceId: str, orderingId: int, queueDelay: Optional[int] = None
+    ):
+        url = f'{self.__pushURL}/sources/{sourceId}/documents/olderthan'
+        queryParams = {"orderingId": orderingId}
+        if queueDelay is not None:
+            queryParams["queueDelay"] = queueDelay
+        return await self.__request(
+            "DELETE",
+            url,
+            self.retry_options.documents,
+            headers=self.__headers(),
+            params=queryParams,
+        )
+
+    async def createFileContainer(self):
+        url = f'{self.__pushURL}/files'
+        return await self.__request(
+            "POST", url, self.retry_options.other, headers=self.__headers()
+        )
+
+    async def uploadContentToFileContainer(
+        self, fileContainer: FileContainer, content: BatchUpdateDocuments
+    ):
+        url = fileContainer.uploadUri
+        return await self.__request(
+            "PUT",
+            url,
+            self.retry_options.file_container_upload,
+            rateLimited=False,
+            json=asdict(content),
+            headers=fileContainer.requiredHeaders,
+        )
+
+    async def uploadRawContentToFileContainer(
+        self, fileContainer: FileContainer, content: bytes
+    ):
+        url = fileContainer.uploadUri
+        return await self.__request(
+            "PUT",
+            url,
+            self.retry_options.file_container_upload,
+            rateLimited=False,
+            content=content,
+            headers=fileContainer.requiredHeaders,
+        )
+
+    async def pushFileContainerContent(
+        self,
+        sourceId: str,
+        fileContainer: FileContainer,
+        orderingId: Optional[int] = None,
+    ):
+        url = f'{self.__pushURL}/sources/{sourceId}/documents/batch'
+        queryParams = {"fileId": fileContainer.fileId}
+        if orderingId is not None:
+            queryParams["orderingId"] = orderingId
+        return await self.__request(
+            "PUT",
+            url,
+            self.retry_options.file_container_push,
+            params=queryParams,
+            headers=self.__headers(),
+        )
+
+    async def __request(
+        self,
+        method: str,
+        url: str,
+        policy: RetryPolicy,
+        rateLimited: bool = True,
+        **kwargs,
+    ):
+        # Same retries as PlatformClient.__send, waiting with asyncio.sleep
+        if self.__semaphore is None:
+            # Created lazily so that it is bound to the running event loop
+            self.__semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self.__semaphore:
+            deadline = time.monotonic() + self.backoff_options.time_budget
+            throttledRetries = 0
+            transientRetries = 0
+            limiter = self.rate_limiter if rateLimited else None
+            while True:
+                if limiter is not None:
+                    wait = limiter.reserve()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                except (httpx.NetworkError, httpx.TimeoutException):
+                    transientRetries += 1
+                    delay = policy.delay(transientRetries)
+                    if (
+                        not policy.connection_errors
+                        or transientRetries > policy.max_retries
+                        or time.monotonic() + delay > deadline
+                    ):
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+
+                if response.status_code == 429 and rateLimited:
+                    retryAfter = parseRetryAfter(response.headers.get('Retry-After'))
+                    if limiter is not None:
+                        limiter.onThrottle(retryAfter)
+                    throttledRetries += 1
+                    delay = (
+                        retryAfter
+                        if retryAfter is not None
+                        else backoffTime(self.backoff_options, throttledRetries)
+                    )
+                    if (
+                        throttledRetries > self.backoff_options.max_retries
+                        or time.monotonic() + delay > deadline
+                    ):
+                        return response
+                    # The limiter waits for Retry-After before sending the next
+                    # request
+                    if retryAfter is None or limiter is None:
+                        await asyncio.sleep(delay)
+                    continue
+
+                if response.status_code in policy.statuses:
+                    transientRetries += 1
+                    delay = policy.delay(transientRetries)
+                    if (
+                        transientRetries > policy.max_retries
+                        or time.monotonic() + delay > deadline
+                    ):
+                        return response
+                    await asyncio.sleep(delay)
+                    continue
+
+                if limiter is not None:
+                    limiter.onSuccess()
+                return response
+
+    def __baseProviderURL(self, providerId: str):
+        return f'{self.__pushURL}/providers/{providerId}'
+
+    def __headers(self):
+        if self.__fixedHeaders is not None:
+            return self.__fixedHeaders
+        return self.__authorizationHeader() | self.__staticHeaders
+
+    def __authorizationHeader(self):
+        apikey = self.apikey() if callable(self.apikey) else self.apikey
+        return {"Authorization": f'Bearer {apikey}'}
+
+    def __contentTypeApplicationJSONHeader(self):
+        return {'Content-Type': 'application/json', 'Accept': 'application/json'}
+
+    def __userAgentHeader(self):
+        return {'User-Agent': f'CoveoSDKPython/{self.version}'}
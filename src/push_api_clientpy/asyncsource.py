@@ -0,0 +1,321 @@
+from .asyncplatformclient import AsyncPlatformClient, DEFAULT_MAX_CONCURRENCY
+from .chunker import BatchChunk, BatchChunker, BatchOptions
+from .compression import CompressionOptions, compressDocument
+from .documentbuilder import DocumentBuilder
+from .platformclient import (
+    ApiKey,
+    BackoffOptions,
+    BatchDelete,
+    EndpointOptions,
+    FileContainer,
+    RetryOptions,
+    SecurityIdentityAliasModel,
+    SecurityIdentityBatchConfig,
+    SecurityIdentityDelete,
+    SecurityIdentityDeleteOptions,
+    SecurityIdentityModel,
+    SourceVisibility,
+)
+from .ratelimiter import RateLimiter, RateLimitOptions
+from .serializer import toJSONBytes
+from .source import BatchChunkError, BatchUpdate
+from collections import deque
+from dataclasses import asdict
+from functools import partial
+from typing import Awaitable, Callable, Iterable, Optional
+import asyncio
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+class AsyncSource:
+    def __init__(
+        self,
+        apikey: ApiKey,
+        organizationid: str,
+        backoff_options: BackoffOptions = BackoffOptions(),
+        batch_options: BatchOptions = BatchOptions(),
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        compression_options: Optional[CompressionOptions] = None,
+        endpoint_options: EndpointOptions = EndpointOptions(),
+        rate_limit_options: Optional[RateLimitOptions] = None,
+        retry_options: RetryOptions = RetryOptions(),
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.client = AsyncPlatformClient(
+            apikey,
+            organizationid,
+            backoff_options,
+            max_concurrency,
+            endpoint_options=endpoint_options,
+            rate_limit_options=rate_limit_options,
+            retry_options=retry_options,
+            rate_limiter=rate_limiter,
+        )
+        self.batch_options = batch_options
+        self.compression_options = compression_options
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def create(self, name: str, visibility: SourceVisibility):
+        return await self.client.createSource(name, visibility)
+
+    async def createOrUpdateSecurityIdentity(
+        self, securityProviderId: str, securityIdentityModel: SecurityIdentityModel
+    ):
+        return await self.client.createOrUpdateSecurityIdentity(
+            securityProviderId, securityIdentityModel
+        )
+
+    async def createOrUpdateSecurityIdentityAlias(
+        self,
+        securityProviderId: str,
+        securityIdentityAlias: SecurityIdentityAliasModel,
+    ):
+        return await self.client.createOrUpdateSecurityIdentityAlias(
+            securityProviderId, securityIdentityAlias
+        )
+
+    async def deleteSecurityIdentity(
+        self, securityProviderId: str, securityIdentityToDelete: SecurityIdentityDelete
+    ):
+        return await self.client.deleteSecurityIdentity(
+            securityProviderId, securityIdentityToDelete
+        )
+
+    async def deleteOldSecurityIdentities(
+        self, securityProviderId: str, batchDelete: SecurityIdentityDeleteOptions
+    ):
+        return await self.client.deleteOldSecurityIdentities(
+            securityProviderId, batchDelete
+        )
+
+    async def manageSecurityIdentities(
+        self, securityProviderId: str, batchConfig: SecurityIdentityBatchConfig
+    ):
+        return await self.client.manageSecurityIdentities(
+            securityProviderId, batchConfig
+        )
+
+    async def addOrUpdateDocument(
+        self,
+        sourceId: str,
+        docBuilder: DocumentBuilder,
+        orderingId: Optional[int] = None,
+    ):
+        # Keep the event loop responsive while large documents are marshaled and
+        # compressed
+        doc = await asyncio.to_thread(self.__marshal, docBuilder)
+        return await self.client.pushDocument(sourceId, doc, orderingId)
+
+    async def deleteDocument(
+        self,
+        sourceId: str,
+        documentId: str,
+        deleteChildren: bool,
+        orderingId: Optional[int] = None,
+    ):
+        return await self.client.deleteDocument(
+            sourceId, documentId, deleteChildren, orderingId
+        )
+
+    async def deleteDocuments(
+        self,
+        sourceId: str,
+        documentIds: Iterable[str],
+        deleteChildren: bool = False,
+        orderingId: Optional[int] = None,
+    ):
+        """Delete many documents through file containers instead of one request per
+        document."""
+        deletes = (
+            BatchDelete(documentId, deleteChildren) for documentId in documentIds
+        )
+        return await self.streamBatchUpdate(
+            sourceId, delete=deletes, orderingId=orderingId
+        )
+
+    async def deleteOlderThan(
+        self, sourceId: str, orderingId: int, queueDelay: Optional[int] = None
+    ):
+        """Delete every document of the source that was last pushed with an ordering
+        id older than orderingId."""
+        return await self.client.deleteOlderThan(sourceId, orderingId, queueDelay)
+
+    async def batchUpdateDocuments(
+        self, sourceId: str, batch: BatchUpdate, orderingId: Optional[int] = None
+    ):
+        """Same as Source.batchUpdateDocuments: returns the last push response, and
+        raises a BatchChunkError when a file container cannot be pushed."""
+        responses = await self.streamBatchUpdate(
+            sourceId, batch.addOrUpdate, batch.delete, orderingId
+        )
+        if responses:
+            return responses[-1]
+        chunk = BatchChunker(self.batch_options.max_file_container_size).emptyChunk()
+        return await self.__pushChunk(
+            sourceId, chunk, self.__uploadChunk(chunk), orderingId
+        )
+
+    async def streamBatchUpdate(
+        self,
+        sourceId: str,
+        addOrUpdate: Iterable[DocumentBuilder] = (),
+        delete: Iterable[BatchDelete] = (),
+        orderingId: Optional[int] = None,
+    ):
+        """Same as Source.streamBatchUpdate: up to BatchOptions.max_in_flight file
+        containers are uploaded concurrently, and pushed one at a time, in order.
+
+        Documents are marshaled, serialized and compressed in a worker thread. Like
+        Source.streamBatchUpdate, a file container that cannot be created, uploaded or
+        pushed raises a BatchChunkError recording where the update stopped, and no
+        later file container is pushed.
+        """
+        chunker = BatchChunker(self.batch_options.max_file_container_size)
+        documents = map(self.__serialize, addOrUpdate)
+        deletes = map(lambda batchDelete: toJSONBytes(asdict(batchDelete)), delete)
+        chunks = chunker.chunks(documents, deletes)
+
+        responses = []
+        # (chunk, upload task), oldest first
+        uploads = deque()
+        maxInFlight = max(1, self.batch_options.max_in_flight)
+        try:
+            while True:
+                while len(uploads) < maxInFlight:
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                    if chunk is None:
+                        break
+                    upload = asyncio.ensure_future(self.__uploadChunk(chunk))
+                    uploads.append((chunk, upload))
+                if not uploads:
+                    return responses
+                chunk, upload = uploads.popleft()
+                try:
+                    responses.append(
+                        await self.__pushChunk(sourceId, chunk, upload, orderingId)
+                    )
+                except BatchChunkError as error:
+                    error.index = len(responses)
+                    error.responses = responses
+                    error.pending = await self.__unpushed(uploads, error.index + 1)
+                    error.remaining = chunks
+                    raise
+        finally:
+            for chunk, upload in uploads:
+                upload.cancel()
+
+    def __marshal(self, docBuilder: DocumentBuilder):
+        return self.__compress(docBuilder.marshal())
+
+    def __serialize(self, docBuilder: DocumentBuilder):
+        # Without a transform, the bytes cached by the builder are reused
+        if self.compression_options is None:
+            return docBuilder.serialize()
+        return docBuilder.serialize(
+            partial(compressDocument, options=self.compression_options)
+        )
+
+    def __compress(self, doc: dict):
+        if self.compression_options is None:
+            return doc
+        return compressDocument(doc, self.compression_options)
+
+    async def __pushChunk(
+        self,
+        sourceId: str,
+        chunk: BatchChunk,
+        upload: Awaitable[FileContainer],
+        orderingId: Optional[int],
+    ):
+        fileContainer = await upload
+        return await self.__step(
+            'push file container',
+            chunk,
+            fileContainer,
+            True,
+            lambda: self.client.pushFileContainerContent(
+                sourceId, fileContainer, orderingId
+            ),
+        )
+
+    async def __unpushed(self, uploads: Iterable[tuple], index: int):
+        # Waits for the uploads in flight, so that none of their failures is lost
+        unpushed = []
+        for chunk, upload in uploads:
+            try:
+                error = BatchChunkError(
+                    "Not pushed: an earlier file container failed",
+                    chunk,
+                    await upload,
+                    True,
+                )
+            except BatchChunkError as failure:
+                error = failure
+            error.index = index + len(unpushed)
+            unpushed.append(error)
+        return unpushed
+
+    async def __uploadChunk(self, chunk: BatchChunk) -> FileContainer:
+        resFileContainer = (
+            await self.__step(
+                'create file container',
+                chunk,
+                None,
+                False,
+                lambda: self.client.createFileContainer(),
+            )
+        ).json()
+
+        fileContainer = FileContainer(
+            uploadUri=resFileContainer.get('uploadUri'),
+            fileId=resFileContainer.get('fileId'),
+            requiredHeaders=resFileContainer.get('requiredHeaders'))
+
+        await self.__step(
+            'upload file container',
+            chunk,
+            fileContainer,
+            False,
+            lambda: self.client.uploadRawContentToFileContainer(
+                fileContainer, chunk.payload
+            ),
+        )
+
+        return fileContainer
+
+    async def __step(
+        self,
+        name: str,
+        chunk: BatchChunk,
+        fileContainer: Optional[FileContainer],
+        uploaded: bool,
+        send: Callable[[], Awaitable["httpx.Response"]],
+    ):
+        # Same as Source.__step, for httpx responses
+        try:
+            response = await send()
+        except httpx.HTTPError as error:
+            raise BatchChunkError(
+                f'Unable to {name}: {error}', chunk, fileContainer, uploaded
+            ) from error
+        if not response.is_success:
+            raise BatchChunkError(
+                f'Unable to {name}: HTTP {response.status_code}',
+                chunk,
+                fileContainer,
+                uploaded,
+                response,
+            )
+        return response
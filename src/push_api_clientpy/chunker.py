@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Literal
+
+from .documentbuilder import Error
+
+# The Push API rejects file containers larger than 256 MB
+DEFAULT_MAX_FILE_CONTAINER_SIZE = 256 * 1024 * 1024
+
+
+# Documents sent to a marshaling worker at once, to amortize the cost of inter-process
+# communication
+MARSHAL_GROUP_SIZE = 256
+
+MarshalExecutor = Literal["process", "thread"]
+
+DOCUMENT_SECTIONS = ("addOrUpdate", "delete")
+SECURITY_IDENTITY_SECTIONS = ("members", "mappings", "deleted")
+
+
+@dataclass
+class BatchOptions:
+    max_file_container_size: int = DEFAULT_MAX_FILE_CONTAINER_SIZE
+    max_in_flight: int = 1
+    # Workers marshaling and serializing documents in parallel, 0 to marshal on the
+    # calling thread
+    marshal_workers: int = 0
+    marshal_executor: MarshalExecutor = "process"
+
+
+@dataclass
+class BatchChunk:
+    parts: list[bytes]
+    size: int
+    # Number of items in each section of the payload
+    counts: tuple[int, ...]
+
+    @property
+    def documentCount(self) -> int:
+        return self.counts[0]
+
+    @property
+    def deleteCount(self) -> int:
+        return self.counts[1]
+
+    @property
+    def payload(self) -> bytes:
+        return b''.join(self.parts)
+
+    def stream(self):
+        return ChunkReader(self.parts, self.size)
+
+
+class ChunkReader:
+    """File-like view over the parts of a chunk, so it can be uploaded without joining
+    them in memory first."""
+
+    def __init__(self, parts: list[bytes], size: int):
+        self.__parts = iter(parts)
+        self.__size = size
+        self.__current = memoryview(b'')
+
+    def __len__(self):
+        return self.__size
+
+    def read(self, size: int = -1):
+        if size is None or size < 0:
+            remaining = self.__current.tobytes() + b''.join(self.__parts)
+            self.__current = memoryview(b'')
+            return remaining
+        if not self.__current:
+            self.__current = memoryview(next(self.__parts, b''))
+        data = self.__current[:size]
+        self.__current = self.__current[size:]
+        return data.tobytes()
+
+
+class BatchChunker:
+    """Groups serialized items into JSON payloads that each fit in one file container.
+
+    Each payload is an object with one array per section, e.g.
+    {"addOrUpdate":[...],"delete":[...]} for documents.
+    """
+
+    def __init__(
+        self,
+        maxSize: int = DEFAULT_MAX_FILE_CONTAINER_SIZE,
+        sections: tuple[str, ...] = DOCUMENT_SECTIONS,
+    ):
+        self.maxSize = maxSize
+        self.__headers = [
+            (b'{"' if index == 0 else b'],"') + name.encode("utf-8") + b'":['
+            for index, name in enumerate(sections)
+        ]
+        self.__suffix = b']}'
+        self.__envelopeSize = sum(map(len, self.__headers)) + len(self.__suffix)
+        self.__sections: list[list[bytes]] = [[] for _ in sections]
+        self.__size = self.__envelopeSize
+
+    def chunks(self, *items: Iterable[bytes]) -> Iterator[BatchChunk]:
+        """Items of each section, in the order the sections were given."""
+        for section, sectionItems in zip(self.__sections, items):
+            for item in sectionItems:
+                yield from self.__add(item, section)
+        if any(self.__sections):
+            yield self.__flush()
+
+    def emptyChunk(self) -> BatchChunk:
+        """A payload in which every section is empty, e.g. for a batch without items."""
+        return BatchChunk(
+            parts=[*self.__headers, self.__suffix],
+            size=self.__envelopeSize,
+            counts=tuple(0 for _ in self.__sections))
+
+    def __add(self, item: bytes, section: list[bytes]):
+        itemSize = len(item) + (1 if section else 0)
+        if self.__envelopeSize + len(item) > self.maxSize:
+            raise Error(
+                self,
+                f'A single item of {len(item)} bytes exceeds the maximum file '
+                f'container size of {self.maxSize} bytes',
+            )
+        if self.__size + itemSize > self.maxSize:
+            yield self.__flush()
+            itemSize = len(item) + (1 if section else 0)
+        if section:
+            section.append(b',')
+        section.append(item)
+        self.__size += itemSize
+
+    def __flush(self):
+        parts = []
+        for header, section in zip(self.__headers, self.__sections):
+            parts.append(header)
+            parts.extend(section)
+        parts.append(self.__suffix)
+        chunk = BatchChunk(
+            parts=parts,
+            size=self.__size,
+            counts=tuple((len(section) + 1) // 2 for section in self.__sections))
+        for section in self.__sections:
+            section.clear()
+        self.__size = self.__envelopeSize
+        return chunk
@@ -0,0 +1,51 @@
+import base64
+import gzip
+import lzma
+import zlib
+from dataclasses import dataclass
+from typing import Literal
+
+AutomaticCompressionType = Literal["DEFLATE", "GZIP", "LZMA", "ZLIB"]
+DEFAULT_COMPRESSION_THRESHOLD = 4096
+DEFAULT_COMPRESSION_WORKERS = 4
+
+
+@dataclass
+class CompressionOptions:
+    compression_type: AutomaticCompressionType = "GZIP"
+    # Documents whose data is smaller than this many bytes are sent uncompressed
+    threshold: int = DEFAULT_COMPRESSION_THRESHOLD
+    # Threads compressing documents while a batch is being marshaled, 0 to compress on
+    # the calling thread
+    workers: int = DEFAULT_COMPRESSION_WORKERS
+
+
+def compress(data: bytes, compressionType: AutomaticCompressionType) -> bytes:
+    if compressionType == "GZIP":
+        return gzip.compress(data)
+    if compressionType == "ZLIB":
+        return zlib.compress(data)
+    if compressionType == "DEFLATE":
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    if compressionType == "LZMA":
+        return lzma.compress(data, format=lzma.FORMAT_ALONE)
+    raise ValueError(f'Unsupported compression type {compressionType}')
+
+
+def compressDocument(doc: dict, options: CompressionOptions) -> dict:
+    """Move the data of a marshaled document to compressedBinaryData when it is larger
+    than the threshold."""
+    data = doc.get("data")
+    if data is None:
+        return doc
+    encoded = data.encode("utf-8")
+    if len(encoded) < options.threshold:
+        return doc
+
+    compressed = {k: v for k, v in doc.items() if k != "data"}
+    compressed["compressedBinaryData"] = base64.b64encode(
+        compress(encoded, options.compression_type)
+    ).decode("ascii")
+    compressed["compressionType"] = options.compression_type
+    return compressed
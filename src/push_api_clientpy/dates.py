@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Union
+import re
+
+# Distinct date strings kept normalized, feeds often repeat the same dates
+DATE_CACHE_SIZE = 4096
+
+# Epochs above this are in milliseconds: in seconds, they would be after the year 5000
+EPOCH_MILLISECONDS_THRESHOLD = 100_000_000_000
+
+# ISO 8601 extended format, which covers RFC 3339. An offset is only allowed after a
+# time: dateutil rejects e.g. "2000-01-01Z".
+_ISO_8601 = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})"
+    r"(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?"
+    r"\s*(Z|z|[+-]\d{2}(?::?\d{2})?)?)?")
+
+
+def normalizeDate(
+    date: Union[str, int, float, datetime], format: Optional[str] = None
+) -> str:
+    """The date in ISO 8601 format.
+
+    Strings are parsed with format when given, as ISO 8601 when possible, and with
+    dateutil otherwise. Numbers are epochs in seconds, or in milliseconds when greater
+    than EPOCH_MILLISECONDS_THRESHOLD.
+    """
+    if type(date) is str:
+        return _normalizeDateString(date, format)
+    if type(date) is int or type(date) is float:
+        if abs(date) > EPOCH_MILLISECONDS_THRESHOLD:
+            date = date / 1000
+        return datetime.fromtimestamp(date).isoformat()
+    if isinstance(date, datetime):
+        return date.isoformat()
+    raise TypeError(f"Unsupported date type: {type(date).__name__}")
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _normalizeDateString(date: str, format: Optional[str]) -> str:
+    if format is not None:
+        return datetime.strptime(date, format).isoformat()
+    parsed = _parseISO8601(date.strip())
+    if parsed is None:
+        from dateutil.parser import parse
+        parsed = parse(date)
+    return parsed.isoformat()
+
+
+def _parseISO8601(date: str) -> Optional[datetime]:
+    match = _ISO_8601.fullmatch(date)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    tzinfo = None
+    if offset in ("Z", "z"):
+        tzinfo = timezone.utc
+    elif offset is not None:
+        digits = offset[1:].replace(":", "")
+        delta = timedelta(hours=int(digits[:2]), minutes=int(digits[2:] or 0))
+        tzinfo = timezone(-delta if offset[0] == "-" else delta)
+    try:
+        return datetime(
+            int(year), int(month), int(day),
+            int(hour or 0), int(minute or 0), int(second or 0),
+            int(fraction.ljust(6, "0")[:6]) if fraction else 0,
+            tzinfo,
+        )
+    except ValueError:
+        # e.g. a day out of range, left to dateutil so that errors stay the same
+        return None
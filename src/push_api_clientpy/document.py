@@ -1,17 +1,66 @@
-from dataclasses import dataclass, field
+from dataclasses import MISSING, dataclass, field, fields
+from functools import wraps
 from typing import Literal, Optional, Union
 
 MetadataValue = Union[str, list[str], int, list[int], float, list[float]]
 CompressionType = Literal["UNCOMPRESSED", "DEFLATE", "GZIP", "LZMA", "ZLIB"]
 SecurityIdentityType = Literal["USER", "GROUP", "VIRTUAL_GROUP", "UNKNOWN"]
 
-@dataclass
+
+def _slotted(cls):
+    """Recreate a dataclass with __slots__, like dataclass(slots=True) on Python 3.10+.
+
+    Slotted instances have no per-instance __dict__, which matters for batches of many
+    documents.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {k: v for k, v in cls.__dict__.items() if k not in names}
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+    namespace["__slots__"] = names
+    # The generated __init__ leaves fields with init=False to their class attribute,
+    # which the slots replace
+    defaults = tuple(
+        (f.name, f.default)
+        for f in fields(cls)
+        if not f.init and f.default is not MISSING
+    )
+    if defaults:
+        namespace["__init__"] = _initWithDefaults(cls.__init__, defaults)
+    # Pickling sets the state with object.__setattr__, which frozen instances require
+    namespace["__getstate__"] = _getState
+    namespace["__setstate__"] = _setState
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def _initWithDefaults(init, defaults):
+    @wraps(init)
+    def __init__(self, *args, **kwargs):
+        for name, value in defaults:
+            object.__setattr__(self, name, value)
+        init(self, *args, **kwargs)
+    return __init__
+
+
+def _getState(self):
+    return [getattr(self, name) for name in self.__slots__]
+
+
+def _setState(self, state):
+    for name, value in zip(self.__slots__, state):
+        object.__setattr__(self, name, value)
+
+
+# Frozen so that identical identities can be shared by every document referencing them
+@_slotted
+@dataclass(frozen=True)
 class SecurityIdentity:
     identity: str
     identityType: SecurityIdentityType
     securityProvider: str
 
 
+@_slotted
 @dataclass
 class Permission:
     allowedPermissions: list[SecurityIdentity] = field(init=False, default_factory=list)
@@ -19,14 +68,22 @@ class Permission:
     allowAnonymous: bool = field(init=False, default=True)
 
 
+@_slotted
 @dataclass
 class CompressedBinaryData:
     compressionType: CompressionType = field(default="UNCOMPRESSED")
     data: str = field(default="")
 
 
+@_slotted
 @dataclass
 class Document:
+    """A document to push.
+
+    metadata, permissions and compressedBinaryData are only allocated once the
+    DocumentBuilder sets them. A document without permissions is marshaled with a
+    single permission set that allows anonymous users.
+    """
     uri: str
     title: str
     clickableUri: Optional[str] = field(init=False, default="")
@@ -36,9 +93,9 @@ class Document:
     permanentId: Optional[str] = field(init=False, default="")
     parentId: Optional[str] = field(init=False, default="")
     data: Optional[str] = field(init=False, default="")
-    metadata: Optional[dict[str, MetadataValue]] = field(init=False, default_factory=dict)
-    permissions: Optional[list[Permission]] = field(init=False, default_factory=lambda: [Permission()])
+    metadata: Optional[dict[str, MetadataValue]] = field(init=False, default=None)
+    permissions: Optional[list[Permission]] = field(init=False, default=None)
     fileExtension: Optional[str] = field(init=False, default="")
-    compressedBinaryData: Optional[CompressedBinaryData] = field(init=False, default_factory=lambda: CompressedBinaryData())
-
-
+    compressedBinaryData: Optional[CompressedBinaryData] = field(
+        init=False, default=None
+    )
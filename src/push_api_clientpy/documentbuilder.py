@@ -1,64 +1,115 @@
 import base64
-from dataclasses import asdict
 from datetime import datetime
-from typing import Union, cast
+from functools import lru_cache
+from typing import Callable, Iterable, Optional, Union
 import hashlib
-from dateutil.parser import parse
-
-from .document import CompressionType, Document, MetadataValue, SecurityIdentity
+import math
+
+from .dates import normalizeDate
+from .document import (
+    CompressedBinaryData,
+    CompressionType,
+    Document,
+    MetadataValue,
+    Permission,
+    SecurityIdentity,
+)
 from .securityidentitybuilder import SecurityIdentityBuilder
+from .serializer import marshalDocument, serializeDocument
+
+
+# URIs whose generated permanent id is kept, so that documents pushed again are not
+# hashed again
+PERMANENT_ID_CACHE_SIZE = 65536
 
 
 class Error(Exception):
     pass
 
 
+@lru_cache(maxsize=PERMANENT_ID_CACHE_SIZE)
+def generatePermanentId(uri: str) -> str:
+    """The 60-character permanent id of a document that does not set one: MD5 and SHA-1
+    halves of its URI."""
+    utf8 = uri.encode('utf-8')
+    return hashlib.md5(utf8).hexdigest()[:30] + hashlib.sha1(utf8).hexdigest()[:30]
+
+
+def generatePermanentIds(uris: Iterable[str]) -> list[str]:
+    """The permanent ids of many URIs at once, in order."""
+    return list(map(generatePermanentId, uris))
+
+
 class DocumentBuilder:
+    """Builds a Document to push.
+
+    The marshaled document and its JSON serialization are computed once and cached
+    until a with* method changes the document. Changes made directly to the document
+    attribute are not tracked.
+    """
 
     def __init__(self, documentId: str, documentTitle: str):
         self.document = Document(documentId, documentTitle)
+        self.__marshaled: Optional[dict] = None
+        self.__serialized: Optional[bytes] = None
 
     def withData(self, data: str):
         self.document.data = data
+        self.__invalidate()
         return self
 
     def withCompressedBinaryData(self, data: str, compressionType: CompressionType):
-        self.document.compressedBinaryData.compressionType = compressionType
-        self.document.compressedBinaryData.data = data
+        self.document.compressedBinaryData = CompressedBinaryData(compressionType, data)
+        self.__invalidate()
         return self
 
-    def withDate(self, date: Union[str, int, datetime]):
-        self.document.date = self.__validateDateAndReturnValidDate(date)
+    def withDate(
+        self, date: Union[str, int, float, datetime], format: Optional[str] = None
+    ):
+        self.document.date = self.__validateDateAndReturnValidDate(date, format)
+        self.__invalidate()
         return self
 
-    def withModifiedDate(self, date: Union[str, int, datetime]):
-        self.document.modifiedDate = self.__validateDateAndReturnValidDate(date)
+    def withModifiedDate(
+        self, date: Union[str, int, float, datetime], format: Optional[str] = None
+    ):
+        self.document.modifiedDate = self.__validateDateAndReturnValidDate(date, format)
+        self.__invalidate()
         return self
 
     def withPermanentId(self, permanentId: str):
         self.document.permanentId = permanentId
+        self.__invalidate()
         return self
 
     def withFileExtension(self, extension: str):
         self.__validateFileExtension(extension)
         self.document.fileExtension = extension
+        self.__invalidate()
         return self
 
     def withParentId(self, parentId: str):
         self.document.parentId = parentId
+        self.__invalidate()
         return self
 
     def withClickableUri(self, clickURI: str):
         self.document.clickableUri = clickURI
+        self.__invalidate()
         return self
 
     def withAuthor(self, author: str):
         self.document.author = author
+        self.__invalidate()
         return self
 
     def withMetadataValue(self, key: str, value: MetadataValue):
         self.__validateReservedKeynames(key)
+        self.__validateFiniteNumbers(key, value)
+        if self.document.metadata is None:
+            self.document.metadata = {}
         self.document.metadata[key] = value
+        self.__invalidate()
         return self
 
     def withMetadata(self, metadata: dict[str,  MetadataValue]):
@@ -67,65 +118,69 @@ class DocumentBuilder:
         return self
 
     def withAllowedPermissions(self, allowed: SecurityIdentityBuilder):
-        self.__setPermissions(allowed, self.document.permissions[0].allowedPermissions)
+        self.__setPermissions(allowed, self.__permission().allowedPermissions)
+        self.__invalidate()
         return self
 
     def withDeniedPermissions(self, denied: SecurityIdentityBuilder):
-        self.__setPermissions(denied, self.document.permissions[0].deniedPermissions)
+        self.__setPermissions(denied, self.__permission().deniedPermissions)
+        self.__invalidate()
         return self
 
     def withAllowAnonymousUsers(self, allowAnonymous: bool):
-        self.document.permissions[0].allowAnonymous = allowAnonymous
+        self.__permission().allowAnonymous = allowAnonymous
+        self.__invalidate()
         return self
 
     def marshal(self):
+        """The document as a dict ready to be pushed, as a shallow copy of the cached
+        marshaled document."""
+        if self.__marshaled is None:
+            self.__prepare()
+            self.__marshaled = self.__cleanDocument()
+        return dict(self.__marshaled)
+
+    def serialize(self, transform: Optional[Callable[[dict], dict]] = None) -> bytes:
+        """The marshaled document as JSON bytes, optionally transformed first (e.g.
+        compressed).
+
+        Without a transform, the bytes are cached until the document changes.
+        """
+        if transform is not None:
+            self.__prepare()
+            return serializeDocument(self.document, transform)
+        if self.__serialized is None:
+            self.__prepare()
+            self.__serialized = serializeDocument(self.document)
+        return self.__serialized
+
+    def serializedSize(self) -> int:
+        """Length in bytes of the serialized document, as sent in a file container."""
+        return len(self.serialize())
+
+    def __prepare(self):
         self.__validateDataAndBinaryData()
         if self.document.permanentId == "":
             self.__generatePermanentId()
-        return self.__cleanDocument()
 
-    def __cleanDocument(self):
-        withoutEmptyValue = {k: v for k, v in asdict(
-            self.document).items() if v is not None and v != ""}
+    def __invalidate(self):
+        self.__marshaled = None
+        self.__serialized = None
 
-        for k, v in self.document.metadata.items():
-            withoutEmptyValue[k] = v
-        del withoutEmptyValue['metadata']
-
-        withoutEmptyValue['documentId'] = self.document.uri
-        del withoutEmptyValue['uri']
-
-        if self.document.compressedBinaryData.data != "":
-            withoutEmptyValue['compressedBinaryData'] = self.document.compressedBinaryData.data
-            withoutEmptyValue['compressionType'] = self.document.compressedBinaryData.compressionType
-        else:
-            del withoutEmptyValue['compressedBinaryData']
-
-        return withoutEmptyValue
+    def __cleanDocument(self):
+        return marshalDocument(self.document)
 
     def __generatePermanentId(self):
-        # generate a 60-character id
-        utf8 = self.document.uri.encode('utf-8')
-        md5 = hashlib.md5(utf8)
-        sha1 = hashlib.sha1(utf8)
-        self.document.permanentId = md5.hexdigest()[:30] + sha1.hexdigest()[:30]
-
-    def __validateDateAndReturnValidDate(self, date: Union[str, int, datetime]) -> str:
-        dateAsDatetime = datetime.now()
-
-        if type(date) is str:
-            dateAsDatetime = parse(str(date))
-            datetime.fromordinal
-        if type(date) is int:
-            dateAsDatetime = datetime.fromtimestamp(cast(int, date))
-        if type(date) is datetime:
-            dateAsDatetime = cast(datetime, date)
-
-        if type(dateAsDatetime) is not datetime:
+        self.document.permanentId = generatePermanentId(self.document.uri)
+
+    def __validateDateAndReturnValidDate(
+        self, date: Union[str, int, float, datetime], format: Optional[str] = None
+    ) -> str:
+        try:
+            return normalizeDate(date, format)
+        except TypeError:
             raise Error(self, "Unable to convert date to valid datetime", date)
 
-        return dateAsDatetime.isoformat()
-
     def __validateFileExtension(self, ext: str):
         if ext[0] != ".":
             raise Error(self, f'Extension {ext} should start with a leading .')
@@ -144,6 +199,13 @@ class DocumentBuilder:
                 raise Error(
                     self, f'Cannot use ${keyName} as a metadata key: It is a reserved key name. See https://docs.coveo.com/en/78/index-content/push-api-reference#json-document-reserved-key-names')
 
+    def __validateFiniteNumbers(self, key: str, value: MetadataValue):
+        # NaN and infinite floats are not valid JSON, and orjson would write them as
+        # null
+        values = value if isinstance(value, list) else [value]
+        if any(isinstance(item, float) and not math.isfinite(item) for item in values):
+            raise Error(self, f'Metadata {key} must be a finite number', value)
+
     def __setPermissions(self, securityIdentityBuilder: SecurityIdentityBuilder, permissionSection: list[SecurityIdentity]):
         identities = securityIdentityBuilder.build()
         if type(identities) is list:
@@ -151,6 +213,16 @@ class DocumentBuilder:
         else:
             permissionSection.append(identities)
 
+    def __permission(self) -> Permission:
+        if self.document.permissions is None:
+            self.document.permissions = [Permission()]
+        return self.document.permissions[0]
+
     def __validateDataAndBinaryData(self):
-        if self.document.data != "" and self.document.compressedBinaryData.data != "":
+        compressedBinaryData = self.document.compressedBinaryData
+        if (
+            self.document.data != ""
+            and compressedBinaryData is not None
+            and compressedBinaryData.data != ""
+        ):
             raise Error(self, 'Cannot set both data and binary data on the same document')
@@ -0,0 +1,363 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+
+class PushAPIEmulator(ThreadingHTTPServer):
+    """A local, in-memory stand-in for the Push API, to load test a connector or push
+    without the Coveo platform.
+
+    It emulates source creation, source status, file containers, document PUT and
+    DELETE, batch pushes and security identities, and keeps the resulting documents and
+    identities in memory. Latency can be added to every request, and requests can be
+    throttled with a 429 and a Retry-After header, either at random (throttle_rate) or
+    above a number of requests per second (max_requests_per_second).
+
+    Deletes only remove documents pushed with an orderingId that is not newer than
+    their own, and file containers can be pushed until they expire, file_container_ttl
+    seconds after their creation, like on the platform.
+
+    Point a client to it with
+    EndpointOptions(platform_url=emulator.url, api_url=emulator.url).
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_requests_per_second: Optional[float] = None,
+        retry_after: float = 1.0,
+        apikey: Optional[str] = None,
+        file_container_ttl: float = 3600.0,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.max_requests_per_second = max_requests_per_second
+        self.retry_after = retry_after
+        # When set, requests to the platform without this API key are rejected with a
+        # 401
+        self.apikey = apikey
+        self.file_container_ttl = file_container_ttl
+        self.lock = threading.Lock()
+        # Documents by source id and document id, with their orderingId
+        self.sources: dict[str, dict[str, dict]] = {}
+        self.statuses: dict[str, str] = {}
+        # Identities by provider id and identity name
+        self.identities: dict[str, dict[str, dict]] = {}
+        self.fileContainers: dict[str, Optional[bytes]] = {}
+        # time.monotonic() after which each file container is removed
+        self.fileContainerExpirations: dict[str, float] = {}
+        self.requests = 0
+        self.throttled = 0
+        self.uploaded_bytes = 0
+        self.__window: list[float] = []
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self.__thread = threading.Thread(
+            target=self.serve_forever,
+            args=(0.05,),
+            name="push-api-emulator",
+            daemon=True,
+        )
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def shouldThrottle(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            now = time.monotonic()
+            throttled = random.random() < self.throttle_rate
+            if self.max_requests_per_second is not None:
+                self.__window = [sent for sent in self.__window if sent > now - 1]
+                throttled = (
+                    throttled or len(self.__window) >= self.max_requests_per_second
+                )
+                if not throttled:
+                    self.__window.append(now)
+            if throttled:
+                self.throttled += 1
+            return throttled
+
+    def expireFileContainers(self):
+        now = time.monotonic()
+        for fileId in [
+            fileId
+            for fileId, expiration in self.fileContainerExpirations.items()
+            if expiration <= now
+        ]:
+            del self.fileContainerExpirations[fileId]
+            self.fileContainers.pop(fileId, None)
+
+
+_ORGANIZATION = r"/organizations/(?P<org>[^/]+)"
+_PUSH = r"/push/v1" + _ORGANIZATION
+_SOURCE = _PUSH + r"/sources/(?P<sourceId>[^/]+)"
+_PROVIDER = _PUSH + r"/providers/(?P<providerId>[^/]+)"
+_ROUTES = [
+    ("POST", re.compile(r"/rest" + _ORGANIZATION + r"/sources"), "createSource"),
+    ("POST", re.compile(_PUSH + r"/files"), "createFileContainer"),
+    ("PUT", re.compile(r"/upload/(?P<fileId>[^/]+)"), "upload"),
+    ("POST", re.compile(_SOURCE + r"/status"), "updateSourceStatus"),
+    ("PUT", re.compile(_SOURCE + r"/documents/batch"), "pushFileContainer"),
+    ("DELETE", re.compile(_SOURCE + r"/documents/olderthan"), "deleteOlderThan"),
+    ("PUT", re.compile(_SOURCE + r"/documents"), "pushDocument"),
+    ("DELETE", re.compile(_SOURCE + r"/documents"), "deleteDocument"),
+    ("PUT", re.compile(_PROVIDER + r"/permissions/batch"), "manageSecurityIdentities"),
+    (
+        "DELETE",
+        re.compile(_PROVIDER + r"/permissions/olderthan"),
+        "deleteOldSecurityIdentities",
+    ),
+    (
+        "PUT",
+        re.compile(_PROVIDER + r"/(?:permissions|mappings)"),
+        "createOrUpdateSecurityIdentity",
+    ),
+    ("DELETE", re.compile(_PROVIDER + r"/permissions"), "deleteSecurityIdentity"),
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: PushAPIEmulator
+
+    def do_POST(self):
+        self.__handle()
+
+    def do_PUT(self):
+        self.__handle()
+
+    def do_DELETE(self):
+        self.__handle()
+
+    def log_message(self, format, *args):
+        pass
+
+    def __handle(self):
+        url = urlsplit(self.path)
+        self.body = self.__readBody()
+        self.query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        for method, pattern, name in _ROUTES:
+            match = pattern.fullmatch(url.path)
+            if method == self.command and match:
+                break
+        else:
+            return self.__respond(
+                404, {"message": f"No route for {self.command} {url.path}"}
+            )
+
+        upload = name == "upload"
+        if (
+            not upload
+            and server.apikey is not None
+            and self.headers.get("Authorization") != f"Bearer {server.apikey}"
+        ):
+            return self.__respond(401, {"message": "Invalid API key"})
+        # Uploads go to the file storage, which is not throttled like the platform
+        if not upload and server.shouldThrottle():
+            return self.__respond(
+                429,
+                {"message": "Too many requests"},
+                {"Retry-After": str(server.retry_after)},
+            )
+
+        with server.lock:
+            server.expireFileContainers()
+            status, body = getattr(self, f"_{name}")(**match.groupdict())
+        self.__respond(status, body)
+
+    def _createSource(self, org: str):
+        sourceId = f"{org}-{uuid.uuid4().hex[:20]}"
+        self.server.sources[sourceId] = {}
+        return 201, {"id": sourceId, **json.loads(self.body)}
+
+    def _createFileContainer(self, org: str):
+        fileId = str(uuid.uuid4())
+        self.server.fileContainers[fileId] = None
+        self.server.fileContainerExpirations[fileId] = (
+            time.monotonic() + self.server.file_container_ttl
+        )
+        return 201, {
+            "uploadUri": f"{self.server.url}/upload/{fileId}",
+            "fileId": fileId,
+            "requiredHeaders": {
+                "Content-Type": "application/octet-stream",
+                "x-amz-server-side-encryption": "AES256",
+            },
+        }
+
+    def _upload(self, fileId: str):
+        if fileId not in self.server.fileContainers:
+            return 404, {"message": "Unknown file container"}
+        self.server.fileContainers[fileId] = self.body
+        self.server.uploaded_bytes += len(self.body)
+        return 200, {}
+
+    def _updateSourceStatus(self, org: str, sourceId: str):
+        self.server.statuses[sourceId] = self.query.get("statusType", "")
+        return 201, {}
+
+    def _pushDocument(self, org: str, sourceId: str):
+        document = json.loads(self.body)
+        self.__documents(sourceId)[self.query["documentId"]] = {
+            **document,
+            "orderingId": self.__orderingId(),
+        }
+        return 202, {}
+
+    def _deleteDocument(self, org: str, sourceId: str):
+        deleteChildren = self.query.get("deleteChildren") == "true"
+        self.__deleteDocument(
+            sourceId, self.query["documentId"], deleteChildren, self.__orderingId()
+        )
+        return 202, {}
+
+    def _deleteOlderThan(self, org: str, sourceId: str):
+        documents = self.__documents(sourceId)
+        orderingId = int(self.query["orderingId"])
+        for documentId in [
+            documentId
+            for documentId, document in documents.items()
+            if document["orderingId"] < orderingId
+        ]:
+            del documents[documentId]
+        return 202, {}
+
+    def _pushFileContainer(self, org: str, sourceId: str):
+        content = self.__fileContainer()
+        if content is None:
+            return 404, {"message": "Unknown or empty file container"}
+        orderingId = self.__orderingId()
+        documents = self.__documents(sourceId)
+        for document in content.get("addOrUpdate", []):
+            documents[document["documentId"]] = {**document, "orderingId": orderingId}
+        for delete in content.get("delete", []):
+            self.__deleteDocument(
+                sourceId,
+                delete["documentId"],
+                delete.get("deleteChildren", False),
+                orderingId,
+            )
+        return 202, {}
+
+    def _createOrUpdateSecurityIdentity(self, org: str, providerId: str):
+        identity = json.loads(self.body)
+        self.__identities(providerId)[identity["identity"]["name"]] = {
+            **identity,
+            "orderingId": self.__orderingId(),
+        }
+        return 202, {}
+
+    def _deleteSecurityIdentity(self, org: str, providerId: str):
+        self.__identities(providerId).pop(
+            json.loads(self.body)["identity"]["name"], None
+        )
+        return 202, {}
+
+    def _deleteOldSecurityIdentities(self, org: str, providerId: str):
+        identities = self.__identities(providerId)
+        orderingId = int(self.query["orderingId"])
+        for name in [
+            name
+            for name, identity in identities.items()
+            if identity["orderingId"] < orderingId
+        ]:
+            del identities[name]
+        return 202, {}
+
+    def _manageSecurityIdentities(self, org: str, providerId: str):
+        content = self.__fileContainer()
+        if content is None:
+            return 404, {"message": "Unknown or empty file container"}
+        orderingId = self.__orderingId()
+        identities = self.__identities(providerId)
+        for identity in content.get("members", []) + content.get("mappings", []):
+            identities[identity["identity"]["name"]] = {
+                **identity,
+                "orderingId": orderingId,
+            }
+        for identity in content.get("deleted", []):
+            identities.pop(identity["identity"]["name"], None)
+        return 202, {}
+
+    def __documents(self, sourceId: str) -> dict[str, dict]:
+        return self.server.sources.setdefault(sourceId, {})
+
+    def __identities(self, providerId: str) -> dict[str, dict]:
+        return self.server.identities.setdefault(providerId, {})
+
+    def __deleteDocument(
+        self, sourceId: str, documentId: str, deleteChildren: bool, orderingId: int
+    ):
+        # Documents pushed with a newer orderingId than the delete are kept
+        documents = self.__documents(sourceId)
+        deleted = [documentId]
+        if deleteChildren:
+            deleted += [
+                childId
+                for childId, document in documents.items()
+                if document.get("parentId") == documentId
+            ]
+        for deletedId in deleted:
+            if (
+                deletedId in documents
+                and documents[deletedId]["orderingId"] <= orderingId
+            ):
+                del documents[deletedId]
+
+    def __fileContainer(self) -> Optional[dict]:
+        # Kept until it expires: the same file container can be pushed again
+        content = self.server.fileContainers.get(self.query.get("fileId", ""))
+        return json.loads(content) if content else None
+
+    def __orderingId(self) -> int:
+        return int(self.query.get("orderingId") or time.time() * 1000)
+
+    def __readBody(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                body += self.rfile.read(size + 2)[:size]
+                if size == 0:
+                    return body
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def __respond(self, status: int, body: dict, headers: Optional[dict] = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
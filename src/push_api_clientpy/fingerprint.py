@@ -0,0 +1,114 @@
+from typing import Iterable, Optional
+import hashlib
+import threading
+
+FINGERPRINT_GROUP_SIZE = 500
+
+
+def fingerprint(payload: bytes) -> bytes:
+    """Digest identifying the content of a serialized document."""
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class FingerprintStore:
+    """Fingerprints of the documents last pushed to each source, kept in a SQLite
+    database.
+
+    Used by Source to skip documents whose content did not change since they were last
+    pushed. Every call to Source.syncDocuments is a run: documents that are not seen
+    during a run are deleted from the source.
+
+    A store can be used from any thread, e.g. by the sender thread of a Spool: its
+    connection is shared and serialized by a lock.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        import sqlite3
+
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__connection:
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "sourceId TEXT NOT NULL, documentId TEXT NOT NULL, "
+                "fingerprint BLOB NOT NULL, lastSeen INTEGER NOT NULL, "
+                "PRIMARY KEY (sourceId, documentId))")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def beginRun(self, sourceId: str) -> int:
+        """A run number greater than the one of every document already recorded for
+        the source."""
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT COALESCE(MAX(lastSeen), 0) + 1 FROM fingerprints "
+                "WHERE sourceId = ?", (sourceId,)).fetchone()
+        return row[0]
+
+    def changed(
+        self,
+        sourceId: str,
+        fingerprints: list[tuple[str, bytes]],
+        run: Optional[int] = None,
+    ) -> list[bool]:
+        """Whether each (documentId, fingerprint) differs from the recorded one. Known
+        documents are marked as seen by run."""
+        known = {}
+        with self.__lock:
+            for start in range(0, len(fingerprints), FINGERPRINT_GROUP_SIZE):
+                group = fingerprints[start:start + FINGERPRINT_GROUP_SIZE]
+                documentIds = [documentId for documentId, _ in group]
+                placeholders = ",".join("?" * len(documentIds))
+                known.update(self.__connection.execute(
+                    "SELECT documentId, fingerprint FROM fingerprints "
+                    f"WHERE sourceId = ? AND documentId IN ({placeholders})",
+                    (sourceId, *documentIds)))
+
+            if run is not None:
+                with self.__connection:
+                    self.__connection.executemany(
+                        "UPDATE fingerprints SET lastSeen = ? "
+                        "WHERE sourceId = ? AND documentId = ?",
+                        [(run, sourceId, documentId)
+                         for documentId, _ in fingerprints if documentId in known])
+
+        return [known.get(documentId) != digest for documentId, digest in fingerprints]
+
+    def record(
+        self, sourceId: str, fingerprints: Iterable[tuple[str, bytes]], run: int = 0
+    ):
+        """Remember the fingerprints of documents that were pushed successfully."""
+        rows = [
+            (sourceId, documentId, digest, run) for documentId, digest in fingerprints
+        ]
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints "
+                "(sourceId, documentId, fingerprint, lastSeen) VALUES (?, ?, ?, ?)",
+                rows)
+
+    def stale(self, sourceId: str, run: int) -> list[str]:
+        """Documents recorded for the source that were not seen during run."""
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT documentId FROM fingerprints "
+                "WHERE sourceId = ? AND lastSeen < ? ORDER BY documentId",
+                (sourceId, run)).fetchall()
+        return [documentId for documentId, in rows]
+
+    def forget(self, sourceId: str, documentIds: Iterable[str]):
+        """Drop the fingerprints of deleted documents, so that they are pushed again if
+        they come back."""
+        rows = [(sourceId, documentId) for documentId in documentIds]
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "DELETE FROM fingerprints WHERE sourceId = ? AND documentId = ?", rows)
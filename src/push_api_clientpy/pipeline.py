@@ -0,0 +1,31 @@
+from collections import deque
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def mapInOrder(
+    executor: Executor, fn: Callable[[T], R], iterable: Iterable[T], maxInFlight: int
+) -> Iterator[R]:
+    """Like Executor.map, but consumes the iterable lazily and never has more than
+    maxInFlight calls pending.
+
+    Results are yielded in input order. The caller keeps producing the next item while
+    earlier ones are running.
+    """
+    inFlight = deque()
+    for item in iterable:
+        if len(inFlight) >= maxInFlight:
+            yield inFlight.popleft().result()
+        inFlight.append(executor.submit(fn, item))
+    while inFlight:
+        yield inFlight.popleft().result()
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(iterable)
+    while group := list(islice(iterator, size)):
+        yield group
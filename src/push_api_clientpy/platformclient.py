@@ -1,14 +1,30 @@
 from .document import Document, SecurityIdentityType
+from .ratelimiter import RateLimiter, RateLimitOptions, parseRetryAfter
+from .serializer import toJSONBytes
 from dataclasses import asdict, dataclass
-from typing import Literal
+from functools import lru_cache
+from typing import IO, Callable, Literal, Optional, Union
 import requests
 from requests.adapters import HTTPAdapter, Retry
-import json
 import importlib.metadata
+import random
+import time
 
 SourceVisibility = Literal["PRIVATE", "SECURED", "SHARED"]
+SourceStatus = Literal["REBUILD", "REFRESH", "INCREMENTAL", "IDLE"]
+Environment = Literal["prod", "dev", "stg", "hipaa"]
+# An API key, or a function returning the current API key so that keys can be rotated
+# without a new client
+ApiKey = Union[str, Callable[[], str]]
+Region = Literal["us", "eu", "au", "ca"]
 DEFAULT_RETRY_AFTER = 5
 DEFAULT_MAX_RETRIES = 50
+DEFAULT_TIME_BUDGET = 15 * 60
+DEFAULT_BACKOFF_MAX = 120
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 32
+DEFAULT_TRANSIENT_RETRIES = 5
+DEFAULT_TRANSIENT_STATUSES = (500, 502, 503, 504)
 
 
 @dataclass
@@ -111,22 +127,169 @@ class BatchUpdateDocuments:
 class BackoffOptions:
     retry_after: int = DEFAULT_RETRY_AFTER
     max_retries: int = DEFAULT_MAX_RETRIES
+    # Maximum time, in seconds, spent retrying a single operation
+    time_budget: float = DEFAULT_TIME_BUDGET
+
+
+def backoffTime(backoff_options: BackoffOptions, retries: int) -> float:
+    # Same schedule as urllib3's Retry: no wait on the first retry, then exponential
+    if retries <= 1:
+        return 0
+    return min(DEFAULT_BACKOFF_MAX, backoff_options.retry_after * (2 ** (retries - 1)))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How an operation is retried after a transient failure: a connection error or one
+    of the statuses."""
+    max_retries: int = DEFAULT_TRANSIENT_RETRIES
+    statuses: tuple[int, ...] = DEFAULT_TRANSIENT_STATUSES
+    connection_errors: bool = True
+    # Seconds; the n-th retry waits a random time up to backoff * 2^(n-1), capped at
+    # max_backoff
+    backoff: float = 1.0
+    max_backoff: float = 60.0
+
+    def delay(self, retries: int) -> float:
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * (2 ** (retries - 1)))
+        )
+
+
+NO_RETRY = RetryPolicy(max_retries=0)
+
+
+@dataclass
+class RetryOptions:
+    # Document PUT and DELETE are idempotent
+    documents: RetryPolicy = RetryPolicy()
+    file_container_upload: RetryPolicy = RetryPolicy()
+    file_container_push: RetryPolicy = RetryPolicy()
+    # Security identities and file container creation
+    other: RetryPolicy = RetryPolicy()
+    # Source creation is not idempotent: retrying could create duplicate sources
+    create_source: RetryPolicy = NO_RETRY
+
+
+@dataclass
+class ConnectionOptions:
+    # Number of hosts for which a connection pool is kept
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS
+    # Maximum number of connections kept open to a single host
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE
+    # Wait for a free connection instead of opening a throwaway one when a pool is
+    # exhausted
+    pool_block: bool = False
+    keep_alive: bool = True
+
+
+@dataclass
+class EndpointOptions:
+    """Where requests are sent: the Coveo platform of an environment and region, or
+    explicit base URLs."""
+    environment: Environment = "prod"
+    # Use the region of the organization to avoid cross-region latency on every request
+    region: Region = "us"
+    # Override the URLs derived from the environment and region, e.g. with the URL of a
+    # PushAPIEmulator
+    platform_url: Optional[str] = None
+    api_url: Optional[str] = None
+
+    def platformURL(self) -> str:
+        return self.platform_url or self.__coveoURL("platform")
+
+    def apiURL(self) -> str:
+        return self.api_url or self.__coveoURL("api")
+
+    def __coveoURL(self, host: str) -> str:
+        # e.g. https://platform.cloud.coveo.com, https://apidev-eu.cloud.coveo.com
+        environment = "" if self.environment == "prod" else self.environment
+        region = "" if self.region == "us" else f"-{self.region}"
+        return f"https://{host}{environment}{region}.cloud.coveo.com"
+
+
+@lru_cache(maxsize=None)
+def clientVersion() -> str:
+    """The version of this package, sent in the User-Agent. Looked up once per
+    process."""
+    try:
+        return importlib.metadata.version('coveo-push-api-client.py')
+    except importlib.metadata.PackageNotFoundError:  # pragma: no cover
+        return "unknown"
 
 
 class PlatformClient:
-    def __init__(self, apikey: str, organizationid: str, backoff_options: BackoffOptions = BackoffOptions(), session = requests.Session()):
+    def __init__(
+        self,
+        apikey: ApiKey,
+        organizationid: str,
+        backoff_options: BackoffOptions = BackoffOptions(),
+        session: Optional[requests.Session] = None,
+        connection_options: ConnectionOptions = ConnectionOptions(),
+        rate_limit_options: Optional[RateLimitOptions] = None,
+        retry_options: RetryOptions = RetryOptions(),
+        endpoint_options: EndpointOptions = EndpointOptions(),
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
         self.apikey = apikey
         self.organizationid = organizationid
         self.backoff_options = backoff_options
-
+        self.connection_options = connection_options
+        self.retry_options = retry_options
+        self.endpoint_options = endpoint_options
+        # Built once, rather than for every request
+        self.__pushURL = (
+            f'{endpoint_options.apiURL()}/push/v1/organizations/{organizationid}'
+        )
+        self.__sourceURL = (
+            f'{endpoint_options.platformURL()}/rest/organizations/{organizationid}'
+            '/sources'
+        )
+        # Only shared with the clients the caller passes the same limiter to. Without
+        # options nor limiter, requests are not delayed, and throttled requests are
+        # still retried.
+        if rate_limiter is None and rate_limit_options is not None:
+            rate_limiter = RateLimiter(rate_limit_options)
+        self.rate_limiter = rate_limiter
+
+        # Throttling, connection errors and error statuses are all retried per operation
+        # by __send, so the adapters do not retry. The Retry is not mounted: it is only
+        # kept for callers reading the backoff configuration from it.
         self.retries = Retry(total=self.backoff_options.max_retries,
-                        backoff_factor=self.backoff_options.retry_after,
-                        status_forcelist=[429],
-                        respect_retry_after_header=False
-                        )
-        session.mount('https://', HTTPAdapter(max_retries=self.retries))
-        self.session = session
-        self.version = importlib.metadata.version('coveo-push-api-client.py')
+                             backoff_factor=self.backoff_options.retry_after)
+        # Only close sessions this client created: a session passed by the caller may be
+        # shared
+        self.__ownsSession = session is None
+        self.session = session if session is not None else requests.Session()
+        adapter = HTTPAdapter(pool_connections=connection_options.pool_connections,
+                              pool_maxsize=connection_options.pool_maxsize,
+                              pool_block=connection_options.pool_block)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if not connection_options.keep_alive:
+            self.session.headers['Connection'] = 'close'
+        self.version = clientVersion()
+        # Built once; only the Authorization header is built for every request when the
+        # API key comes from a function. Not set on the session, which may be shared and
+        # also sends the uploads to the file container storage.
+        self.__staticHeaders = (
+            self.__contentTypeApplicationJSONHeader() | self.__userAgentHeader()
+        )
+        self.__fixedHeaders = (
+            None
+            if callable(apikey)
+            else self.__authorizationHeader() | self.__staticHeaders
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.__ownsSession:
+            self.session.close()
 
     def createSource(self, name: str, sourceVisibility: SourceVisibility):
         data = {
@@ -135,74 +298,274 @@ class PlatformClient:
             "name": name,
             "sourceVisibility": sourceVisibility
         }
-        url = self.__baseSourceURL()
-        return self.session.post(url, json=data, headers=self.__headers())
+        url = self.__sourceURL
+        return self.__send(
+            'POST',
+            url,
+            self.retry_options.create_source,
+            json=data,
+            headers=self.__headers(),
+        )
 
     def createOrUpdateSecurityIdentity(self, securityProviderId: str, securityIdentityModel: SecurityIdentityModel):
         url = f'{self.__baseProviderURL(securityProviderId)}/permissions'
-        return self.session.put(url, json=securityIdentityModel.toJSON(), headers=self.__headers())
+        return self.__send(
+            'PUT',
+            url,
+            self.retry_options.other,
+            json=securityIdentityModel.toJSON(),
+            headers=self.__headers(),
+        )
 
     def createOrUpdateSecurityIdentityAlias(self, securityProviderId: str, securityIdentityAlias: SecurityIdentityAliasModel):
         url = f'{self.__baseProviderURL(securityProviderId)}/mappings'
-        return self.session.put(url, json=securityIdentityAlias.toJSON(), headers=self.__headers())
+        return self.__send(
+            'PUT',
+            url,
+            self.retry_options.other,
+            json=securityIdentityAlias.toJSON(),
+            headers=self.__headers(),
+        )
 
     def deleteSecurityIdentity(self, securityProviderId: str,  securityIdentityToDelete: SecurityIdentityDelete):
         url = f'{self.__baseProviderURL(securityProviderId)}/permissions'
-        return self.session.delete(url, json=securityIdentityToDelete.toJSON(), headers=self.__headers())
+        return self.__send(
+            'DELETE',
+            url,
+            self.retry_options.other,
+            json=securityIdentityToDelete.toJSON(),
+            headers=self.__headers(),
+        )
 
     def deleteOldSecurityIdentities(self, securityProviderId: str, batchDelete: SecurityIdentityDeleteOptions):
         url = f'{self.__baseProviderURL(securityProviderId)}/permissions/olderthan'
         queryParams = {"orderingId": batchDelete.OrderingID,
                        "queueDelay": batchDelete.QueueDelay}
-        return self.session.delete(url, params=queryParams, headers=self.__headers())
+        return self.__send(
+            'DELETE',
+            url,
+            self.retry_options.other,
+            params=queryParams,
+            headers=self.__headers(),
+        )
 
     def manageSecurityIdentities(self, securityProviderId: str, batchConfig: SecurityIdentityBatchConfig):
         url = f'{self.__baseProviderURL(securityProviderId)}/permissions/batch'
         queryParams = {"fileId": batchConfig.FileID,
                        "orderingId": batchConfig.OrderingID}
-        return self.session.put(url, params=queryParams, headers=self.__headers())
-
-    def pushDocument(self, sourceId: str, doc):
-        url = f'{self.__basePushURL()}/sources/{sourceId}/documents'
-        queryParams = {"documentId": doc["documentId"]}
-        return self.session.put(url, headers=self.__headers(), data=json.dumps(doc), params=queryParams)
-
-    def deleteDocument(self, sourceId: str, documentId: str, deleteChildren: bool):
-        url = f'{self.__basePushURL()}/sources/{sourceId}/documents'
+        return self.__send(
+            'PUT',
+            url,
+            self.retry_options.other,
+            params=queryParams,
+            headers=self.__headers(),
+        )
+
+    def updateSourceStatus(self, sourceId: str, status: SourceStatus):
+        url = f'{self.__pushURL}/sources/{sourceId}/status'
+        queryParams = {"statusType": status}
+        return self.__send(
+            'POST',
+            url,
+            self.retry_options.other,
+            params=queryParams,
+            headers=self.__headers(),
+        )
+
+    def pushDocument(self, sourceId: str, doc, orderingId: Optional[int] = None):
+        return self.pushSerializedDocument(
+            sourceId, doc["documentId"], toJSONBytes(doc), orderingId
+        )
+
+    def pushSerializedDocument(
+        self,
+        sourceId: str,
+        documentId: str,
+        content: bytes,
+        orderingId: Optional[int] = None,
+    ):
+        """Same as pushDocument, for a document that is already serialized to JSON."""
+        url = f'{self.__pushURL}/sources/{sourceId}/documents'
+        queryParams = {"documentId": documentId}
+        if orderingId is not None:
+            queryParams["orderingId"] = orderingId
+        return self.__send(
+            'PUT',
+            url,
+            self.retry_options.documents,
+            headers=self.__headers(),
+            data=content,
+            params=queryParams,
+        )
+
+    def deleteDocument(
+        self,
+        sourceId: str,
+        documentId: str,
+        deleteChildren: bool,
+        orderingId: Optional[int] = None,
+    ):
+        url = f'{self.__pushURL}/sources/{sourceId}/documents'
         queryParams = {"deleteChildren": str(
             deleteChildren).lower(), "documentId": documentId}
-        return self.session.delete(url, headers=self.__headers(), params=queryParams)
+        if orderingId is not None:
+            queryParams["orderingId"] = orderingId
+        return self.__send(
+            'DELETE',
+            url,
+            self.retry_options.documents,
+            headers=self.__headers(),
+            params=queryParams,
+        )
+
+    def deleteOlderThan(
+        self, sourceId: str, orderingId: int, queueDelay: Optional[int] = None
+    ):
+        url = f'{self.__pushURL}/sources/{sourceId}/documents/olderthan'
+        queryParams = {"orderingId": orderingId}
+        if queueDelay is not None:
+            queryParams["queueDelay"] = queueDelay
+        return self.__send(
+            'DELETE',
+            url,
+            self.retry_options.documents,
+            headers=self.__headers(),
+            params=queryParams,
+        )
 
     def createFileContainer(self):
-        url = f'{self.__basePushURL()}/files'
-        return self.session.post(url, headers=self.__headers())
+        url = f'{self.__pushURL}/files'
+        return self.__send(
+            'POST', url, self.retry_options.other, headers=self.__headers()
+        )
 
     def uploadContentToFileContainer(self, fileContainer: FileContainer, content: BatchUpdateDocuments):
         url = fileContainer.uploadUri
-        return self.session.put(url, json=asdict(content), headers=fileContainer.requiredHeaders)
-
-    def pushFileContainerContent(self, sourceId: str, fileContainer: FileContainer):
-        url = f'{self.__basePushURL()}/sources/{sourceId}/documents/batch'
+        return self.__send(
+            'PUT',
+            url,
+            self.retry_options.file_container_upload,
+            rateLimited=False,
+            json=asdict(content),
+            headers=fileContainer.requiredHeaders,
+        )
+
+    def uploadRawContentToFileContainer(
+        self,
+        fileContainer: FileContainer,
+        content: Union[bytes, Callable[[], IO[bytes]]],
+    ):
+        """content is either bytes, or a function returning a new stream of the content
+        for every attempt."""
+        url = fileContainer.uploadUri
+        return self.__send(
+            'PUT',
+            url,
+            self.retry_options.file_container_upload,
+            rateLimited=False,
+            data=content,
+            headers=fileContainer.requiredHeaders,
+        )
+
+    def pushFileContainerContent(
+        self,
+        sourceId: str,
+        fileContainer: FileContainer,
+        orderingId: Optional[int] = None,
+    ):
+        url = f'{self.__pushURL}/sources/{sourceId}/documents/batch'
         queryParams = {"fileId": fileContainer.fileId}
-        return self.session.put(url=url, params=queryParams, headers=self.__headers())
-
-    def __basePushURL(self):
-        return f'https://api.cloud.coveo.com/push/v1/organizations/{self.organizationid}'
-
-    def __basePlatformURL(self):
-        return f'https://platform.cloud.coveo.com/rest/organizations/{self.organizationid}'
-
-    def __baseSourceURL(self):
-        return f'{self.__basePlatformURL()}/sources'
+        if orderingId is not None:
+            queryParams["orderingId"] = orderingId
+        return self.__send(
+            'PUT',
+            url,
+            self.retry_options.file_container_push,
+            params=queryParams,
+            headers=self.__headers(),
+        )
+
+    def __send(
+        self,
+        method: str,
+        url: str,
+        policy: RetryPolicy,
+        rateLimited: bool = True,
+        data=None,
+        **kwargs,
+    ):
+        # Throttled requests are retried until max_retries or the time budget is
+        # exhausted, honoring Retry-After. Transient failures are retried according to
+        # the policy of the operation, within the same time budget.
+        deadline = time.monotonic() + self.backoff_options.time_budget
+        throttledRetries = 0
+        transientRetries = 0
+        limiter = self.rate_limiter if rateLimited else None
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                response = self.session.request(
+                    method, url, data=data() if callable(data) else data, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                transientRetries += 1
+                delay = policy.delay(transientRetries)
+                if (
+                    not policy.connection_errors
+                    or transientRetries > policy.max_retries
+                    or time.monotonic() + delay > deadline
+                ):
+                    raise
+                time.sleep(delay)
+                continue
+
+            if response.status_code == 429 and rateLimited:
+                retryAfter = parseRetryAfter(response.headers.get('Retry-After'))
+                if limiter is not None:
+                    limiter.onThrottle(retryAfter)
+                throttledRetries += 1
+                delay = (
+                    retryAfter
+                    if retryAfter is not None
+                    else backoffTime(self.backoff_options, throttledRetries)
+                )
+                if (
+                    throttledRetries > self.backoff_options.max_retries
+                    or time.monotonic() + delay > deadline
+                ):
+                    return response
+                # The limiter waits for Retry-After before sending the next request
+                if retryAfter is None or limiter is None:
+                    time.sleep(delay)
+                continue
+
+            if response.status_code in policy.statuses:
+                transientRetries += 1
+                delay = policy.delay(transientRetries)
+                if (
+                    transientRetries > policy.max_retries
+                    or time.monotonic() + delay > deadline
+                ):
+                    return response
+                time.sleep(delay)
+                continue
+
+            if limiter is not None:
+                limiter.onSuccess()
+            return response
 
     def __baseProviderURL(self, providerId: str):
-        return f'{self.__basePushURL()}/providers/{providerId}'
+        return f'{self.__pushURL}/providers/{providerId}'
 
     def __headers(self):
-        return self.__authorizationHeader() | self.__contentTypeApplicationJSONHeader() | self.__userAgentHeader()
+        if self.__fixedHeaders is not None:
+            return self.__fixedHeaders
+        return self.__authorizationHeader() | self.__staticHeaders
 
     def __authorizationHeader(self):
-        return {"Authorization": f'Bearer {self.apikey}'}
+        apikey = self.apikey() if callable(self.apikey) else self.apikey
+        return {"Authorization": f'Bearer {apikey}'}
 
     def __contentTypeApplicationJSONHeader(self):
         return {'Content-Type': 'application/json', 'Accept': 'application/json'}
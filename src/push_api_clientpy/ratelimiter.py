@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+from weakref import WeakValueDictionary
+import threading
+import time
+
+DEFAULT_MAX_RATE = 100.0
+DEFAULT_MIN_RATE = 0.5
+
+
+@dataclass
+class RateLimitOptions:
+    # Requests per second allowed before any throttling is observed
+    initial_rate: float = DEFAULT_MAX_RATE
+    min_rate: float = DEFAULT_MIN_RATE
+    max_rate: float = DEFAULT_MAX_RATE
+    # Requests that can be sent back to back after a quiet period
+    burst: int = 10
+    # Requests per second regained for every second of successful requests
+    additive_increase: float = 1.0
+    # Factor applied to the rate every time a request is throttled
+    multiplicative_decrease: float = 0.5
+
+
+class RateLimiter:
+    """Token bucket whose rate adapts to throttling (additive increase, multiplicative
+    decrease).
+
+    Every client has its own limiter by default. Clients pushing to the same
+    organization can share one by passing the same instance, e.g. the one returned by
+    forOrganization.
+    """
+
+    __registry: "WeakValueDictionary[tuple[str, str], RateLimiter]" = (
+        WeakValueDictionary()
+    )
+    __registryLock = threading.Lock()
+
+    def __init__(
+        self,
+        options: RateLimitOptions = RateLimitOptions(),
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.options = options
+        self.rate = options.initial_rate
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__lock = threading.Lock()
+        self.__tokens = float(options.burst)
+        self.__lastRefill = clock()
+        self.__pausedUntil = 0.0
+
+    @classmethod
+    def forOrganization(
+        cls,
+        apiURL: str,
+        organizationid: str,
+        options: RateLimitOptions = RateLimitOptions(),
+    ) -> "RateLimiter":
+        """The limiter shared by the clients of an organization on the platform at
+        apiURL, as long as one of them holds it.
+
+        Raises ValueError when the shared limiter was created with other options.
+        """
+        key = (apiURL, organizationid)
+        with cls.__registryLock:
+            limiter = cls.__registry.get(key)
+            if limiter is None:
+                limiter = cls.__registry[key] = cls(options)
+            elif limiter.options != options:
+                raise ValueError(
+                    f"The rate limiter of organization {organizationid} is already "
+                    f"shared with other options: {limiter.options}"
+                )
+            return limiter
+
+    def acquire(self):
+        """Block until a request can be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            self.__sleep(wait)
+
+    def reserve(self) -> float:
+        """Take a token and return the seconds to wait before sending the request.
+
+        For callers that must not block, e.g. coroutines waiting with asyncio.sleep.
+        """
+        with self.__lock:
+            now = self.__clock()
+            self.__refill(now)
+            self.__tokens -= 1
+            return max(self.__pausedUntil - now, -self.__tokens / self.rate)
+
+    def onSuccess(self):
+        with self.__lock:
+            self.rate = min(
+                self.options.max_rate,
+                self.rate + self.options.additive_increase / self.rate,
+            )
+
+    def onThrottle(self, retryAfter: Optional[float] = None):
+        with self.__lock:
+            now = self.__clock()
+            self.__refill(now)
+            self.rate = max(
+                self.options.min_rate, self.rate * self.options.multiplicative_decrease
+            )
+            self.__tokens = min(self.__tokens, 0.0)
+            if retryAfter is not None:
+                self.__pausedUntil = max(self.__pausedUntil, now + retryAfter)
+
+    def __refill(self, now: float):
+        self.__tokens = min(
+            float(self.options.burst),
+            self.__tokens + (now - self.__lastRefill) * self.rate,
+        )
+        self.__lastRefill = now
+
+
+def parseRetryAfter(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header, given either as seconds or as
+    an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(
+            0.0,
+            (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(),
+        )
+    except (TypeError, ValueError):
+        return None
@@ -1,7 +1,20 @@
+from functools import lru_cache
 from typing import Union
 
-from .document import SecurityIdentity
-from .platformclient import SecurityIdentityType
+from .document import SecurityIdentity, SecurityIdentityType
+
+IDENTITY_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=IDENTITY_CACHE_SIZE)
+def internSecurityIdentity(
+    identity: str, identityType: SecurityIdentityType, securityProvider: str
+) -> SecurityIdentity:
+    """Return a shared SecurityIdentity, so that documents with the same permissions
+    reference the same objects."""
+    return SecurityIdentity(
+        identity=identity, identityType=identityType, securityProvider=securityProvider
+    )
 
 
 class SecurityIdentityBuilder:
@@ -16,7 +29,9 @@ class AnySecurityIdentityBuilder(SecurityIdentityBuilder):
         self.securityProvider = securityProvider
 
     def build(self):
-        return SecurityIdentity(identity=self.identity, identityType=self.identityType, securityProvider=self.securityProvider)
+        return internSecurityIdentity(
+            self.identity, self.identityType, self.securityProvider
+        )
 
 
 class UserSecurityIdentityBuilder(SecurityIdentityBuilder):
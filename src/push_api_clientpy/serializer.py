@@ -0,0 +1,161 @@
+import json
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from .document import Document, Permission, SecurityIdentity
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+FRAGMENT_CACHE_SIZE = 65536
+
+# Fields of Document that come before metadata, in declaration order
+_LEADING_FIELDS = (
+    "uri", "title", "clickableUri", "author", "date", "modifiedDate", "permanentId",
+    "parentId", "data",
+)
+
+
+def toJSONBytes(value: Any) -> bytes:
+    """Compact UTF-8 JSON, using orjson when it is installed.
+
+    Both backends produce equivalent JSON, but not always the same bytes: some floats
+    are written differently, e.g. 1e16 and 1e-7 become 1e+16 and 1e-07 without orjson.
+    NaN and infinite floats are rejected where they enter a document, by
+    DocumentBuilder.withMetadataValue.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # e.g. integers larger than 64 bits, which the standard library handles
+            pass
+    return json.dumps(
+        value, separators=(",", ":"), ensure_ascii=False, allow_nan=False
+    ).encode("utf-8")
+
+
+def serializeDocument(
+    document: Document, transform: Optional[Callable[[dict], dict]] = None
+) -> bytes:
+    """Same bytes as toJSONBytes(transform(marshalDocument(document))).
+
+    Permissions are written from cached JSON fragments, so identities shared by many
+    documents are serialized once.
+    transform may alter the marshaled document, except for its permissions.
+    """
+    marshaled = marshalDocument(document, withPermissions=False)
+    if transform is not None:
+        marshaled = transform(marshaled)
+
+    keys = list(marshaled.keys())
+    position = keys.index("permissions")
+    head = toJSONBytes({k: marshaled[k] for k in keys[:position]})[:-1]
+    tail = toJSONBytes({k: marshaled[k] for k in keys[position + 1:]})[1:]
+    return b''.join([
+        head,
+        b',"permissions":' if position > 0 else b'"permissions":',
+        _permissionsFragment(document.permissions),
+        b',' + tail if len(tail) > 1 else tail])
+
+
+def marshalDocument(document: Document, withPermissions: bool = True) -> dict:
+    """Build the Push API representation of a document.
+
+    Equivalent to filtering dataclasses.asdict(document), including the key order,
+    without deep copying every permission and security identity first.
+    """
+    marshaled = {}
+    for key in _LEADING_FIELDS:
+        _addIfNotEmpty(marshaled, key, getattr(document, key))
+    # Placeholders keep the positions asdict would give these keys
+    marshaled["metadata"] = None
+    if not withPermissions:
+        marshaled["permissions"] = None
+    elif document.permissions is not None:
+        marshaled["permissions"] = [
+            marshalPermission(permission) for permission in document.permissions
+        ]
+    else:
+        marshaled["permissions"] = [_defaultPermission()]
+    _addIfNotEmpty(marshaled, "fileExtension", document.fileExtension)
+    marshaled["compressedBinaryData"] = None
+
+    if document.metadata is not None:
+        for k, v in document.metadata.items():
+            marshaled[k] = v
+    del marshaled["metadata"]
+
+    marshaled["documentId"] = document.uri
+    marshaled.pop("uri", None)
+
+    if (
+        document.compressedBinaryData is not None
+        and document.compressedBinaryData.data != ""
+    ):
+        marshaled["compressedBinaryData"] = document.compressedBinaryData.data
+        marshaled["compressionType"] = document.compressedBinaryData.compressionType
+    else:
+        del marshaled["compressedBinaryData"]
+
+    return marshaled
+
+
+def marshalPermission(permission: Permission) -> dict:
+    return {
+        "allowedPermissions": [
+            marshalSecurityIdentity(identity)
+            for identity in permission.allowedPermissions
+        ],
+        "deniedPermissions": [
+            marshalSecurityIdentity(identity)
+            for identity in permission.deniedPermissions
+        ],
+        "allowAnonymous": permission.allowAnonymous,
+    }
+
+
+def marshalSecurityIdentity(identity: SecurityIdentity) -> dict:
+    return {
+        "identity": identity.identity,
+        "identityType": identity.identityType,
+        "securityProvider": identity.securityProvider
+    }
+
+
+def _permissionsFragment(permissions: Optional[list[Permission]]) -> bytes:
+    if permissions is None:
+        return _DEFAULT_PERMISSIONS_FRAGMENT
+    return b'[' + b','.join(map(_permissionFragment, permissions)) + b']'
+
+
+def _permissionFragment(permission: Permission) -> bytes:
+    return b''.join(
+        [
+            b'{"allowedPermissions":[',
+            b','.join(map(_identityFragment, permission.allowedPermissions)),
+            b'],"deniedPermissions":[',
+            b','.join(map(_identityFragment, permission.deniedPermissions)),
+            b'],"allowAnonymous":',
+            b'true}' if permission.allowAnonymous else b'false}',
+        ]
+    )
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _identityFragment(identity: SecurityIdentity) -> bytes:
+    return toJSONBytes(marshalSecurityIdentity(identity))
+
+
+def _defaultPermission() -> dict:
+    return {"allowedPermissions": [], "deniedPermissions": [], "allowAnonymous": True}
+
+
+def _addIfNotEmpty(marshaled: dict, key: str, value):
+    if value is not None and value != "":
+        marshaled[key] = value
+
+
+_DEFAULT_PERMISSIONS_FRAGMENT = toJSONBytes([_defaultPermission()])
@@ -1,18 +1,150 @@
-from .platformclient import BatchUpdateDocuments, FileContainer, PlatformClient, SecurityIdentityAliasModel, SecurityIdentityBatchConfig, SecurityIdentityDelete, SecurityIdentityDeleteOptions, SecurityIdentityModel, SourceVisibility, DEFAULT_MAX_RETRIES, DEFAULT_RETRY_AFTER
-from .platformclient import BackoffOptions
-from .documentbuilder import DocumentBuilder
+from .platformclient import (
+    BatchUpdateDocuments,
+    FileContainer,
+    PlatformClient,
+    SecurityIdentityAliasModel,
+    SecurityIdentityBatchConfig,
+    SecurityIdentityDelete,
+    SecurityIdentityDeleteOptions,
+    SecurityIdentityModel,
+    SourceStatus,
+    SourceVisibility,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_RETRY_AFTER,
+)
+from .platformclient import (
+    ApiKey,
+    BackoffOptions,
+    BatchDelete,
+    ConnectionOptions,
+    EndpointOptions,
+    RetryOptions,
+)
+from .ratelimiter import RateLimiter, RateLimitOptions
+from .documentbuilder import DocumentBuilder, Error
+from .chunker import (
+    BatchChunk,
+    BatchChunker,
+    BatchOptions,
+    MARSHAL_GROUP_SIZE,
+    SECURITY_IDENTITY_SECTIONS,
+)
+from .compression import CompressionOptions, compressDocument
+from .fingerprint import FINGERPRINT_GROUP_SIZE, FingerprintStore, fingerprint
+from .pipeline import batched, mapInOrder
+from .serializer import toJSONBytes
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import asdict, dataclass
-import json
+from functools import partial
+from itertools import chain
+from typing import Callable, Iterable, Iterator, Optional, Union
+import requests
+import threading
+import time
 
 
 @dataclass
 class BatchUpdate(BatchUpdateDocuments):
-    addOrUpdate: list[DocumentBuilder]
+    addOrUpdate: Iterable[DocumentBuilder]
+    delete: Iterable[BatchDelete]
+
+
+class BatchChunkError(Exception):
+    """A file container of a batch update that could not be pushed, even after retrying.
+
+    Pass it to Source.resumeBatchUpdate (or Source.resumeSecurityIdentityUpdate) to
+    finish the batch update, or to Source.resumeBatchChunk to push this file container
+    only. Resuming continues from the step that failed: an uploaded file container is
+    reused.
+
+    Raised by a batch update, it also records where the update stopped:
+    index is the position of the file container in the update, responses holds the
+    responses of the file containers pushed before it, pending the file containers
+    that were in flight after it, in order, and remaining the chunks that were not
+    read yet. Every pending file container is a BatchChunkError too: its own failure,
+    or a file container that was uploaded but not pushed.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        chunk: BatchChunk,
+        fileContainer: Optional[FileContainer] = None,
+        uploaded: bool = False,
+        response: Optional[requests.Response] = None,
+    ):
+        super().__init__(message)
+        self.chunk = chunk
+        self.fileContainer = fileContainer
+        self.uploaded = uploaded
+        self.response = response
+        self.index = 0
+        self.responses: list[requests.Response] = []
+        self.pending: list[BatchChunkError] = []
+        self.remaining: Iterator[BatchChunk] = iter(())
+
+
+_lastOrderingId = 0
+_orderingIdLock = threading.Lock()
+
+
+def nextOrderingId() -> int:
+    """The current time in milliseconds, strictly greater than every ordering id
+    previously returned in this process."""
+    global _lastOrderingId
+    with _orderingIdLock:
+        _lastOrderingId = max(int(time.time() * 1000), _lastOrderingId + 1)
+        return _lastOrderingId
 
 
 class Source:
-    def __init__(self, apikey: str, organizationid: str, backoff_options: BackoffOptions = BackoffOptions()):
-        self.client = PlatformClient(apikey, organizationid, backoff_options)
+    def __init__(
+        self,
+        apikey: ApiKey,
+        organizationid: str,
+        backoff_options: BackoffOptions = BackoffOptions(),
+        batch_options: BatchOptions = BatchOptions(),
+        connection_options: ConnectionOptions = ConnectionOptions(),
+        compression_options: Optional[CompressionOptions] = None,
+        rate_limit_options: Optional[RateLimitOptions] = None,
+        retry_options: RetryOptions = RetryOptions(),
+        fingerprint_store: Optional[FingerprintStore] = None,
+        endpoint_options: EndpointOptions = EndpointOptions(),
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.client = PlatformClient(
+            apikey,
+            organizationid,
+            backoff_options,
+            connection_options=connection_options,
+            rate_limit_options=rate_limit_options,
+            retry_options=retry_options,
+            endpoint_options=endpoint_options,
+            rate_limiter=rate_limiter,
+        )
+        self.batch_options = batch_options
+        self.compression_options = compression_options
+        # When set, documents that did not change since they were last pushed are
+        # skipped
+        self.fingerprint_store = fingerprint_store
+        # Created on first use and shared by every batch update, as starting worker
+        # processes is expensive; shut down by close()
+        self.__marshalExecutor = None
+        self.__marshalPoolLock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.client.close()
+        with self.__marshalPoolLock:
+            if self.__marshalExecutor is not None:
+                self.__marshalExecutor.shutdown()
+                self.__marshalExecutor = None
 
     def create(self, name: str, visibility: SourceVisibility):
         return self.client.createSource(name, visibility)
@@ -32,25 +164,800 @@ class Source:
     def manageSecurityIdentities(self, securityProviderId: str, batchConfig: SecurityIdentityBatchConfig):
         return self.client.manageSecurityIdentities(securityProviderId, batchConfig)
 
-    def addOrUpdateDocument(self, sourceId: str, docBuilder: DocumentBuilder):
-        return self.client.pushDocument(sourceId, docBuilder.marshal())
+    def batchUpdateSecurityIdentities(
+        self,
+        securityProviderId: str,
+        members: Iterable[SecurityIdentityModel] = (),
+        mappings: Iterable[SecurityIdentityAliasModel] = (),
+        deleted: Iterable[SecurityIdentityDelete] = (),
+        orderingId: Optional[int] = None,
+    ):
+        """Push security identities through file containers instead of one request per
+        identity.
+
+        Iterables are consumed lazily and split across as many file containers as
+        BatchOptions requires. Every file container is pushed with the same
+        orderingId, which defaults to the current time in milliseconds: pass it
+        explicitly to be able to resume a failed chunk or to delete the identities that
+        were not part of this update.
+
+        Returns the response of each file container push, in order.
+        """
+        if orderingId is None:
+            orderingId = nextOrderingId()
+        chunker = BatchChunker(
+            self.batch_options.max_file_container_size, SECURITY_IDENTITY_SECTIONS
+        )
+        chunks = chunker.chunks(
+            *(
+                map(lambda model: toJSONBytes(model.toJSON()), models)
+                for models in (members, mappings, deleted)
+            )
+        )
+        return self.__pushChunks(
+            chunks, self.__securityIdentityPush(securityProviderId, orderingId)
+        )
+
+    def resumeSecurityIdentityChunk(
+        self, securityProviderId: str, error: BatchChunkError, orderingId: int
+    ):
+        """Same as resumeBatchChunk, for a chunk of batchUpdateSecurityIdentities pushed
+        with orderingId."""
+        push = self.__securityIdentityPush(securityProviderId, orderingId)
+        return self.__resumeChunk(error, push)
+
+    def resumeSecurityIdentityUpdate(
+        self, securityProviderId: str, error: BatchChunkError, orderingId: int
+    ):
+        """Same as resumeBatchUpdate, for batchUpdateSecurityIdentities pushed with
+        orderingId."""
+        push = self.__securityIdentityPush(securityProviderId, orderingId)
+        return self.__resumeChunks(error, push)
+
+    def updateSourceStatus(self, sourceId: str, status: SourceStatus):
+        return self.client.updateSourceStatus(sourceId, status)
+
+    def rebuild(
+        self,
+        sourceId: str,
+        orderingId: Optional[int] = None,
+        deleteOlderThan: bool = True,
+        queueDelay: Optional[int] = None,
+    ) -> "RebuildSession":
+        """A context manager for a full load of the source, see RebuildSession."""
+        return RebuildSession(self, sourceId, orderingId, deleteOlderThan, queueDelay)
+
+    def addOrUpdateDocument(
+        self,
+        sourceId: str,
+        docBuilder: DocumentBuilder,
+        orderingId: Optional[int] = None,
+    ):
+        """Push a single document. Returns None without pushing when the fingerprint
+        store knows it is unchanged."""
+        documentId = docBuilder.document.uri
+        store = self.fingerprint_store
+        if store is not None:
+            # Fingerprinted before compression, which is not deterministic (gzip
+            # stores a timestamp)
+            item = (documentId, fingerprint(docBuilder.serialize()))
+            if not store.changed(sourceId, [item])[0]:
+                return None
+        compression = self.compression_options
+        if compression is None:
+            # Cached by the builder: the fingerprinted bytes are not serialized again
+            serialized = docBuilder.serialize()
+        else:
+            serialized = docBuilder.serialize(
+                partial(compressDocument, options=compression)
+            )
+        response = self.client.pushSerializedDocument(
+            sourceId, documentId, serialized, orderingId
+        )
+        if store is not None and response.ok:
+            store.record(sourceId, [item])
+        return response
+
+    def deleteDocument(
+        self,
+        sourceId: str,
+        documentId: str,
+        deleteChildren: bool,
+        orderingId: Optional[int] = None,
+    ):
+        response = self.client.deleteDocument(
+            sourceId, documentId, deleteChildren, orderingId
+        )
+        # Forgotten once deleted only: a document that is still in the source keeps
+        # its fingerprint
+        if self.fingerprint_store is not None and response.ok:
+            self.fingerprint_store.forget(sourceId, [documentId])
+        return response
+
+    def deleteDocuments(
+        self,
+        sourceId: str,
+        documentIds: Iterable[str],
+        deleteChildren: bool = False,
+        orderingId: Optional[int] = None,
+    ):
+        """Delete many documents through file containers instead of one request per
+        document."""
+        return self.streamBatchUpdate(
+            sourceId,
+            delete=(
+                BatchDelete(documentId, deleteChildren) for documentId in documentIds
+            ),
+            orderingId=orderingId,
+        )
+
+    def deleteOlderThan(
+        self, sourceId: str, orderingId: int, queueDelay: Optional[int] = None
+    ):
+        """Delete every document of the source that was last pushed with an ordering id
+        older than orderingId."""
+        return self.client.deleteOlderThan(sourceId, orderingId, queueDelay)
+
+    def batchUpdateDocuments(
+        self, sourceId: str, batch: BatchUpdate, orderingId: Optional[int] = None
+    ):
+        """Push the batch through as many file containers as needed to respect the
+        maximum file container size.
+
+        Returns the response of the last file container push, which is the only one
+        when the batch fits in a single file container: use streamBatchUpdate to get
+        the response of every file container. An empty batch is pushed as an empty
+        file container. Returns None when the fingerprint store skipped every
+        document and there was nothing to delete.
+
+        Raises a BatchChunkError when a file container cannot be created, uploaded or
+        pushed, including when the push is rejected with a 4xx status, rather than
+        returning the failed response. The error keeps that response.
+        """
+        responses = self.streamBatchUpdate(
+            sourceId, batch.addOrUpdate, batch.delete, orderingId
+        )
+        if responses:
+            return responses[-1]
+        if self.fingerprint_store is not None:
+            return None
+        chunker = BatchChunker(self.batch_options.max_file_container_size)
+        push = self.__documentPush(sourceId, orderingId)
+        return self.__pushChunk(chunker.emptyChunk(), push)
+
+    def streamBatchUpdate(
+        self,
+        sourceId: str,
+        addOrUpdate: Iterable[DocumentBuilder] = (),
+        delete: Iterable[BatchDelete] = (),
+        orderingId: Optional[int] = None,
+    ):
+        """Same as batchUpdateDocuments, but consumes any iterable or generator lazily
+        and returns the response of every file container push, in order. Nothing is
+        pushed when there is nothing to add or delete.
+
+        Documents are marshaled and uploaded one file container at a time, so memory
+        usage is bounded by the maximum file container size rather than by the number
+        of documents.
+
+        When BatchOptions.max_in_flight is greater than 1, up to that many file
+        containers are created and uploaded concurrently while the next one is being
+        marshaled. They are still pushed one at a time, in order.
+
+        A file container that cannot be created, uploaded or pushed, whatever the
+        status of the failed response, raises a BatchChunkError recording where the
+        update stopped. It can be passed to resumeBatchUpdate.
+
+        With a fingerprint store, unchanged documents are skipped and the fingerprints
+        of the others are recorded as soon as their file container is pushed. They are
+        computed by the marshal workers, when there are any.
+        """
+        if self.fingerprint_store is not None:
+            return self.__incrementalUpdate(sourceId, addOrUpdate, delete, orderingId)
+        return self.__streamBatchUpdate(sourceId, addOrUpdate, delete, orderingId)
+
+    def syncDocuments(
+        self,
+        sourceId: str,
+        documents: Iterable[DocumentBuilder],
+        deleteChildren: bool = False,
+    ):
+        """Make the source contain exactly the given documents, using the fingerprint
+        store of the Source.
+
+        Only new and changed documents are pushed, and the documents pushed by a
+        previous run that are not part of documents anymore are deleted.
+        """
+        if self.fingerprint_store is None:
+            raise Error(
+                "syncDocuments requires a Source created with a fingerprint_store"
+            )
+        return self.__incrementalUpdate(
+            sourceId,
+            documents,
+            (),
+            None,
+            self.fingerprint_store.beginRun(sourceId),
+            deleteChildren,
+        )
+
+    def __incrementalUpdate(
+        self,
+        sourceId: str,
+        addOrUpdate: Iterable[DocumentBuilder],
+        delete: Iterable[BatchDelete],
+        orderingId: Optional[int],
+        run: Optional[int] = None,
+        deleteChildren: bool = False,
+    ):
+        store = self.fingerprint_store
+        # Fingerprints of the documents and ids of the deletes read by the chunker and
+        # not acknowledged yet, in order
+        pushed: deque[tuple[str, bytes]] = deque()
+        deleted: deque[str] = deque()
+
+        def changedDocuments():
+            docBuilders: deque[DocumentBuilder] = deque()
+
+            def read():
+                for docBuilder in addOrUpdate:
+                    docBuilders.append(docBuilder)
+                    yield docBuilder
+
+            fingerprinted = self.__fingerprintDocuments(read())
+            for group in batched(fingerprinted, FINGERPRINT_GROUP_SIZE):
+                builders = [docBuilders.popleft() for _ in group]
+                fingerprints = [
+                    (docBuilder.document.uri, digest)
+                    for docBuilder, (_, digest) in zip(builders, group)
+                ]
+                for docBuilder, (payload, _), item, changed in zip(
+                    builders,
+                    group,
+                    fingerprints,
+                    store.changed(sourceId, fingerprints, run),
+                ):
+                    if changed:
+                        pushed.append(item)
+                        yield docBuilder, payload
+
+        def requestedDeletes():
+            for batchDelete in delete:
+                deleted.append(batchDelete.documentId)
+                yield batchDelete
+
+        def staleDeletes():
+            # The chunker only asks for deletes once every document was read, so every
+            # document of the run was seen
+            if run is None:
+                return
+            for documentId in store.stale(sourceId, run):
+                deleted.append(documentId)
+                yield BatchDelete(documentId, deleteChildren)
+
+        def acknowledge(chunk: BatchChunk):
+            # Only once the file container of the documents was pushed successfully
+            store.record(
+                sourceId,
+                [pushed.popleft() for _ in range(chunk.documentCount)],
+                run or 0,
+            )
+            store.forget(
+                sourceId, [deleted.popleft() for _ in range(chunk.deleteCount)]
+            )
+
+        if self.compression_options is None:
+            # Reuse the bytes serialized to compute the fingerprints
+            documents = (payload for _, payload in changedDocuments())
+        else:
+            documents = self.__serializeDocuments(
+                docBuilder for docBuilder, _ in changedDocuments()
+            )
+        deletes = self.__serializeDeletes(chain(requestedDeletes(), staleDeletes()))
+        chunker = BatchChunker(self.batch_options.max_file_container_size)
+        return self.__pushChunks(
+            chunker.chunks(documents, deletes),
+            self.__documentPush(sourceId, orderingId),
+            acknowledge=acknowledge,
+        )
+
+    def __streamBatchUpdate(
+        self,
+        sourceId: str,
+        addOrUpdate: Iterable[DocumentBuilder],
+        delete: Iterable[BatchDelete],
+        orderingId: Optional[int],
+    ):
+        return self.streamSerializedBatchUpdate(
+            sourceId,
+            self.__serializeDocuments(addOrUpdate),
+            self.__serializeDeletes(delete),
+            orderingId,
+        )
+
+    def __serializeDeletes(self, delete: Iterable[BatchDelete]):
+        return map(lambda batchDelete: toJSONBytes(asdict(batchDelete)), delete)
+
+    def streamSerializedBatchUpdate(
+        self,
+        sourceId: str,
+        addOrUpdate: Iterable[bytes] = (),
+        delete: Iterable[bytes] = (),
+        orderingId: Optional[int] = None,
+    ):
+        """Same as streamBatchUpdate, for documents and deletes that are already
+        serialized to JSON."""
+        chunker = BatchChunker(self.batch_options.max_file_container_size)
+        return self.__pushChunks(
+            chunker.chunks(addOrUpdate, delete),
+            self.__documentPush(sourceId, orderingId),
+        )
+
+    def __serializeDocuments(self, addOrUpdate: Iterable[DocumentBuilder]):
+        compression = self.compression_options
+        workers = self.batch_options.marshal_workers
+        if workers > 0:
+            groups = batched(addOrUpdate, MARSHAL_GROUP_SIZE)
+            serializeGroup = partial(_serializeGroup, compression=compression)
+            executor = self.__marshalPool()
+            for serialized in mapInOrder(executor, serializeGroup, groups, workers * 2):
+                yield from serialized
+            return
+
+        if compression is None:
+            yield from map(lambda docBuilder: docBuilder.serialize(), addOrUpdate)
+            return
+
+        def compressAndSerialize(docBuilder: DocumentBuilder):
+            return docBuilder.serialize(lambda doc: compressDocument(doc, compression))
+
+        if compression.workers <= 0:
+            yield from map(compressAndSerialize, addOrUpdate)
+            return
+
+        # zlib, gzip and lzma release the GIL, so compression overlaps with reading the
+        # next documents
+        with ThreadPoolExecutor(max_workers=compression.workers) as executor:
+            yield from mapInOrder(
+                executor, compressAndSerialize, addOrUpdate, compression.workers * 2
+            )
+
+    def __fingerprintDocuments(
+        self, addOrUpdate: Iterable[DocumentBuilder]
+    ) -> Iterator[tuple[bytes, bytes]]:
+        # (payload, fingerprint) of every document, computed by the marshal workers
+        workers = self.batch_options.marshal_workers
+        if workers <= 0:
+            yield from map(_fingerprintDocument, addOrUpdate)
+            return
+        groups = batched(addOrUpdate, MARSHAL_GROUP_SIZE)
+        executor = self.__marshalPool()
+        for fingerprinted in mapInOrder(
+            executor, _fingerprintGroup, groups, workers * 2
+        ):
+            yield from fingerprinted
+
+    def __marshalPool(self):
+        with self.__marshalPoolLock:
+            if self.__marshalExecutor is None:
+                if self.batch_options.marshal_executor == "process":
+                    executorType = ProcessPoolExecutor
+                else:
+                    executorType = ThreadPoolExecutor
+                workers = self.batch_options.marshal_workers
+                self.__marshalExecutor = executorType(max_workers=workers)
+            return self.__marshalExecutor
+
+    def resumeBatchChunk(
+        self, sourceId: str, error: BatchChunkError, orderingId: Optional[int] = None
+    ):
+        """Push the file container of a failed chunk, without recreating or
+        re-uploading it when that was already done.
+
+        If it fails again, the new BatchChunkError keeps the position of error in its
+        batch update, so that the update can still be resumed from it.
+        """
+        return self.__resumeChunk(error, self.__documentPush(sourceId, orderingId))
+
+    def resumeBatchUpdate(
+        self, sourceId: str, error: BatchChunkError, orderingId: Optional[int] = None
+    ):
+        """Finish a batch update that raised error, pushed with orderingId.
+
+        The failed file container is pushed first, then the ones that were in flight
+        with it, then the chunks that were not read yet, in order. Returns the
+        responses of every file container of the update, including those pushed
+        before the error. Raises a new BatchChunkError if a file container fails
+        again.
+        """
+        return self.__resumeChunks(error, self.__documentPush(sourceId, orderingId))
+
+    def __documentPush(
+        self, sourceId: str, orderingId: Optional[int]
+    ) -> Callable[[FileContainer], requests.Response]:
+        return lambda fileContainer: self.client.pushFileContainerContent(
+            sourceId, fileContainer, orderingId
+        )
+
+    def __securityIdentityPush(
+        self, securityProviderId: str, orderingId: int
+    ) -> Callable[[FileContainer], requests.Response]:
+        return lambda fileContainer: self.client.manageSecurityIdentities(
+            securityProviderId,
+            SecurityIdentityBatchConfig(
+                FileID=fileContainer.fileId, OrderingID=orderingId
+            ),
+        )
+
+    def __resumeChunk(
+        self, error: BatchChunkError, push: Callable[[FileContainer], requests.Response]
+    ):
+        try:
+            return self.__pushChunk(
+                error.chunk, push, error.fileContainer, error.uploaded
+            )
+        except BatchChunkError as again:
+            again.index = error.index
+            again.responses = error.responses
+            again.pending = error.pending
+            again.remaining = error.remaining
+            raise
+
+    def __resumeChunks(
+        self, error: BatchChunkError, push: Callable[[FileContainer], requests.Response]
+    ):
+        pending = [error, *error.pending]
+        return self.__pushChunks(error.remaining, push, pending, error.responses)
+
+    def __pushChunks(
+        self,
+        chunks: Iterable[BatchChunk],
+        push: Callable[[FileContainer], requests.Response],
+        pending: Iterable[BatchChunkError] = (),
+        responses: Iterable[requests.Response] = (),
+        acknowledge: Optional[Callable[[BatchChunk], None]] = None,
+    ):
+        # File containers are created and uploaded concurrently, but pushed one at a
+        # time in chunk order: the Push API applies them in the order it receives
+        # them, and a later chunk may update or delete a document of an earlier one.
+        # The pending file containers of an earlier attempt go first.
+        responses = list(responses)
+        chunks = iter(chunks)
+        maxInFlight = max(1, self.batch_options.max_in_flight)
+        executor = ThreadPoolExecutor(maxInFlight) if maxInFlight > 1 else None
+
+        def start(chunk, fileContainer=None, uploaded=False):
+            # Without an executor, the file container is uploaded right before it is
+            # pushed
+            if executor is None:
+                return (chunk, fileContainer, uploaded, None)
+            upload = executor.submit(self.__uploadChunk, chunk, fileContainer, uploaded)
+            return (chunk, None, False, upload)
+
+        try:
+            # (chunk, file container, uploaded, upload future), oldest first
+            inFlight = deque(
+                start(error.chunk, error.fileContainer, error.uploaded)
+                for error in pending
+            )
+            while True:
+                while len(inFlight) < maxInFlight:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    inFlight.append(start(chunk))
+                if not inFlight:
+                    return responses
+                chunk, fileContainer, uploaded, upload = inFlight.popleft()
+                try:
+                    if upload is not None:
+                        fileContainer, uploaded = upload.result(), True
+                    responses.append(
+                        self.__pushChunk(chunk, push, fileContainer, uploaded)
+                    )
+                except BatchChunkError as error:
+                    error.index = len(responses)
+                    error.responses = responses
+                    error.pending = self.__unpushed(inFlight, error.index + 1)
+                    error.remaining = chunks
+                    raise
+                if acknowledge is not None:
+                    acknowledge(chunk)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def __unpushed(
+        self, inFlight: Iterable[tuple], index: int
+    ) -> list[BatchChunkError]:
+        # Waits for the uploads in flight, so that none of their failures is lost
+        unpushed = []
+        for chunk, fileContainer, uploaded, upload in inFlight:
+            try:
+                if upload is not None:
+                    fileContainer, uploaded = upload.result(), True
+                error = BatchChunkError(
+                    "Not pushed: an earlier file container failed",
+                    chunk,
+                    fileContainer,
+                    uploaded,
+                )
+            except BatchChunkError as failure:
+                error = failure
+            error.index = index + len(unpushed)
+            unpushed.append(error)
+        return unpushed
+
+    def __pushChunk(
+        self,
+        chunk: BatchChunk,
+        push: Callable[[FileContainer], requests.Response],
+        fileContainer: Optional[FileContainer] = None,
+        uploaded: bool = False,
+    ):
+        # Every step is retried by the client; a step that still fails raises a
+        # BatchChunkError recording the progress
+        fileContainer = self.__uploadChunk(chunk, fileContainer, uploaded)
+        return self.__step('push file container', chunk, fileContainer, True,
+                           lambda: push(fileContainer))
+
+    def __uploadChunk(
+        self,
+        chunk: BatchChunk,
+        fileContainer: Optional[FileContainer] = None,
+        uploaded: bool = False,
+    ) -> FileContainer:
+        if fileContainer is None:
+            resFileContainer = self.__step(
+                'create file container',
+                chunk,
+                None,
+                False,
+                lambda: self.client.createFileContainer(),
+            ).json()
+            fileContainer = FileContainer(
+                uploadUri=resFileContainer.get('uploadUri'),
+                fileId=resFileContainer.get('fileId'),
+                requiredHeaders=resFileContainer.get('requiredHeaders'))
+
+        if not uploaded:
+            self.__step(
+                'upload file container',
+                chunk,
+                fileContainer,
+                False,
+                lambda: self.client.uploadRawContentToFileContainer(
+                    fileContainer, chunk.stream
+                ),
+            )
+
+        return fileContainer
+
+    def __step(
+        self,
+        name: str,
+        chunk: BatchChunk,
+        fileContainer: Optional[FileContainer],
+        uploaded: bool,
+        send: Callable[[], requests.Response],
+    ):
+        try:
+            response = send()
+        except requests.RequestException as error:
+            raise BatchChunkError(
+                f'Unable to {name}: {error}', chunk, fileContainer, uploaded
+            ) from error
+        if not response.ok:
+            raise BatchChunkError(
+                f'Unable to {name}: HTTP {response.status_code}',
+                chunk,
+                fileContainer,
+                uploaded,
+                response,
+            )
+        return response
+
+
+class RebuildSession:
+    """A full load of a source.
+
+    Entering the session sets the source status to REBUILD, and every document and
+    batch pushed through the session is stamped with the same orderingId. When the
+    session exits without an exception, the documents that were not pushed during the
+    session are deleted with deleteOlderThan. The status is set back to IDLE in every
+    case.
+
+    Pushes that fail, i.e. non-ok responses and any exception raised by a session
+    operation, such as BatchChunkErrors or connection errors, are recorded in failures
+    until the document is pushed or deleted again, or the batch update is resumed,
+    through the session. While there are failures, even when the exception was caught
+    inside the session, the older documents are not deleted, since documents that
+    failed to be pushed would be deleted too, and exiting the session raises an Error.
+    It also raises when the status or the deletion of the older documents is not
+    accepted.
+
+    Sources with a fingerprint store must use Source.syncDocuments instead: skipped
+    documents would not be stamped and would therefore be deleted at the end of the
+    session.
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        sourceId: str,
+        orderingId: Optional[int] = None,
+        deleteOlderThan: bool = True,
+        queueDelay: Optional[int] = None,
+    ):
+        if deleteOlderThan and source.fingerprint_store is not None:
+            raise Error(
+                "A rebuild session cannot delete older documents of a Source with a "
+                "fingerprint_store, use syncDocuments"
+            )
+        self.source = source
+        self.sourceId = sourceId
+        self.orderingId = orderingId if orderingId is not None else nextOrderingId()
+        self.deleteOlderThan = deleteOlderThan
+        self.queueDelay = queueDelay
+        self.__failedDocuments: dict[str, Union[requests.Response, Exception]] = {}
+        self.__failedBatches: list[Exception] = []
+
+    def __enter__(self):
+        response = self.source.updateSourceStatus(self.sourceId, "REBUILD")
+        self.__check(f"set the status of source {self.sourceId} to REBUILD", response)
+        return self
+
+    def __exit__(self, excType, *exc_info):
+        try:
+            if excType is None and self.deleteOlderThan:
+                if self.failures:
+                    raise Error(
+                        f"{len(self.failures)} pushes of the rebuild of source "
+                        f"{self.sourceId} failed: older documents were not deleted"
+                    )
+                response = self.source.deleteOlderThan(
+                    self.sourceId, self.orderingId, self.queueDelay
+                )
+                self.__check(
+                    f"delete the older documents of source {self.sourceId}", response
+                )
+        finally:
+            response = self.source.updateSourceStatus(self.sourceId, "IDLE")
+        # Not raised over the exception that ended the session
+        if excType is None:
+            self.__check(f"set the status of source {self.sourceId} to IDLE", response)
+
+    @property
+    def failures(self) -> list[Union[requests.Response, Exception]]:
+        return [*self.__failedDocuments.values(), *self.__failedBatches]
+
+    def addOrUpdateDocument(self, docBuilder: DocumentBuilder):
+        return self.__record(
+            docBuilder.document.uri,
+            self.source.addOrUpdateDocument,
+            self.sourceId,
+            docBuilder,
+            self.orderingId,
+        )
+
+    def deleteDocument(self, documentId: str, deleteChildren: bool = False):
+        return self.__record(
+            documentId,
+            self.source.deleteDocument,
+            self.sourceId,
+            documentId,
+            deleteChildren,
+            self.orderingId,
+        )
+
+    def deleteDocuments(self, documentIds: Iterable[str], deleteChildren: bool = False):
+        return self.__batch(
+            self.source.deleteDocuments,
+            self.sourceId,
+            documentIds,
+            deleteChildren,
+            self.orderingId,
+        )
+
+    def batchUpdateDocuments(self, batch: BatchUpdate):
+        return self.__batch(
+            self.source.batchUpdateDocuments, self.sourceId, batch, self.orderingId
+        )
+
+    def streamBatchUpdate(
+        self,
+        addOrUpdate: Iterable[DocumentBuilder] = (),
+        delete: Iterable[BatchDelete] = (),
+    ):
+        return self.__batch(
+            self.source.streamBatchUpdate,
+            self.sourceId,
+            addOrUpdate,
+            delete,
+            self.orderingId,
+        )
+
+    def resumeBatchChunk(self, error: BatchChunkError):
+        """Push the failed file container of error. The failure is resolved when it was
+        the last file container of its batch update."""
+        response = self.__resume(
+            error, self.source.resumeBatchChunk, self.sourceId, error, self.orderingId
+        )
+        if not error.pending:
+            # Peek at the remaining chunks, without losing any
+            chunk = next(error.remaining, None)
+            if chunk is None:
+                self.__resolve(error)
+            else:
+                error.remaining = chain([chunk], error.remaining)
+        return response
+
+    def resumeBatchUpdate(self, error: BatchChunkError):
+        responses = self.__resume(
+            error, self.source.resumeBatchUpdate, self.sourceId, error, self.orderingId
+        )
+        self.__resolve(error)
+        return responses
+
+    def __record(self, documentId: str, push: Callable, *args):
+        try:
+            response = push(*args)
+        except Exception as e:
+            self.__failedDocuments[documentId] = e
+            raise
+        if response is not None and not response.ok:
+            self.__failedDocuments[documentId] = response
+        else:
+            self.__failedDocuments.pop(documentId, None)
+        return response
+
+    def __batch(self, update: Callable, *args):
+        try:
+            return update(*args)
+        except Exception as e:
+            self.__failedBatches.append(e)
+            raise
+
+    def __resume(self, error: BatchChunkError, resume: Callable, *args):
+        try:
+            return resume(*args)
+        except BatchChunkError as again:
+            # The new error records where the update stopped this time
+            self.__resolve(error)
+            self.__failedBatches.append(again)
+            raise
+        except Exception as e:
+            self.__failedBatches.append(e)
+            raise
+
+    def __resolve(self, error: Exception):
+        self.__failedBatches = [
+            failure for failure in self.__failedBatches if failure is not error
+        ]
+
+    def __check(self, action: str, response: requests.Response):
+        if not response.ok:
+            raise Error(f"Unable to {action}: HTTP {response.status_code}")
 
-    def deleteDocument(self, sourceId: str, documentId: str, deleteChildren: bool):
-        return self.client.deleteDocument(sourceId, documentId, deleteChildren)
 
-    def batchUpdateDocuments(self, sourceId: str, batch: BatchUpdate):
-        resFileContainer = self.client.createFileContainer().json()
+def _serializeGroup(
+    docBuilders: list[DocumentBuilder], compression: Optional[CompressionOptions]
+) -> list[bytes]:
+    # Module level so that it can be sent to a process pool
+    if compression is None:
+        return [docBuilder.serialize() for docBuilder in docBuilders]
+    return [
+        docBuilder.serialize(partial(compressDocument, options=compression))
+        for docBuilder in docBuilders
+    ]
 
-        fileContainer = FileContainer(
-            uploadUri=resFileContainer.get('uploadUri'),
-            fileId=resFileContainer.get('fileId'),
-            requiredHeaders=resFileContainer.get('requiredHeaders'))
 
-        batchMarshaled = BatchUpdateDocuments(
-            addOrUpdate=list(
-                map(lambda docBuilder: docBuilder.marshal(), batch.addOrUpdate)),
-            delete=batch.delete)
+def _fingerprintDocument(docBuilder: DocumentBuilder) -> tuple[bytes, bytes]:
+    # The uncompressed payload is fingerprinted, like in addOrUpdateDocument
+    payload = docBuilder.serialize()
+    return payload, fingerprint(payload)
 
-        self.client.uploadContentToFileContainer(fileContainer, batchMarshaled)
 
-        return self.client.pushFileContainerContent(sourceId, fileContainer)
+def _fingerprintGroup(docBuilders: list[DocumentBuilder]) -> list[tuple[bytes, bytes]]:
+    # Module level so that it can be sent to a process pool
+    return [_fingerprintDocument(docBuilder) for docBuilder in docBuilders]
@@ -0,0 +1,237 @@
+from .chunker import DEFAULT_MAX_FILE_CONTAINER_SIZE
+from .compression import compressDocument
+from .documentbuilder import DocumentBuilder, Error
+from .platformclient import BatchDelete
+from .serializer import toJSONBytes
+from .source import Source
+from collections import deque
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Optional
+import mmap
+import os
+import re
+import threading
+
+# Room left in a segment for the JSON envelope of its file container
+_ENVELOPE_SIZE = 64
+_ADD_OR_UPDATE = b"a"
+_DELETE = b"d"
+_SEGMENT = re.compile(r"segment-(\d+)\.(open|ready)")
+_OPEN = "open"
+_READY = "ready"
+
+
+@dataclass
+class SpoolOptions:
+    # A segment is shipped as a single file container once it reaches this size, or
+    # when the spool is flushed
+    max_segment_size: int = DEFAULT_MAX_FILE_CONTAINER_SIZE
+    # fsync sealed segments and checkpoints, so that they also survive a power loss and
+    # not only a crash
+    fsync: bool = True
+
+
+class Spool:
+    """Write-ahead outbox for a batch update of one source.
+
+    Serialized documents and deletes are appended to segment files in directory. Full
+    segments are sealed and shipped by a background thread, one file container per
+    segment, and the last segment acknowledged by the Push API is checkpointed. Crawling
+    is therefore never slowed down by pushing, and a Spool created on the directory of a
+    process that died ships whatever that process had spooled without marshaling it
+    again.
+
+    Documents must be added from a single thread. When a segment cannot be pushed even
+    after retrying, the sender stops and flush or close raise its BatchChunkError; the
+    segment stays on disk and is shipped by the next Spool.
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        sourceId: str,
+        directory: str,
+        options: SpoolOptions = SpoolOptions(),
+    ):
+        self.source = source
+        self.sourceId = sourceId
+        self.directory = directory
+        self.options = options
+        self.error: Optional[Exception] = None
+        self.__condition = threading.Condition()
+        self.__ready: deque[int] = deque()
+        self.__closed = False
+        self.__file = None
+        self.__segmentSize = 0
+        self.__segmentHasDeletes = False
+        os.makedirs(directory, exist_ok=True)
+        self.__segment = self.__recover()
+        self.__sender = threading.Thread(
+            target=self.__send, name=f"spool-{sourceId}", daemon=True
+        )
+        self.__sender.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def addOrUpdate(self, docBuilder: DocumentBuilder):
+        compression = self.source.compression_options
+        transform = (
+            None
+            if compression is None
+            else partial(compressDocument, options=compression)
+        )
+        # The payload of a file container lists every document before the deletes
+        if self.__segmentHasDeletes:
+            self.__seal()
+        self.__append(_ADD_OR_UPDATE, docBuilder.serialize(transform))
+
+    def delete(self, documentId: str, deleteChildren: bool = False):
+        self.__append(
+            _DELETE, toJSONBytes(asdict(BatchDelete(documentId, deleteChildren)))
+        )
+        self.__segmentHasDeletes = True
+
+    def flush(self):
+        """Ship the current segment and wait until every sealed segment was pushed."""
+        self.__seal()
+        with self.__condition:
+            self.__condition.wait_for(
+                lambda: not self.__ready or self.error is not None
+            )
+            if self.error is not None:
+                raise self.error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            with self.__condition:
+                self.__closed = True
+                self.__condition.notify_all()
+            self.__sender.join()
+
+    def __append(self, tag: bytes, payload: bytes):
+        # One record per line: JSON never contains a raw line feed
+        record = b"".join((tag, payload, b"\n"))
+        if len(record) + _ENVELOPE_SIZE > self.options.max_segment_size:
+            raise Error(
+                f"Item of {len(payload)} bytes exceeds the maximum segment size of "
+                f"{self.options.max_segment_size} bytes"
+            )
+        if (
+            self.__segmentSize + len(record) + _ENVELOPE_SIZE
+            > self.options.max_segment_size
+        ):
+            self.__seal()
+        if self.__file is None:
+            self.__file = open(self.__path(self.__segment, _OPEN), "ab", buffering=0)
+        self.__file.write(record)
+        self.__segmentSize += len(record)
+
+    def __seal(self):
+        if self.__file is None:
+            return
+        if self.options.fsync:
+            os.fsync(self.__file.fileno())
+        self.__file.close()
+        os.replace(
+            self.__path(self.__segment, _OPEN), self.__path(self.__segment, _READY)
+        )
+        with self.__condition:
+            self.__ready.append(self.__segment)
+            self.__condition.notify_all()
+        self.__file = None
+        self.__segment += 1
+        self.__segmentSize = 0
+        self.__segmentHasDeletes = False
+
+    def __send(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__ready or self.__closed)
+                if not self.__ready:
+                    return
+                segment = self.__ready[0]
+            try:
+                self.__pushSegment(segment)
+                self.__checkpoint(segment)
+            except Exception as error:
+                with self.__condition:
+                    self.error = error
+                    self.__condition.notify_all()
+                return
+            with self.__condition:
+                self.__ready.popleft()
+                self.__condition.notify_all()
+
+    def __pushSegment(self, segment: int):
+        documents, deletes = [], []
+        with open(self.__path(segment, _READY), "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as view:
+            start = 0
+            while start < len(view):
+                end = view.find(b"\n", start)
+                records = (
+                    documents if view[start:start + 1] == _ADD_OR_UPDATE else deletes
+                )
+                records.append(view[start + 1:end])
+                start = end + 1
+        self.source.streamSerializedBatchUpdate(self.sourceId, documents, deletes)
+
+    def __checkpoint(self, segment: int):
+        # The checkpoint is replaced atomically before the segment is removed, so a
+        # crash in between never pushes it twice
+        path = os.path.join(self.directory, "checkpoint")
+        with open(f"{path}.tmp", "w") as file:
+            file.write(str(segment))
+            if self.options.fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(f"{path}.tmp", path)
+        os.remove(self.__path(segment, _READY))
+
+    def __recover(self) -> int:
+        """Queue the segments left by a previous process and return the number of the
+        next segment."""
+        try:
+            with open(os.path.join(self.directory, "checkpoint")) as file:
+                acknowledged = int(file.read())
+        except FileNotFoundError:
+            acknowledged = -1
+
+        segments = sorted(
+            (int(match.group(1)), match.group(2))
+            for match in map(_SEGMENT.fullmatch, os.listdir(self.directory))
+            if match
+        )
+        for segment, state in segments:
+            path = self.__path(segment, state)
+            if segment <= acknowledged or (
+                state == _OPEN and not self.__truncateIncompleteRecord(path)
+            ):
+                os.remove(path)
+                continue
+            if state == _OPEN:
+                os.replace(path, self.__path(segment, _READY))
+            self.__ready.append(segment)
+
+        return max([acknowledged, *(segment for segment, _ in segments)]) + 1
+
+    def __truncateIncompleteRecord(self, path: str) -> bool:
+        # The previous process may have died in the middle of a write
+        with open(path, "r+b") as file:
+            size = 0
+            if os.fstat(file.fileno()).st_size > 0:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    size = view.rfind(b"\n") + 1
+            file.truncate(size)
+        return size > 0
+
+    def __path(self, segment: int, state: str) -> str:
+        return os.path.join(self.directory, f"segment-{segment:08d}.{state}")
@@ -0,0 +1,311 @@
+import asyncio
+import json
+import pytest
+import random
+from push_api_clientpy import AsyncPlatformClient, AsyncSource, BackoffOptions, BatchOptions, DocumentBuilder
+from push_api_clientpy import BatchChunkError, CompressionOptions, RetryOptions, RetryPolicy
+
+httpx = pytest.importorskip("httpx")
+
+
+class RecordingTransport:
+    def __init__(self, responses=None):
+        self.requests = []
+        self.responses = responses or {}
+
+    def __call__(self, request):
+        self.requests.append(request)
+        statuses = self.responses.get(request.url.path)
+        status = statuses.pop(0) if statuses else 200
+        if request.url.path.endswith("/files"):
+            return httpx.Response(status, json={"uploadUri": "https://the.upload.uri/", "fileId": "the_file_id", "requiredHeaders": {"foo": "bar"}})
+        return httpx.Response(status, json={})
+
+
+def makeClient(transport, **kwargs):
+    return AsyncPlatformClient("my_key", "my_org", client=httpx.AsyncClient(transport=httpx.MockTransport(transport)), **kwargs)
+
+
+class TestAsyncPlatformClient:
+
+    def testPushDocument(self):
+        transport = RecordingTransport()
+
+        async def run():
+            async with makeClient(transport) as client:
+                return await client.pushDocument("my_source", DocumentBuilder("http://foo.com", "the_title").marshal())
+
+        response = asyncio.run(run())
+
+        request = transport.requests[0]
+        assert response.status_code == 200
+        assert request.method == "PUT"
+        assert str(request.url) == "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents?documentId=http%3A%2F%2Ffoo.com"
+        assert json.loads(request.content).get("title") == "the_title"
+        assert request.headers.get("Authorization") == "Bearer my_key"
+        assert request.headers.get("Content-Type") == "application/json"
+
+    def testRotatingApiKey(self):
+        transport = RecordingTransport()
+        keys = iter(["first_key", "second_key"])
+
+        async def run():
+            client = AsyncPlatformClient(lambda: next(keys), "my_org", client=httpx.AsyncClient(transport=httpx.MockTransport(transport)))
+            async with client:
+                await client.deleteDocument("my_source", "http://foo.com", False)
+                await client.deleteDocument("my_source", "http://foo.com", False)
+
+        asyncio.run(run())
+
+        assert [request.headers.get("Authorization") for request in transport.requests] == ["Bearer first_key", "Bearer second_key"]
+
+    def testDeleteDocument(self):
+        transport = RecordingTransport()
+
+        async def run():
+            async with makeClient(transport) as client:
+                await client.deleteDocument("my_source", "http://foo.com", True)
+
+        asyncio.run(run())
+
+        request = transport.requests[0]
+        assert request.method == "DELETE"
+        assert request.url.params.get("deleteChildren") == "true"
+        assert request.url.params.get("documentId") == "http://foo.com"
+
+    def testRetriesThrottledRequests(self):
+        path = "/push/v1/organizations/my_org/sources/my_source/documents"
+        transport = RecordingTransport({path: [429, 429]})
+
+        async def run():
+            async with makeClient(transport, backoff_options=BackoffOptions(retry_after=0, max_retries=5)) as client:
+                return await client.deleteDocument("my_source", "http://foo.com", True)
+
+        response = asyncio.run(run())
+
+        assert response.status_code == 200
+        assert len(transport.requests) == 3
+
+    def testStopsRetryingAfterMaxRetries(self):
+        path = "/push/v1/organizations/my_org/sources/my_source/documents"
+        transport = RecordingTransport({path: [429] * 10})
+
+        async def run():
+            async with makeClient(transport, backoff_options=BackoffOptions(retry_after=0, max_retries=2)) as client:
+                return await client.deleteDocument("my_source", "http://foo.com", True)
+
+        response = asyncio.run(run())
+
+        assert response.status_code == 429
+        assert len(transport.requests) == 3
+
+    def testRetriesTransientErrors(self):
+        path = "/push/v1/organizations/my_org/sources/my_source/documents"
+        transport = RecordingTransport({path: [500, 503]})
+
+        async def run():
+            async with makeClient(transport, retry_options=RetryOptions(documents=RetryPolicy(backoff=0))) as client:
+                return await client.deleteDocument("my_source", "http://foo.com", True)
+
+        response = asyncio.run(run())
+
+        assert response.status_code == 200
+        assert len(transport.requests) == 3
+
+    def testRetriesConnectionErrors(self):
+        attempts = []
+
+        def handler(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(200, json={})
+
+        async def run():
+            client = AsyncPlatformClient("my_key", "my_org", client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+                                         retry_options=RetryOptions(documents=RetryPolicy(backoff=0)))
+            async with client:
+                return await client.deleteDocument("my_source", "http://foo.com", True)
+
+        response = asyncio.run(run())
+
+        assert response.status_code == 200
+        assert len(attempts) == 2
+
+    def testDoesNotRetryConnectionErrorsWhenDisabled(self):
+        def handler(request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        async def run():
+            policy = RetryPolicy(connection_errors=False)
+            client = AsyncPlatformClient("my_key", "my_org", client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+                                         retry_options=RetryOptions(documents=policy))
+            async with client:
+                return await client.deleteDocument("my_source", "http://foo.com", True)
+
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(run())
+
+    def testDoesNotCloseAPassedClient(self):
+        async def run():
+            httpClient = httpx.AsyncClient(transport=httpx.MockTransport(RecordingTransport()))
+            async with AsyncPlatformClient("my_key", "my_org", client=httpClient):
+                pass
+            closed = httpClient.is_closed
+            await httpClient.aclose()
+            return closed
+
+        assert asyncio.run(run()) is False
+
+    def testClosesItsOwnClient(self):
+        async def run():
+            client = AsyncPlatformClient("my_key", "my_org")
+            async with client:
+                pass
+            return client.client.is_closed
+
+        assert asyncio.run(run()) is True
+
+    def testLimitsConcurrency(self):
+        running = 0
+        maxRunning = 0
+
+        async def handler(request):
+            nonlocal running, maxRunning
+            running += 1
+            maxRunning = max(maxRunning, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            return httpx.Response(200, json={})
+
+        async def run():
+            client = AsyncPlatformClient("my_key", "my_org", max_concurrency=3,
+                                         client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            async with client:
+                await asyncio.gather(*(client.deleteDocument("my_source", f"http://foo.com/{i}", False) for i in range(20)))
+
+        asyncio.run(run())
+
+        assert maxRunning == 3
+
+
+class TestAsyncSource:
+
+    def testStreamBatchUpdate(self):
+        transport = RecordingTransport()
+
+        async def run():
+            source = AsyncSource("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024, max_in_flight=2))
+            source.client = makeClient(transport)
+            async with source:
+                return await source.streamBatchUpdate("my_source", (DocumentBuilder(f"https://foo.com/{i}", "title") for i in range(30)))
+
+        responses = asyncio.run(run())
+
+        uploads = [request for request in transport.requests if request.url.host == "the.upload.uri"]
+        assert len(responses) == len(uploads) > 1
+        assert sum(len(json.loads(upload.content).get("addOrUpdate")) for upload in uploads) == 30
+        assert all(upload.headers.get("foo") == "bar" for upload in uploads)
+
+    def testPushesWithOrderingId(self):
+        transport = RecordingTransport()
+
+        async def run():
+            source = AsyncSource("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024))
+            source.client = makeClient(transport)
+            async with source:
+                await source.addOrUpdateDocument("my_source", DocumentBuilder("https://foo.com", "title"), 1234)
+                await source.deleteDocument("my_source", "https://foo.com", False, 1234)
+                await source.streamBatchUpdate("my_source", (DocumentBuilder(f"https://foo.com/{i}", "title") for i in range(30)),
+                                               orderingId=1234)
+
+        asyncio.run(run())
+
+        pushes = [request for request in transport.requests if request.url.host == "api.cloud.coveo.com"
+                  and not request.url.path.endswith("/files")]
+        assert len(pushes) > 3
+        assert all(request.url.params.get("orderingId") == "1234" for request in pushes)
+
+    def testConcurrentUploadsArePushedInOrder(self):
+        fileIds = iter(range(1000))
+        uploaded = {}
+        pushed = []
+
+        async def handler(request):
+            if request.url.path.endswith("/files"):
+                fileId = str(next(fileIds))
+                return httpx.Response(200, json={"uploadUri": f"https://the.upload.uri/{fileId}", "fileId": fileId})
+            if request.url.host == "the.upload.uri":
+                await asyncio.sleep(random.uniform(0, 0.01))
+                uploaded[request.url.path.strip("/")] = json.loads(request.content)
+                return httpx.Response(200)
+            pushed.extend(item["documentId"] for item in uploaded[request.url.params["fileId"]]["addOrUpdate"])
+            return httpx.Response(202)
+
+        async def run():
+            source = AsyncSource("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024, max_in_flight=4))
+            source.client = AsyncPlatformClient("my_key", "my_org",
+                                                client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            async with source:
+                return await source.streamBatchUpdate("my_source", (DocumentBuilder(f"https://foo.com/{i}", "title") for i in range(60)))
+
+        responses = asyncio.run(run())
+
+        assert len(responses) > 4
+        assert pushed == [f"https://foo.com/{i}" for i in range(60)]
+
+    def testFailedUploadIsNotPushed(self):
+        transport = RecordingTransport({"/": [403]})
+
+        async def run():
+            source = AsyncSource("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024, max_in_flight=2))
+            source.client = makeClient(transport)
+            async with source:
+                return await source.streamBatchUpdate("my_source", (DocumentBuilder(f"https://foo.com/{i}", "title") for i in range(30)))
+
+        with pytest.raises(BatchChunkError) as error:
+            asyncio.run(run())
+
+        assert error.value.index == 0 and error.value.responses == []
+        assert not error.value.uploaded and error.value.response.status_code == 403
+        assert error.value.pending and all(pending.uploaded for pending in error.value.pending)
+        assert not [request for request in transport.requests if request.url.path.endswith("/documents/batch")]
+
+    def testFailedPushRaisesBatchChunkError(self):
+        batch = "/push/v1/organizations/my_org/sources/my_source/documents/batch"
+        transport = RecordingTransport({batch: [202, 400]})
+
+        async def run():
+            source = AsyncSource("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024, max_in_flight=1))
+            source.client = makeClient(transport)
+            async with source:
+                return await source.streamBatchUpdate("my_source", (DocumentBuilder(f"https://foo.com/{i}", "title") for i in range(30)))
+
+        with pytest.raises(BatchChunkError) as error:
+            asyncio.run(run())
+
+        assert error.value.index == 1 and error.value.uploaded
+        assert [response.status_code for response in error.value.responses] == [202]
+        assert next(error.value.remaining, None) is not None
+        assert len([request for request in transport.requests if request.url.path == batch]) == 2
+
+    @pytest.mark.parametrize("compression, cached", [(None, True), (CompressionOptions(threshold=0), False)])
+    def testSerializesWithoutTransformUnlessCompressed(self, monkeypatch, compression, cached):
+        transforms = []
+        serialize = DocumentBuilder.serialize
+
+        def recordingSerialize(docBuilder, transform=None):
+            transforms.append(transform)
+            return serialize(docBuilder, transform)
+
+        monkeypatch.setattr(DocumentBuilder, "serialize", recordingSerialize)
+
+        async def run():
+            source = AsyncSource("my_key", "my_org", compression_options=compression)
+            source.client = makeClient(RecordingTransport())
+            async with source:
+                await source.streamBatchUpdate("my_source", [DocumentBuilder("https://foo.com", "title")])
+
+        asyncio.run(run())
+
+        assert (transforms == [None]) == cached
@@ -0,0 +1,66 @@
+import json
+import pytest
+from push_api_clientpy import BatchChunker, Error, SECURITY_IDENTITY_SECTIONS
+
+
+def payloadOf(chunk):
+    return json.loads(chunk.payload)
+
+
+class TestBatchChunker:
+
+    def testSingleChunkWhenEverythingFits(self):
+        chunks = list(BatchChunker(1024).chunks([b'{"a":1}', b'{"b":2}'], [b'{"c":3}']))
+
+        assert len(chunks) == 1
+        assert payloadOf(chunks[0]) == {"addOrUpdate": [{"a": 1}, {"b": 2}], "delete": [{"c": 3}]}
+        assert chunks[0].documentCount == 2
+        assert chunks[0].deleteCount == 1
+
+    def testNoChunkWhenEmpty(self):
+        assert list(BatchChunker(1024).chunks([], [])) == []
+
+    def testEmptyChunk(self):
+        chunk = BatchChunker(1024).emptyChunk()
+
+        assert payloadOf(chunk) == {"addOrUpdate": [], "delete": []}
+        assert chunk.size == len(chunk.payload)
+        assert chunk.counts == (0, 0)
+
+    def testSplitsWhenMaxSizeIsReached(self):
+        documents = [json.dumps({"id": i}).encode() for i in range(100)]
+        chunks = list(BatchChunker(100).chunks(documents, []))
+
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk.payload) <= 100
+        assert [doc for chunk in chunks for doc in payloadOf(chunk)["addOrUpdate"]] == [{"id": i} for i in range(100)]
+
+    def testChunkSizeIsExact(self):
+        envelope = len(b'{"addOrUpdate":[],"delete":[]}')
+        chunks = list(BatchChunker(envelope + 7).chunks([b'{"a":1}', b'{"b":2}'], []))
+
+        assert len(chunks) == 2
+        assert len(chunks[0].payload) == envelope + 7
+
+    def testItemLargerThanMaxSizeRaises(self):
+        with pytest.raises(Error):
+            list(BatchChunker(40).chunks([b'{"data":"' + b'x' * 40 + b'"}'], []))
+
+    def testChunkReaderStreamsThePayload(self):
+        chunk = next(BatchChunker(1024).chunks([b'{"a":1}', b'{"b":2}'], [b'{"c":3}']))
+        reader = chunk.stream()
+
+        assert len(reader) == len(chunk.payload) == chunk.size
+        streamed = b''
+        while block := reader.read(5):
+            streamed += block
+        assert streamed == chunk.payload
+
+    def testCustomSections(self):
+        chunker = BatchChunker(1024, SECURITY_IDENTITY_SECTIONS)
+        chunks = list(chunker.chunks([b'{"a":1}'], [], [b'{"c":3}', b'{"d":4}']))
+
+        assert payloadOf(chunks[0]) == {"members": [{"a": 1}], "mappings": [], "deleted": [{"c": 3}, {"d": 4}]}
+        assert chunks[0].counts == (1, 0, 2)
+        assert chunks[0].size == len(chunks[0].payload)
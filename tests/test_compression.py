@@ -0,0 +1,67 @@
+import base64
+import gzip
+import json
+import lzma
+import zlib
+import pytest
+from push_api_clientpy import CompressionOptions, DocumentBuilder, Source, compress, compressDocument
+
+
+@pytest.fixture
+def largeDoc():
+    return DocumentBuilder("https://foo.com", "title").withData("searchable words " * 1000).marshal()
+
+
+class TestCompression:
+
+    @pytest.mark.parametrize("compressionType, decompress", [
+        ("GZIP", gzip.decompress),
+        ("ZLIB", zlib.decompress),
+        ("DEFLATE", lambda data: zlib.decompress(data, wbits=-zlib.MAX_WBITS)),
+        ("LZMA", lambda data: lzma.decompress(data, format=lzma.FORMAT_ALONE)),
+    ])
+    def testCompressRoundTrip(self, compressionType, decompress):
+        assert decompress(compress(b"the data" * 100, compressionType)) == b"the data" * 100
+
+    def testCompressDocumentAboveThreshold(self, largeDoc):
+        compressed = compressDocument(largeDoc, CompressionOptions("ZLIB", threshold=1024))
+
+        assert compressed.get("data") is None
+        assert compressed.get("compressionType") == "ZLIB"
+        assert zlib.decompress(base64.b64decode(compressed.get("compressedBinaryData"))).decode() == largeDoc.get("data")
+        assert largeDoc.get("data") is not None
+
+    def testCompressDocumentBelowThreshold(self, largeDoc):
+        assert compressDocument(largeDoc, CompressionOptions(threshold=10 ** 6)) is largeDoc
+
+    def testCompressDocumentWithoutData(self):
+        doc = DocumentBuilder("https://foo.com", "title").marshal()
+        assert compressDocument(doc, CompressionOptions(threshold=0)) is doc
+
+    def testSourceCompressesPushedDocuments(self, requests_mock):
+        adapter = requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents?documentId=https%3A%2F%2Ffoo.com")
+        source = Source("my_key", "my_org", compression_options=CompressionOptions("GZIP", threshold=1024))
+
+        source.addOrUpdateDocument("my_source", DocumentBuilder("https://foo.com", "title").withData("words " * 1000))
+
+        body = adapter.last_request.json()
+        assert body.get("compressionType") == "GZIP"
+        assert gzip.decompress(base64.b64decode(body.get("compressedBinaryData"))).decode() == "words " * 1000
+
+    @pytest.mark.parametrize("workers", [0, 2])
+    def testSourceCompressesBatchedDocuments(self, requests_mock, workers):
+        requests_mock.post("https://api.cloud.coveo.com/push/v1/organizations/my_org/files",
+                           json={"uploadUri": "https://the.upload.uri", "fileId": "the_file_id", "requiredHeaders": {}})
+        upload = requests_mock.put("https://the.upload.uri")
+        requests_mock.put("https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id")
+        source = Source("my_key", "my_org", compression_options=CompressionOptions("GZIP", threshold=1024, workers=workers))
+
+        source.streamBatchUpdate("my_source", [
+            DocumentBuilder(f"https://foo.com/{i}", "title").withData(("words " * 1000) if i % 2 else "short")
+            for i in range(10)])
+
+        docs = json.loads(upload.last_request.body.read()).get("addOrUpdate")
+        assert [doc.get("documentId") for doc in docs] == [f"https://foo.com/{i}" for i in range(10)]
+        assert [doc.get("compressionType") for doc in docs] == [None, "GZIP"] * 5
+        assert [doc.get("data") for doc in docs[::2]] == ["short"] * 5
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from dateutil.parser import ParserError, parse
+import pytest
+from push_api_clientpy import normalizeDate
+
+
+ISO_DATES = [
+    "2000-01-01",
+    "2000-01-01T10:30",
+    "2000-01-01T10:30:15",
+    "2000-01-01 10:30:15",
+    "2000-01-01T10:30:15.5",
+    "2000-01-01T10:30:15.1234567",
+    "2000-01-01T10:30:15Z",
+    "2000-01-01T10:30:15.123+02:00",
+    "2000-01-01T10:30:15-0530",
+    "2000-01-01T10:30:15+05",
+]
+
+
+class TestNormalizeDate:
+
+    @pytest.mark.parametrize("date", ISO_DATES)
+    def testISO8601IsParsedLikeDateutil(self, date):
+        assert normalizeDate(date) == parse(date).isoformat()
+
+    @pytest.mark.parametrize("date", ["2000/01/01", "January 1st, 2000", "20000101", "Sat, 01 Jan 2000 10:30:15 GMT"])
+    def testOtherFormatsFallBackToDateutil(self, date):
+        assert normalizeDate(date) == parse(date).isoformat()
+
+    def testInvalidDateRaises(self):
+        with pytest.raises(ValueError):
+            normalizeDate("2000-02-31")
+
+    @pytest.mark.parametrize("date", ["2000-01-01Z", "2000-01-01 +02:00"])
+    def testOffsetWithoutTimeRaisesLikeDateutil(self, date):
+        with pytest.raises(ParserError):
+            parse(date)
+        with pytest.raises(ParserError):
+            normalizeDate(date)
+
+    def testFormatHint(self):
+        assert normalizeDate("01/02/2000", "%d/%m/%Y") == "2000-02-01T00:00:00"
+
+    def testEpochSeconds(self):
+        assert normalizeDate(1262322000) == datetime.fromtimestamp(1262322000).isoformat()
+        assert normalizeDate(1262322000.5) == datetime.fromtimestamp(1262322000.5).isoformat()
+
+    def testEpochMilliseconds(self):
+        assert normalizeDate(1262322000123) == datetime.fromtimestamp(1262322000.123).isoformat()
+
+    def testDatetime(self):
+        date = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        assert normalizeDate(date) == "2000-01-01T00:00:00+00:00"
+
+    def testUnsupportedTypeRaises(self):
+        with pytest.raises(TypeError):
+            normalizeDate(None)
@@ -1,6 +1,7 @@
 from datetime import datetime
 import hashlib
-from push_api_clientpy import DocumentBuilder, UserSecurityIdentityBuilder
+import pickle
+from push_api_clientpy import DocumentBuilder, Error, UserSecurityIdentityBuilder, generatePermanentIds
 import pytest
 
 
@@ -130,3 +131,71 @@ class TestDocBuilder:
     def testMarshalAuthor(self, docBuilder):
         docBuilder.withAuthor("bob")
         assert docBuilder.marshal().get("author") == "bob"
+
+    def testMarshalDefaultPermissions(self, docBuilder):
+        assert docBuilder.marshal().get("permissions") == [
+            {"allowedPermissions": [], "deniedPermissions": [], "allowAnonymous": True}]
+
+    def testOptionalFieldsAreAllocatedLazily(self, docBuilder, bob):
+        assert docBuilder.document.permissions is None
+        assert docBuilder.document.metadata is None
+        assert docBuilder.document.compressedBinaryData is None
+
+        docBuilder.withAllowedPermissions(bob).withMetadataValue("foo", "bar")
+        assert len(docBuilder.document.permissions) == 1
+        assert docBuilder.document.metadata == {"foo": "bar"}
+
+    def testDocumentIsSlotted(self, docBuilder, bob):
+        docBuilder.withAllowedPermissions(bob).withCompressedBinaryData("eJwrSS0uAQAEXQHB", "ZLIB")
+        document = docBuilder.document
+        assert not hasattr(document, "__dict__")
+        assert not hasattr(document.permissions[0], "__dict__")
+        assert not hasattr(document.permissions[0].allowedPermissions[0], "__dict__")
+        assert not hasattr(document.compressedBinaryData, "__dict__")
+
+    def testDocumentCanBePickled(self, docBuilder, bob):
+        docBuilder.withAllowedPermissions(bob).withMetadataValue("foo", "bar")
+        copy = pickle.loads(pickle.dumps(docBuilder.document))
+        assert copy == docBuilder.document
+        assert hash(copy.permissions[0].allowedPermissions[0]) == hash(docBuilder.document.permissions[0].allowedPermissions[0])
+
+    def testSerializeIsCached(self, docBuilder):
+        docBuilder.withData("the data")
+        assert docBuilder.serialize() is docBuilder.serialize()
+        assert docBuilder.serializedSize() == len(docBuilder.serialize())
+
+    def testMarshalReturnsACopy(self, docBuilder):
+        docBuilder.marshal()["title"] = "changed"
+        assert docBuilder.marshal().get("title") == "title"
+
+    def testSettersInvalidateTheCache(self, docBuilder, bob):
+        serialized = docBuilder.serialize()
+        docBuilder.marshal()
+
+        docBuilder.withData("the data").withAllowedPermissions(bob)
+        assert docBuilder.serialize() != serialized
+        assert docBuilder.marshal().get("data") == "the data"
+        assert docBuilder.marshal().get("permissions")[0].get("allowedPermissions")[0].get("identity") == "bob@acme.inc"
+
+        docBuilder.withMetadata({"foo": "bar"})
+        assert b'"foo":"bar"' in docBuilder.serialize()
+
+    def testMarshalDocumentDateWithFormat(self, docBuilder):
+        docBuilder.withDate("01/02/2000", format="%d/%m/%Y")
+        assert docBuilder.marshal().get("date") == "2000-02-01T00:00:00"
+
+    def testMarshalDocumentDateInvalidType(self, docBuilder):
+        with pytest.raises(Error):
+            docBuilder.withDate(None)
+
+    @pytest.mark.parametrize("value", [float("nan"), float("inf"), [1.0, float("-inf")]])
+    def testNonFiniteMetadataRaises(self, docBuilder, value):
+        with pytest.raises(Error):
+            docBuilder.withMetadataValue("foo", value)
+
+    def testGeneratePermanentIds(self, docBuilder):
+        uris = ["https://foo.com", "https://bar.com", "https://foo.com"]
+        permanentIds = generatePermanentIds(uris)
+
+        assert permanentIds[0] == permanentIds[2] == docBuilder.marshal().get("permanentId")
+        assert permanentIds[1] == DocumentBuilder("https://bar.com", "title").marshal().get("permanentId")
@@ -0,0 +1,95 @@
+import pytest
+import time
+from push_api_clientpy import BackoffOptions, BatchOptions, DocumentBuilder, EndpointOptions, FileContainer, IdentityModel, PushAPIEmulator, RateLimitOptions, SecurityIdentityModel, Source
+
+
+@pytest.fixture
+def emulator():
+    with PushAPIEmulator(retry_after=0.01) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def source(emulator):
+    with Source("my_key", "my_org", endpoint_options=EndpointOptions(platform_url=emulator.url, api_url=emulator.url)) as source:
+        yield source
+
+
+def documents(count):
+    return [DocumentBuilder(f"https://foo.com/{i}", f"title {i}").withData("x" * 100) for i in range(count)]
+
+
+class TestPushAPIEmulator:
+
+    def testCreateSource(self, emulator, source):
+        response = source.create("my_source", "SHARED")
+
+        assert response.status_code == 201
+        assert response.json()["id"] in emulator.sources
+
+    def testPushAndDeleteDocument(self, emulator, source):
+        assert source.addOrUpdateDocument("my_source", documents(1)[0]).status_code == 202
+        assert emulator.sources["my_source"]["https://foo.com/0"]["title"] == "title 0"
+
+        source.deleteDocument("my_source", "https://foo.com/0", False)
+        assert emulator.sources["my_source"] == {}
+
+    def testBatchUpdate(self, emulator, source):
+        source.batch_options = BatchOptions(max_file_container_size=2048)
+        responses = source.streamBatchUpdate("my_source", documents(30))
+
+        assert len(responses) > 1 and all(response.status_code == 202 for response in responses)
+        assert sorted(emulator.sources["my_source"]) == sorted(f"https://foo.com/{i}" for i in range(30))
+        assert len(emulator.fileContainers) == len(responses)
+
+    def testDeletesIgnoreNewerDocuments(self, emulator, source):
+        source.streamBatchUpdate("my_source", documents(2), orderingId=2)
+
+        source.deleteDocument("my_source", "https://foo.com/0", False, orderingId=1)
+        source.deleteDocuments("my_source", ["https://foo.com/1"], orderingId=1)
+        assert sorted(emulator.sources["my_source"]) == ["https://foo.com/0", "https://foo.com/1"]
+
+        source.deleteDocument("my_source", "https://foo.com/0", False, orderingId=3)
+        source.deleteDocuments("my_source", ["https://foo.com/1"], orderingId=2)
+        assert emulator.sources["my_source"] == {}
+
+    def testFileContainersCanBePushedUntilTheyExpire(self, emulator, source):
+        emulator.file_container_ttl = 0.2
+        fileContainer = FileContainer(**source.client.createFileContainer().json())
+        source.client.uploadRawContentToFileContainer(fileContainer, b'{"addOrUpdate": [], "delete": []}')
+
+        assert source.client.pushFileContainerContent("my_source", fileContainer).status_code == 202
+        assert source.client.pushFileContainerContent("my_source", fileContainer).status_code == 202
+        time.sleep(0.3)
+        assert source.client.pushFileContainerContent("my_source", fileContainer).status_code == 404
+        assert emulator.fileContainers == {}
+
+    def testRebuildDeletesOlderDocuments(self, emulator, source):
+        source.streamBatchUpdate("my_source", documents(3), orderingId=1)
+        with source.rebuild("my_source", orderingId=2) as session:
+            session.streamBatchUpdate(documents(2))
+
+        assert sorted(emulator.sources["my_source"]) == ["https://foo.com/0", "https://foo.com/1"]
+        assert emulator.statuses["my_source"] == "IDLE"
+
+    def testSecurityIdentities(self, emulator, source):
+        members = [SecurityIdentityModel(IdentityModel({}, f"user{i}@foo.com", "USER"), [], []) for i in range(3)]
+        source.batchUpdateSecurityIdentities("my_provider", members, orderingId=1)
+
+        assert sorted(emulator.identities["my_provider"]) == ["user0@foo.com", "user1@foo.com", "user2@foo.com"]
+
+    def testRejectsInvalidApiKey(self):
+        with PushAPIEmulator(apikey="the_key") as emulator:
+            source = Source("wrong_key", "my_org", endpoint_options=EndpointOptions(platform_url=emulator.url, api_url=emulator.url))
+            assert source.addOrUpdateDocument("my_source", documents(1)[0]).status_code == 401
+
+    def testThrottledRequestsAreRetried(self):
+        with PushAPIEmulator(max_requests_per_second=2, retry_after=0.2) as emulator:
+            source = Source("my_key", "my_org_throttled", BackoffOptions(max_retries=20),
+                            rate_limit_options=RateLimitOptions(min_rate=10),
+                            endpoint_options=EndpointOptions(platform_url=emulator.url, api_url=emulator.url))
+            responses = [source.addOrUpdateDocument("my_source", doc) for doc in documents(4)]
+
+        assert all(response.status_code == 202 for response in responses)
+        assert emulator.throttled > 0
+        assert len(emulator.sources["my_source"]) == 4
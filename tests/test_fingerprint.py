@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+from push_api_clientpy import FingerprintStore, fingerprint
+
+
+class TestFingerprintStore:
+
+    def testFingerprintIsStable(self):
+        assert fingerprint(b'{"a":1}') == fingerprint(b'{"a":1}')
+        assert fingerprint(b'{"a":1}') != fingerprint(b'{"a":2}')
+
+    def testUnknownDocumentsAreChanged(self):
+        store = FingerprintStore()
+        assert store.changed("my_source", [("doc", fingerprint(b'1'))]) == [True]
+
+    def testRecordedDocumentsAreUnchanged(self):
+        store = FingerprintStore()
+        store.record("my_source", [("doc", fingerprint(b'1'))])
+
+        assert store.changed("my_source", [("doc", fingerprint(b'1')), ("doc", fingerprint(b'2'))]) == [False, True]
+        assert store.changed("other_source", [("doc", fingerprint(b'1'))]) == [True]
+
+    def testDocumentsNotSeenDuringARunAreStale(self):
+        store = FingerprintStore()
+        store.record("my_source", [("a", fingerprint(b'1')), ("b", fingerprint(b'2'))], store.beginRun("my_source"))
+
+        run = store.beginRun("my_source")
+        assert run == 2
+        store.changed("my_source", [("a", fingerprint(b'1'))], run)
+
+        assert store.stale("my_source", run) == ["b"]
+
+    def testForget(self):
+        store = FingerprintStore()
+        store.record("my_source", [("doc", fingerprint(b'1'))])
+        store.forget("my_source", ["doc"])
+
+        assert store.changed("my_source", [("doc", fingerprint(b'1'))]) == [True]
+
+    def testCanBeUsedFromOtherThreads(self):
+        store = FingerprintStore()
+
+        def recordAndCheck(i):
+            store.record("my_source", [(f"doc{i}", fingerprint(b'1'))])
+            return store.changed("my_source", [(f"doc{i}", fingerprint(b'1'))])
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            assert list(executor.map(recordAndCheck, range(100))) == [[False]] * 100
+        assert store.stale("my_source", 1) == sorted(f"doc{i}" for i in range(100))
+
+    def testPersistsOnDisk(self, tmp_path):
+        path = str(tmp_path / "fingerprints.db")
+        with FingerprintStore(path) as store:
+            store.record("my_source", [("doc", fingerprint(b'1'))])
+
+        with FingerprintStore(path) as store:
+            assert store.changed("my_source", [("doc", fingerprint(b'1'))]) == [False]
@@ -0,0 +1,60 @@
+import importlib
+import pytest
+import subprocess
+import sys
+import push_api_clientpy
+from push_api_clientpy import _EXPORTS
+
+
+def importedModules(statement):
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    return subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout.split()
+
+
+class TestInit:
+
+    def testDocumentBuilderDoesNotLoadTheHTTPStack(self):
+        modules = importedModules("from push_api_clientpy import DocumentBuilder")
+
+        for heavy in ("requests", "urllib3", "httpx", "http.server", "dateutil.parser", "push_api_clientpy.platformclient"):
+            assert heavy not in modules
+
+    def testSourceLoadsTheHTTPStack(self):
+        modules = importedModules("from push_api_clientpy import Source")
+
+        assert "requests" in modules
+
+    def testExportsMatchTheSubmodules(self):
+        for module, names in _EXPORTS.items():
+            submodule = importlib.import_module(f"push_api_clientpy.{module}")
+            for name in names:
+                assert getattr(push_api_clientpy, name) is getattr(submodule, name)
+
+    def testEveryClassAndFunctionIsExported(self):
+        for module, names in _EXPORTS.items():
+            submodule = importlib.import_module(f"push_api_clientpy.{module}")
+            defined = {name for name, value in vars(submodule).items()
+                       if not name.startswith("_") and getattr(value, "__module__", None) == submodule.__name__}
+            assert defined <= set(names)
+
+    def testFingerprintIsTheFunction(self):
+        importlib.import_module("push_api_clientpy.fingerprint")
+
+        assert callable(push_api_clientpy.fingerprint)
+
+    def testStarImport(self):
+        namespace = {}
+        exec("from push_api_clientpy import *", namespace)
+
+        for name in ("DocumentBuilder", "Source", "PlatformClient", "fingerprint", "normalizeDate"):
+            assert namespace[name] is getattr(push_api_clientpy, name)
+
+    def testUnknownNamesRaise(self):
+        with pytest.raises(AttributeError):
+            push_api_clientpy.Optional
+
+    def testVersion(self):
+        assert push_api_clientpy.__version__ == importlib.import_module("importlib.metadata").version("coveo-push-api-client.py")
+
+    def testDir(self):
+        assert {"DocumentBuilder", "PlatformClient", "__version__"} <= set(dir(push_api_clientpy))
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from push_api_clientpy.pipeline import batched, mapInOrder
+
+
+class TestPipeline:
+
+    def testMapInOrderPreservesOrder(self):
+        def slowWhenEven(i):
+            time.sleep(0.01 if i % 2 == 0 else 0)
+            return i * 2
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            assert list(mapInOrder(executor, slowWhenEven, range(10), 4)) == [i * 2 for i in range(10)]
+
+    def testMapInOrderBoundsCallsInFlight(self):
+        lock = threading.Lock()
+        running = 0
+        maxRunning = 0
+
+        def track(i):
+            nonlocal running, maxRunning
+            with lock:
+                running += 1
+                maxRunning = max(maxRunning, running)
+            time.sleep(0.005)
+            with lock:
+                running -= 1
+            return i
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(mapInOrder(executor, track, range(20), 2))
+
+        assert maxRunning <= 2
+
+    def testMapInOrderConsumesLazily(self):
+        consumed = []
+
+        def produce():
+            for i in range(10):
+                consumed.append(i)
+                yield i
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = mapInOrder(executor, lambda i: i, produce(), 2)
+            next(results)
+            assert len(consumed) <= 3
+
+    def testBatched(self):
+        assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+        assert list(batched([], 3)) == []
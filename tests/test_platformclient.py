@@ -1,5 +1,8 @@
 import pytest
-from push_api_clientpy import IdentityModel, PlatformClient, SecurityIdentityModel, SecurityIdentityAliasModel, AliasMapping, SecurityIdentityDelete, DocumentBuilder, BatchDelete, BatchUpdateDocuments, FileContainer, SecurityIdentityBatchConfig, BackoffOptions
+from push_api_clientpy import IdentityModel, PlatformClient, SecurityIdentityModel, SecurityIdentityAliasModel, AliasMapping, SecurityIdentityDelete, DocumentBuilder, BatchDelete, BatchUpdateDocuments, FileContainer, SecurityIdentityBatchConfig, BackoffOptions, ConnectionOptions, EndpointOptions, RateLimitOptions, RetryOptions, RetryPolicy
+from push_api_clientpy import platformclient
+import io
+import requests
 
 
 @pytest.fixture
@@ -176,9 +179,221 @@ class TestPlatformClient:
         assertAuthHeader(adapter)
         assertContentTypeHeaders(adapter)
 
+    def testDeleteOlderThan(self, client, requests_mock):
+        adapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/olderthan?orderingId=123&queueDelay=15")
+        client.deleteOlderThan("my_source", 123, 15)
+
+        assert adapter.called_once
+        assertAuthHeader(adapter)
+        assertContentTypeHeaders(adapter)
+
+    def testUpdateSourceStatus(self, client, requests_mock):
+        adapter = requests_mock.post(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status?statusType=REBUILD")
+        client.updateSourceStatus("my_source", "REBUILD")
+
+        assert adapter.called_once
+        assertAuthHeader(adapter)
+        assertContentTypeHeaders(adapter)
+
+    def testPushesWithOrderingId(self, client, requests_mock, doc, fileContainer):
+        pushAdapter = requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents?documentId=http%3A%2F%2Ffoo.com&orderingId=123")
+        deleteAdapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents?documentId=http%3A%2F%2Ffoo.com&orderingId=123")
+        batchAdapter = requests_mock.put(
+            f"https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId={fileContainer.fileId}&orderingId=123")
+
+        client.pushDocument("my_source", doc, 123)
+        client.deleteDocument("my_source", "http://foo.com", False, 123)
+        client.pushFileContainerContent("my_source", fileContainer, 123)
+
+        assert pushAdapter.called_once and deleteAdapter.called_once and batchAdapter.called_once
+
+    @pytest.mark.parametrize("environment,region,platformURL,apiURL", [
+        ("prod", "us", "https://platform.cloud.coveo.com", "https://api.cloud.coveo.com"),
+        ("prod", "eu", "https://platform-eu.cloud.coveo.com", "https://api-eu.cloud.coveo.com"),
+        ("dev", "au", "https://platformdev-au.cloud.coveo.com", "https://apidev-au.cloud.coveo.com"),
+        ("hipaa", "us", "https://platformhipaa.cloud.coveo.com", "https://apihipaa.cloud.coveo.com"),
+    ])
+    def testEndpointOptions(self, environment, region, platformURL, apiURL):
+        options = EndpointOptions(environment=environment, region=region)
+        assert options.platformURL() == platformURL
+        assert options.apiURL() == apiURL
+
+    def testEndpointOptionsOverride(self):
+        options = EndpointOptions(region="eu", api_url="http://localhost:8080")
+        assert options.apiURL() == "http://localhost:8080"
+        assert options.platformURL() == "https://platform-eu.cloud.coveo.com"
+
+    def testRequestsGoToTheRegion(self, requests_mock):
+        pushAdapter = requests_mock.post("https://api-eu.cloud.coveo.com/push/v1/organizations/my_org/files")
+        sourceAdapter = requests_mock.post("https://platform-eu.cloud.coveo.com/rest/organizations/my_org/sources")
+        client = PlatformClient("my_key", "my_org", endpoint_options=EndpointOptions(region="eu"))
+
+        client.createFileContainer()
+        client.createSource("my_source", "SHARED")
+
+        assert pushAdapter.called_once and sourceAdapter.called_once
+
+    def testRotatingApiKey(self, requests_mock):
+        adapter = requests_mock.post("https://api.cloud.coveo.com/push/v1/organizations/my_org/files")
+        keys = iter(["first_key", "second_key"])
+        client = PlatformClient(lambda: next(keys), "my_org")
+
+        client.createFileContainer()
+        client.createFileContainer()
+
+        assert [request.headers.get("Authorization") for request in adapter.request_history] == ["Bearer first_key", "Bearer second_key"]
+        assert adapter.last_request.headers.get("User-Agent") == f"CoveoSDKPython/{client.version}"
+
+    def testClientVersionIsLookedUpOnce(self, monkeypatch):
+        platformclient.clientVersion.cache_clear()
+        calls = []
+        monkeypatch.setattr(platformclient.importlib.metadata, "version", lambda name: calls.append(name) or "1.2.3")
+
+        PlatformClient("my_key", "my_org")
+        PlatformClient("my_key", "my_org")
+        platformclient.clientVersion.cache_clear()
+
+        assert calls == ["coveo-push-api-client.py"]
+
     def testRetryMechanismOptions(self):
         new_client = PlatformClient("my_key", "my_org", BackoffOptions(retry_after=100, max_retries=10))
 
         retry = new_client.retries
         assert retry.total == 10
         assert retry.backoff_factor == 100
+
+    def testEachClientOwnsItsSession(self):
+        first = PlatformClient("my_key", "my_org", BackoffOptions(max_retries=1))
+        second = PlatformClient("my_key", "my_org", BackoffOptions(max_retries=2))
+
+        assert first.session is not second.session
+        assert first.retries.total == 1
+        assert second.retries.total == 2
+
+    def testAdaptersDoNotRetry(self):
+        client = PlatformClient("my_key", "my_org")
+
+        for prefix in ("https://", "http://"):
+            assert client.session.get_adapter(prefix).max_retries.total == 0
+
+    def testConnectionPoolOptions(self):
+        new_client = PlatformClient("my_key", "my_org", connection_options=ConnectionOptions(
+            pool_connections=3, pool_maxsize=64, pool_block=True, keep_alive=False))
+
+        adapter = new_client.session.get_adapter("https://")
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 64
+        assert adapter._pool_block == True
+        assert new_client.session.headers.get("Connection") == "close"
+
+    def testCloseOnlyClosesOwnedSession(self):
+        session = requests.Session()
+        closed = []
+        session.close = lambda: closed.append(True)
+
+        with PlatformClient("my_key", "my_org", session=session):
+            pass
+        assert closed == []
+
+        owned = PlatformClient("my_key", "my_org")
+        owned.session.close = lambda: closed.append(True)
+        with owned:
+            pass
+        assert closed == [True]
+
+    def testThrottledRequestHonorsRetryAfter(self, requests_mock, monkeypatch):
+        slept = []
+        monkeypatch.setattr(platformclient.time, "sleep", slept.append)
+        throttled = PlatformClient(
+            "my_key", "throttled_org", BackoffOptions(retry_after=1, max_retries=5), rate_limit_options=RateLimitOptions())
+        adapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/throttled_org/sources/my_source/documents",
+            [{"status_code": 429, "headers": {"Retry-After": "0"}}, {"status_code": 429}, {"status_code": 429}, {"status_code": 200}])
+
+        response = throttled.deleteDocument("my_source", "http://foo.com", True)
+
+        assert response.status_code == 200
+        assert adapter.call_count == 4
+        assert slept == [2, 4]
+        assert throttled.rate_limiter.rate < RateLimitOptions().initial_rate
+
+    def testRateLimitingIsDisabledByDefault(self):
+        assert PlatformClient("my_key", "my_org").rate_limiter is None
+
+    def testRateLimiterIsSharedOnlyWhenPassed(self):
+        first = PlatformClient("my_key", "my_org", rate_limit_options=RateLimitOptions())
+        second = PlatformClient("my_key", "my_org", rate_limit_options=RateLimitOptions())
+        shared = PlatformClient("my_key", "my_org", rate_limiter=first.rate_limiter)
+
+        assert first.rate_limiter is not second.rate_limiter
+        assert shared.rate_limiter is first.rate_limiter
+
+    def testThrottledRequestWithoutRateLimiter(self, requests_mock, monkeypatch):
+        slept = []
+        monkeypatch.setattr(platformclient.time, "sleep", slept.append)
+        unlimited = PlatformClient("my_key", "my_org", BackoffOptions(retry_after=1, max_retries=5), rate_limit_options=None)
+        adapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents",
+            [{"status_code": 429, "headers": {"Retry-After": "3"}}, {"status_code": 429}, {"status_code": 200}])
+
+        response = unlimited.deleteDocument("my_source", "http://foo.com", True)
+
+        assert unlimited.rate_limiter is None
+        assert response.status_code == 200
+        assert adapter.call_count == 3
+        assert slept == [3, 2]
+
+    def testThrottledRequestStopsAtTimeBudget(self, requests_mock, monkeypatch):
+        monkeypatch.setattr(platformclient.time, "sleep", lambda seconds: None)
+        throttled = PlatformClient("my_key", "budget_org", BackoffOptions(retry_after=100, max_retries=50, time_budget=100))
+        adapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/budget_org/sources/my_source/documents", status_code=429)
+
+        response = throttled.deleteDocument("my_source", "http://foo.com", True)
+
+        assert response.status_code == 429
+        # Retried immediately once, then the next backoff (120s) exceeds the budget
+        assert adapter.call_count == 2
+
+    def testTransientErrorsAreRetriedPerOperation(self, requests_mock):
+        retrying = PlatformClient("my_key", "my_org", retry_options=RetryOptions(documents=RetryPolicy(max_retries=3, backoff=0)))
+        adapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents",
+            [{"exc": requests.exceptions.ConnectionError}, {"status_code": 503}, {"status_code": 502}, {"status_code": 200}])
+
+        response = retrying.deleteDocument("my_source", "http://foo.com", True)
+
+        assert response.status_code == 200
+        assert adapter.call_count == 4
+
+    def testTransientErrorsStopAtMaxRetries(self, requests_mock):
+        retrying = PlatformClient("my_key", "my_org", retry_options=RetryOptions(documents=RetryPolicy(max_retries=2, backoff=0)))
+        adapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents", status_code=504)
+
+        assert retrying.deleteDocument("my_source", "http://foo.com", True).status_code == 504
+        assert adapter.call_count == 3
+
+    def testCreateSourceIsNotRetried(self, requests_mock):
+        adapter = requests_mock.post(
+            "https://platform.cloud.coveo.com/rest/organizations/my_org/sources", status_code=503)
+
+        assert PlatformClient("my_key", "my_org").createSource("my_source", "SHARED").status_code == 503
+        assert adapter.call_count == 1
+
+    def testUploadIsRetriedWithAFreshStream(self, requests_mock, fileContainer):
+        retrying = PlatformClient("my_key", "my_org", retry_options=RetryOptions(file_container_upload=RetryPolicy(backoff=0)))
+        adapter = requests_mock.put(fileContainer.uploadUri, [{"status_code": 500}, {"status_code": 200}])
+        streams = []
+
+        def stream():
+            streams.append(io.BytesIO(b"the content"))
+            return streams[-1]
+
+        assert retrying.uploadRawContentToFileContainer(fileContainer, stream).status_code == 200
+        assert adapter.call_count == 2
+        assert len(streams) == 2
@@ -0,0 +1,95 @@
+import gc
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import pytest
+from push_api_clientpy import RateLimiter, RateLimitOptions, parseRetryAfter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def makeLimiter(clock, **options):
+    return RateLimiter(RateLimitOptions(**options), clock=clock, sleep=clock.sleep)
+
+
+class TestRateLimiter:
+
+    def testBurstIsNotDelayed(self, clock):
+        limiter = makeLimiter(clock, initial_rate=10, burst=5)
+        for _ in range(5):
+            limiter.acquire()
+        assert clock.slept == []
+
+    def testRequestsAreSpacedOnceBurstIsSpent(self, clock):
+        limiter = makeLimiter(clock, initial_rate=10, burst=1)
+        for _ in range(11):
+            limiter.acquire()
+        assert clock.now == pytest.approx(1.0)
+
+    def testThrottleDecreasesRate(self, clock):
+        limiter = makeLimiter(clock, initial_rate=10, min_rate=3, multiplicative_decrease=0.5)
+        limiter.onThrottle()
+        assert limiter.rate == 5
+        limiter.onThrottle()
+        assert limiter.rate == 3
+
+    def testSuccessIncreasesRateUpToMax(self, clock):
+        limiter = makeLimiter(clock, initial_rate=4, max_rate=5, additive_increase=2)
+        limiter.onSuccess()
+        assert limiter.rate == 4.5
+        for _ in range(10):
+            limiter.onSuccess()
+        assert limiter.rate == 5
+
+    def testRetryAfterPausesAllRequests(self, clock):
+        limiter = makeLimiter(clock, initial_rate=100, burst=10)
+        limiter.onThrottle(retryAfter=30)
+        limiter.acquire()
+        assert clock.now == pytest.approx(30)
+
+    def testLimiterIsSharedPerOrganizationAndPlatform(self):
+        limiter = RateLimiter.forOrganization("https://api.cloud.coveo.com", "shared_org")
+        assert RateLimiter.forOrganization("https://api.cloud.coveo.com", "shared_org") is limiter
+        assert RateLimiter.forOrganization("https://api.cloud.coveo.com", "another_org") is not limiter
+        assert RateLimiter.forOrganization("https://apidev.cloud.coveo.com", "shared_org") is not limiter
+
+    def testSharedLimiterRejectsOtherOptions(self):
+        limiter = RateLimiter.forOrganization("https://api.cloud.coveo.com", "conflicting_org")
+        with pytest.raises(ValueError):
+            RateLimiter.forOrganization("https://api.cloud.coveo.com", "conflicting_org", RateLimitOptions(max_rate=10))
+        assert RateLimiter.forOrganization("https://api.cloud.coveo.com", "conflicting_org", RateLimitOptions()) is limiter
+
+    def testSharedLimiterIsReleasedWithItsLastHolder(self):
+        limiter = RateLimiter.forOrganization("https://api.cloud.coveo.com", "released_org", RateLimitOptions(max_rate=10))
+        del limiter
+        gc.collect()
+        assert RateLimiter.forOrganization("https://api.cloud.coveo.com", "released_org").options == RateLimitOptions()
+
+
+class TestParseRetryAfter:
+
+    def testSeconds(self):
+        assert parseRetryAfter("12") == 12
+
+    def testHttpDate(self):
+        value = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+        assert 55 < parseRetryAfter(value) <= 60
+
+    @pytest.mark.parametrize("value", [None, "", "soon"])
+    def testMissingOrInvalid(self, value):
+        assert parseRetryAfter(value) is None
@@ -1,3 +1,5 @@
+import dataclasses
+import pytest
 from push_api_clientpy.securityidentitybuilder import GroupSecurityIdentityBuilder, UserSecurityIdentityBuilder, VirtualGroupSecurityIdentityBuilder
 
 
@@ -38,3 +40,14 @@ class TestSecurityIdentityBuilder:
         group = VirtualGroupSecurityIdentityBuilder(["first", "second"], "my provider")
         assert group.build()[0].identity == "first"
         assert group.build()[1].identity == "second"
+
+    def testIdenticalIdentitiesAreShared(self):
+        first = GroupSecurityIdentityBuilder(["first", "second"], "my provider").build()
+        second = GroupSecurityIdentityBuilder("first", "my provider").build()
+        assert first[0] is second
+        assert first[1] is not second
+
+    def testSharedIdentitiesAreImmutable(self):
+        identity = UserSecurityIdentityBuilder("the_identity").build()
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            identity.identity = "another"
@@ -0,0 +1,92 @@
+from dataclasses import asdict
+import json
+import pytest
+from push_api_clientpy import CompressionOptions, DocumentBuilder, GroupSecurityIdentityBuilder, UserSecurityIdentityBuilder, compressDocument, marshalDocument, serializeDocument, toJSONBytes
+from push_api_clientpy import serializer
+from push_api_clientpy.document import CompressedBinaryData, Permission
+
+
+def legacyMarshal(document):
+    # Reference implementation based on dataclasses.asdict, which marshalDocument replaces.
+    # Lazily allocated fields are given the values the document model used to allocate eagerly.
+    withoutEmptyValue = {k: v for k, v in asdict(document).items() if v != ""}
+    withoutEmptyValue['permissions'] = withoutEmptyValue['permissions'] or [asdict(Permission())]
+    compressedBinaryData = document.compressedBinaryData or CompressedBinaryData()
+    for k, v in (document.metadata or {}).items():
+        withoutEmptyValue[k] = v
+    del withoutEmptyValue['metadata']
+    withoutEmptyValue['documentId'] = document.uri
+    del withoutEmptyValue['uri']
+    if compressedBinaryData.data != "":
+        withoutEmptyValue['compressedBinaryData'] = compressedBinaryData.data
+        withoutEmptyValue['compressionType'] = compressedBinaryData.compressionType
+    else:
+        del withoutEmptyValue['compressedBinaryData']
+    return withoutEmptyValue
+
+
+def documents():
+    yield DocumentBuilder("https://foo.com", "title")
+    yield DocumentBuilder("https://foo.com/é", "titre élevé").withData("données")\
+        .withAuthor("bob").withClickableUri("https://click.com").withDate("2000/01/01")\
+        .withModifiedDate(1262322000).withFileExtension(".html").withParentId("parent")\
+        .withMetadata({"foo": "bar", "numbers": [1, 2], "ratio": 0.5, "title": "overridden"})\
+        .withAllowedPermissions(UserSecurityIdentityBuilder(["bob@acme.inc", "alice@acme.inc"]))\
+        .withDeniedPermissions(GroupSecurityIdentityBuilder("group", "provider"))\
+        .withAllowAnonymousUsers(False)
+    yield DocumentBuilder("https://foo.com/binary", "binary").withCompressedBinaryData("eJzLSM3JyQcABiwCFQ==", "ZLIB")\
+        .withPermanentId("the_id").withMetadataValue("uri", "shadowed")
+
+
+class TestSerializer:
+
+    @pytest.mark.parametrize("docBuilder", list(documents()))
+    def testMarshalDocumentMatchesAsdict(self, docBuilder):
+        docBuilder.marshal()
+        marshaled = marshalDocument(docBuilder.document)
+        expected = legacyMarshal(docBuilder.document)
+
+        assert list(marshaled.keys()) == list(expected.keys())
+        assert json.dumps(marshaled) == json.dumps(expected)
+
+    @pytest.mark.parametrize("docBuilder", list(documents()))
+    def testToJSONBytesBackendsAgree(self, docBuilder, monkeypatch):
+        marshaled = docBuilder.marshal()
+        accelerated = toJSONBytes(marshaled)
+        monkeypatch.setattr(serializer, "orjson", None)
+
+        assert toJSONBytes(marshaled) == accelerated
+        assert json.loads(accelerated) == marshaled
+
+    @pytest.mark.parametrize("value", [1e16, 1e-7, 0.1, -2.5])
+    def testToJSONBytesFloats(self, value, monkeypatch):
+        accelerated = toJSONBytes({"value": value, "none": None})
+        monkeypatch.setattr(serializer, "orjson", None)
+
+        assert json.loads(accelerated) == json.loads(toJSONBytes({"value": value, "none": None}))
+        assert json.loads(accelerated) == {"value": value, "none": None}
+
+    def testToJSONBytesKeepsNullValues(self):
+        value = {"none": None, "body": "null", "uri": "https://foo.com/null"}
+
+        assert json.loads(toJSONBytes(value)) == value
+
+    def testToJSONBytesHugeIntegers(self):
+        assert toJSONBytes({"big": 2 ** 70}) == b'{"big":1180591620717411303424}'
+
+    @pytest.mark.parametrize("docBuilder", list(documents()))
+    def testSerializeDocumentMatchesMarshal(self, docBuilder):
+        assert docBuilder.serialize() == toJSONBytes(docBuilder.marshal())
+
+    def testSerializeDocumentWithTransform(self):
+        docBuilder = DocumentBuilder("https://foo.com", "title").withData("words " * 100)\
+            .withAllowedPermissions(UserSecurityIdentityBuilder("bob@acme.inc"))
+
+        def compress(doc):
+            return compressDocument(doc, CompressionOptions(threshold=0))
+
+        assert docBuilder.serialize(compress) == toJSONBytes(compress(docBuilder.marshal()))
+
+    def testSerializeDocumentWithPermissionsOnly(self):
+        document = DocumentBuilder("", "").document
+        assert serializeDocument(document) == toJSONBytes(marshalDocument(document))
@@ -0,0 +1,549 @@
+import itertools
+import json
+import pytest
+import random
+import re
+import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from push_api_clientpy import documentbuilder, serializer, source as source_module
+from push_api_clientpy import Source, DocumentBuilder, BatchUpdate, BatchDelete, BatchChunker, BatchOptions, BatchChunkError, RetryOptions, RetryPolicy
+from push_api_clientpy import Error, FingerprintStore, fingerprint, IdentityModel, SecurityIdentityDelete, SecurityIdentityModel
+
+
+def recordPools(monkeypatch):
+    pools = []
+
+    class RecordingPool(ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.closed = False
+            pools.append(self)
+
+        def shutdown(self, *args, **kwargs):
+            self.closed = True
+            super().shutdown(*args, **kwargs)
+
+    monkeypatch.setattr(source_module, "ProcessPoolExecutor", RecordingPool)
+    return pools
+
+
+@pytest.fixture
+def fileContainerAdapter(requests_mock):
+    return requests_mock.post(
+        "https://api.cloud.coveo.com/push/v1/organizations/my_org/files",
+        json={"uploadUri": "https://the.upload.uri", "fileId": "the_file_id", "requiredHeaders": {"foo": "bar"}})
+
+
+@pytest.fixture
+def uploadAdapter(requests_mock):
+    return requests_mock.put("https://the.upload.uri")
+
+
+@pytest.fixture
+def pushAdapter(requests_mock):
+    return requests_mock.put(
+        "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id", json={})
+
+
+def uploadedBody(request):
+    return json.loads(request.body.read())
+
+
+def documents(count):
+    return [DocumentBuilder(f"https://foo.com/{i}", f"title {i}").withData("x" * 100) for i in range(count)]
+
+
+class TestSource:
+
+    def testBatchUpdateDocumentsSingleFileContainer(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        source = Source("my_key", "my_org")
+        response = source.batchUpdateDocuments("my_source", BatchUpdate(
+            addOrUpdate=documents(2), delete=[BatchDelete("https://foo.com/3", True)]))
+
+        assert response.status_code == 200
+        assert fileContainerAdapter.call_count == 1
+        body = uploadedBody(uploadAdapter.last_request)
+        assert [doc.get("documentId") for doc in body.get("addOrUpdate")] == ["https://foo.com/0", "https://foo.com/1"]
+        assert body.get("delete") == [{"documentId": "https://foo.com/3", "deleteChildren": True}]
+        assert uploadAdapter.last_request.headers.get("foo") == "bar"
+
+    def testBatchUpdateDocumentsSplitsAcrossFileContainers(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        source = Source("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024))
+        response = source.batchUpdateDocuments("my_source", BatchUpdate(addOrUpdate=documents(20), delete=[]))
+
+        assert response.status_code == 200
+        assert fileContainerAdapter.call_count == pushAdapter.call_count == uploadAdapter.call_count > 1
+        pushed = []
+        for request in uploadAdapter.request_history:
+            assert len(request.body) <= 1024
+            pushed.extend(doc.get("documentId") for doc in uploadedBody(request).get("addOrUpdate"))
+        assert pushed == [f"https://foo.com/{i}" for i in range(20)]
+
+    def testBatchUpdateDocumentsPushesAnEmptyBatch(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        response = Source("my_key", "my_org").batchUpdateDocuments("my_source", BatchUpdate(addOrUpdate=[], delete=[]))
+
+        assert response.status_code == 200
+        assert uploadedBody(uploadAdapter.last_request) == {"addOrUpdate": [], "delete": []}
+
+    def testStreamBatchUpdateConsumesGenerators(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        source = Source("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024))
+        generatedDocuments = (DocumentBuilder(f"https://foo.com/{i}", "title") for i in range(30))
+        generatedDeletes = (BatchDelete(f"https://bar.com/{i}", False) for i in range(30))
+
+        responses = source.streamBatchUpdate("my_source", generatedDocuments, generatedDeletes)
+
+        bodies = [uploadedBody(request) for request in uploadAdapter.request_history]
+        assert len(responses) == len(bodies) > 1
+        assert sum(len(body.get("addOrUpdate")) for body in bodies) == 30
+        assert sum(len(body.get("delete")) for body in bodies) == 30
+
+    def testStreamBatchUpdateConcurrently(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        source = Source("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024, max_in_flight=3))
+        responses = source.streamBatchUpdate("my_source", documents(40))
+
+        assert len(responses) > 3
+        assert pushAdapter.call_count == len(responses)
+        pushed = sorted(doc.get("documentId") for request in uploadAdapter.request_history
+                        for doc in uploadedBody(request).get("addOrUpdate"))
+        assert pushed == sorted(f"https://foo.com/{i}" for i in range(40))
+
+    def testConcurrentUploadsArePushedInOrder(self, requests_mock):
+        created = itertools.count()
+        uploads = {}
+        pushed = []
+
+        def createFileContainer(request, context):
+            fileId = f"file{next(created)}"
+            return {"uploadUri": f"https://the.upload.uri/{fileId}", "fileId": fileId, "requiredHeaders": {}}
+
+        def upload(request, context):
+            time.sleep(random.uniform(0, 0.02))
+            uploads[request.path.rsplit("/", 1)[-1]] = json.loads(request.body.read())
+            return ""
+
+        def push(request, context):
+            pushed.append(request.qs["fileid"][0])
+            return {}
+
+        requests_mock.post("https://api.cloud.coveo.com/push/v1/organizations/my_org/files", json=createFileContainer)
+        requests_mock.put(re.compile("https://the.upload.uri/"), text=upload)
+        requests_mock.put("https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch",
+                          json=push)
+        source = Source("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024, max_in_flight=4))
+
+        source.streamBatchUpdate("my_source", documents(40), (BatchDelete(f"https://foo.com/{i}", False) for i in range(40)))
+
+        assert len(pushed) > 4
+        pushedItems = [(section, item["documentId"]) for fileId in pushed
+                       for section in ("addOrUpdate", "delete") for item in uploads[fileId][section]]
+        assert pushedItems == ([("addOrUpdate", f"https://foo.com/{i}") for i in range(40)]
+                               + [("delete", f"https://foo.com/{i}") for i in range(40)])
+
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def testStreamBatchUpdateWithMarshalWorkers(self, fileContainerAdapter, uploadAdapter, pushAdapter, executor):
+        source = Source("my_key", "my_org", batch_options=BatchOptions(marshal_workers=2, marshal_executor=executor))
+        expected = b"".join(docBuilder.serialize() for docBuilder in documents(600))
+
+        source.streamBatchUpdate("my_source", documents(600))
+
+        body = uploadAdapter.last_request.body.read()
+        assert body.startswith(b'{"addOrUpdate":[' + expected[:100])
+        assert [doc.get("documentId") for doc in json.loads(body).get("addOrUpdate")] == [f"https://foo.com/{i}" for i in range(600)]
+
+    def testMarshalWorkersAreReusedUntilClosed(self, fileContainerAdapter, uploadAdapter, pushAdapter, monkeypatch):
+        pools = recordPools(monkeypatch)
+        with Source("my_key", "my_org", batch_options=BatchOptions(marshal_workers=2)) as source:
+            source.streamBatchUpdate("my_source", documents(10))
+            source.streamBatchUpdate("my_source", documents(10))
+            assert len(pools) == 1 and not pools[0].closed
+
+        assert pools[0].closed
+
+    def testFingerprintedDocumentsAreSerializedOnce(self, fileContainerAdapter, uploadAdapter, pushAdapter, requests_mock,
+                                                    monkeypatch):
+        requests_mock.put("https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents", json={})
+        pools = recordPools(monkeypatch)
+        serialized = []
+
+        def serializeDocument(document, transform=None):
+            serialized.append(document.uri)
+            return serializer.serializeDocument(document, transform)
+
+        def marshalDocument(document):
+            raise AssertionError("the serialized document should be reused")
+
+        fingerprintThreads = set()
+
+        def recordingFingerprint(payload):
+            fingerprintThreads.add(threading.current_thread())
+            return fingerprint(payload)
+
+        monkeypatch.setattr(documentbuilder, "serializeDocument", serializeDocument)
+        monkeypatch.setattr(documentbuilder, "marshalDocument", marshalDocument)
+        monkeypatch.setattr(source_module, "fingerprint", recordingFingerprint)
+        source = Source("my_key", "my_org", fingerprint_store=FingerprintStore(),
+                        batch_options=BatchOptions(marshal_workers=2))
+
+        source.streamBatchUpdate("my_source", documents(10))
+        assert threading.main_thread() not in fingerprintThreads
+        source.addOrUpdateDocument("my_source", DocumentBuilder("https://bar.com", "title"))
+
+        assert serialized == [f"https://foo.com/{i}" for i in range(10)] + ["https://bar.com"]
+        assert len(pools) == 1
+
+    def testFailedUploadResumesWithTheSameFileContainer(self, fileContainerAdapter, requests_mock, pushAdapter):
+        uploadAdapter = requests_mock.put("https://the.upload.uri", [{"status_code": 500}, {"status_code": 200}])
+        source = Source("my_key", "my_org", retry_options=RetryOptions(file_container_upload=RetryPolicy(max_retries=0)))
+
+        with pytest.raises(BatchChunkError) as error:
+            source.streamBatchUpdate("my_source", documents(2))
+        assert error.value.fileContainer.fileId == "the_file_id"
+        assert not error.value.uploaded
+        assert pushAdapter.call_count == 0
+
+        source.resumeBatchChunk("my_source", error.value)
+        assert fileContainerAdapter.call_count == 1
+        assert uploadAdapter.call_count == 2
+        assert pushAdapter.call_count == 1
+
+    def testFailedPushResumesWithoutUploadingAgain(self, fileContainerAdapter, uploadAdapter, requests_mock):
+        pushAdapter = requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id",
+            [{"exc": requests.exceptions.ConnectionError}, {"status_code": 200}])
+        source = Source("my_key", "my_org", retry_options=RetryOptions(file_container_push=RetryPolicy(max_retries=0)))
+
+        with pytest.raises(BatchChunkError) as error:
+            source.streamBatchUpdate("my_source", documents(2))
+        assert error.value.uploaded
+
+        assert source.resumeBatchChunk("my_source", error.value).status_code == 200
+        assert uploadAdapter.call_count == 1
+        assert pushAdapter.call_count == 2
+
+    @pytest.mark.parametrize("maxInFlight", [1, 3])
+    def testFailedStreamResumesWhereItStopped(self, requests_mock, maxInFlight):
+        created = itertools.count()
+        pushes = itertools.count()
+        uploads = {}
+        pushed = []
+        chunks = list(BatchChunker(1024).chunks((docBuilder.serialize() for docBuilder in documents(40)), ()))
+        # The push of the third file container and the upload of the fourth fail once
+        failedUploads = [json.loads(chunks[3].payload)["addOrUpdate"][0]["documentId"]]
+
+        def createFileContainer(request, context):
+            fileId = f"file{next(created)}"
+            return {"uploadUri": f"https://the.upload.uri/{fileId}", "fileId": fileId, "requiredHeaders": {}}
+
+        def upload(request, context):
+            body = json.loads(request.body.read())
+            if body["addOrUpdate"][0]["documentId"] in failedUploads:
+                failedUploads.clear()
+                context.status_code = 500
+                return ""
+            uploads[request.path.rsplit("/", 1)[-1]] = body
+            return ""
+
+        def push(request, context):
+            if next(pushes) == 2:
+                context.status_code = 500
+                return {}
+            pushed.append(request.qs["fileid"][0])
+            return {}
+
+        requests_mock.post("https://api.cloud.coveo.com/push/v1/organizations/my_org/files", json=createFileContainer)
+        requests_mock.put(re.compile("https://the.upload.uri/"), text=upload)
+        requests_mock.put("https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch",
+                          json=push)
+        source = Source("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024, max_in_flight=maxInFlight),
+                        retry_options=RetryOptions(file_container_upload=RetryPolicy(max_retries=0),
+                                                   file_container_push=RetryPolicy(max_retries=0)))
+
+        with pytest.raises(BatchChunkError) as error:
+            source.streamBatchUpdate("my_source", documents(40))
+
+        assert error.value.index == 2
+        assert error.value.uploaded
+        assert len(error.value.responses) == len(pushed) == 2
+        assert [pending.index for pending in error.value.pending] == list(range(3, 2 + maxInFlight))
+        if maxInFlight > 1:
+            # The failed upload of the next file container was in flight too
+            assert not error.value.pending[0].uploaded
+            assert error.value.pending[0].response.status_code == 500
+        else:
+            # The next file container is only uploaded once the stream is resumed
+            with pytest.raises(BatchChunkError) as again:
+                source.resumeBatchUpdate("my_source", error.value)
+            assert again.value.index == 3
+            assert len(again.value.responses) == 3
+            error = again
+
+        responses = source.resumeBatchUpdate("my_source", error.value)
+
+        assert len(responses) == len(pushed) == len(chunks)
+        pushedDocuments = [item["documentId"] for fileId in pushed for item in uploads[fileId]["addOrUpdate"]]
+        assert pushedDocuments == [f"https://foo.com/{i}" for i in range(40)]
+
+    def testDeleteDocuments(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        source = Source("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024))
+        responses = source.deleteDocuments("my_source", (f"https://foo.com/{i}" for i in range(100)), deleteChildren=True)
+
+        bodies = [uploadedBody(request) for request in uploadAdapter.request_history]
+        assert len(responses) == len(bodies) > 1
+        deleted = [delete for body in bodies for delete in body.get("delete")]
+        assert deleted == [{"documentId": f"https://foo.com/{i}", "deleteChildren": True} for i in range(100)]
+        assert all(body.get("addOrUpdate") == [] for body in bodies)
+
+    def testBatchUpdateSecurityIdentities(self, fileContainerAdapter, uploadAdapter, requests_mock):
+        identityAdapter = requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/providers/my_provider/permissions/batch?fileId=the_file_id&orderingId=1234", json={})
+        members = (SecurityIdentityModel(IdentityModel({}, f"user{i}@foo.com", "USER"), [], []) for i in range(50))
+        deleted = [SecurityIdentityDelete(IdentityModel({}, "gone@foo.com", "USER"))]
+        source = Source("my_key", "my_org", batch_options=BatchOptions(max_file_container_size=1024))
+
+        responses = source.batchUpdateSecurityIdentities("my_provider", members, deleted=deleted, orderingId=1234)
+
+        bodies = [uploadedBody(request) for request in uploadAdapter.request_history]
+        assert len(responses) == len(bodies) == identityAdapter.call_count > 1
+        assert [member["identity"]["name"] for body in bodies for member in body.get("members")] == [f"user{i}@foo.com" for i in range(50)]
+        assert [identity["identity"]["name"] for body in bodies for identity in body.get("deleted")] == ["gone@foo.com"]
+        assert all(body.get("mappings") == [] for body in bodies)
+
+    def testFailedSecurityIdentityChunkResumes(self, fileContainerAdapter, uploadAdapter, requests_mock):
+        identityAdapter = requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/providers/my_provider/permissions/batch?fileId=the_file_id&orderingId=1234",
+            [{"status_code": 500}, {"status_code": 200}])
+        source = Source("my_key", "my_org", retry_options=RetryOptions(other=RetryPolicy(max_retries=0)))
+        members = [SecurityIdentityModel(IdentityModel({}, "user@foo.com", "USER"), [], [])]
+
+        with pytest.raises(BatchChunkError) as error:
+            source.batchUpdateSecurityIdentities("my_provider", members, orderingId=1234)
+        assert error.value.uploaded
+
+        assert source.resumeSecurityIdentityChunk("my_provider", error.value, 1234).status_code == 200
+        assert uploadAdapter.call_count == 1
+        assert identityAdapter.call_count == 2
+
+    def testStreamBatchUpdateSkipsUnchangedDocuments(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        source = Source("my_key", "my_org", fingerprint_store=FingerprintStore())
+        source.streamBatchUpdate("my_source", documents(3))
+
+        changed = documents(4)
+        changed[1].withData("changed")
+        source.streamBatchUpdate("my_source", changed)
+
+        secondBody = uploadedBody(uploadAdapter.request_history[1])
+        assert [doc["documentId"] for doc in secondBody.get("addOrUpdate")] == ["https://foo.com/1", "https://foo.com/3"]
+
+    def testStreamBatchUpdateDoesNotPushWhenNothingChanged(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        source = Source("my_key", "my_org", fingerprint_store=FingerprintStore())
+        source.streamBatchUpdate("my_source", documents(3))
+
+        assert source.streamBatchUpdate("my_source", documents(3)) == []
+        assert pushAdapter.call_count == 1
+
+    def testFailedBatchDoesNotRecordFingerprints(self, fileContainerAdapter, uploadAdapter, requests_mock):
+        requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id",
+            [{"status_code": 400}, {"status_code": 200}])
+        source = Source("my_key", "my_org", fingerprint_store=FingerprintStore())
+
+        with pytest.raises(BatchChunkError):
+            source.streamBatchUpdate("my_source", documents(2))
+        source.streamBatchUpdate("my_source", documents(2))
+
+        assert len(uploadedBody(uploadAdapter.request_history[1]).get("addOrUpdate")) == 2
+
+    def testFingerprintsAreRecordedForEveryPushedFileContainer(self, fileContainerAdapter, uploadAdapter,
+                                                                requests_mock):
+        requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id",
+            [{"status_code": 200}, {"status_code": 200}, {"status_code": 400}])
+        store = FingerprintStore()
+        maxSize = documents(1)[0].serializedSize() + 100
+        source = Source("my_key", "my_org", fingerprint_store=store,
+                        batch_options=BatchOptions(max_file_container_size=maxSize),
+                        retry_options=RetryOptions(file_container_push=RetryPolicy(max_retries=0)))
+
+        with pytest.raises(BatchChunkError) as error:
+            source.streamBatchUpdate("my_source", documents(3))
+
+        assert error.value.index == 2
+        fingerprints = [(docBuilder.document.uri, fingerprint(docBuilder.serialize())) for docBuilder in documents(3)]
+        assert store.changed("my_source", fingerprints) == [False, False, True]
+
+    def testFailedDeletesKeepTheirFingerprints(self, fileContainerAdapter, uploadAdapter, requests_mock):
+        requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id",
+            [{"status_code": 200}, {"status_code": 400}])
+        requests_mock.delete("https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents",
+                             status_code=400)
+        store = FingerprintStore()
+        source = Source("my_key", "my_org", fingerprint_store=store)
+        source.streamBatchUpdate("my_source", documents(2))
+
+        assert not source.deleteDocument("my_source", "https://foo.com/0", False).ok
+        with pytest.raises(BatchChunkError):
+            source.deleteDocuments("my_source", ["https://foo.com/1"])
+
+        fingerprints = [(docBuilder.document.uri, fingerprint(docBuilder.serialize())) for docBuilder in documents(2)]
+        assert store.changed("my_source", fingerprints) == [False, False]
+
+    def testSyncDocumentsDeletesDisappearedDocuments(self, fileContainerAdapter, uploadAdapter, pushAdapter):
+        store = FingerprintStore()
+        source = Source("my_key", "my_org", fingerprint_store=store)
+        source.syncDocuments("my_source", documents(3))
+
+        source.syncDocuments("my_source", documents(2), deleteChildren=True)
+
+        secondBody = uploadedBody(uploadAdapter.request_history[1])
+        assert secondBody == {"addOrUpdate": [], "delete": [{"documentId": "https://foo.com/2", "deleteChildren": True}]}
+        assert store.stale("my_source", store.beginRun("my_source")) == ["https://foo.com/0", "https://foo.com/1"]
+
+    def testSyncDocumentsRequiresAFingerprintStore(self):
+        with pytest.raises(Error):
+            Source("my_key", "my_org").syncDocuments("my_source", documents(1))
+
+    def testAddOrUpdateDocumentSkipsUnchangedDocument(self, requests_mock):
+        adapter = requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents?documentId=https://foo.com/0")
+        source = Source("my_key", "my_org", fingerprint_store=FingerprintStore())
+
+        assert source.addOrUpdateDocument("my_source", documents(1)[0]).ok
+        assert source.addOrUpdateDocument("my_source", documents(1)[0]) is None
+        assert adapter.call_count == 1
+
+    def testRebuildSession(self, fileContainerAdapter, uploadAdapter, requests_mock):
+        statusAdapter = requests_mock.post(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status")
+        batchAdapter = requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id&orderingId=1234")
+        documentAdapter = requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents?orderingId=1234")
+        olderThanAdapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/olderthan?orderingId=1234")
+
+        with Source("my_key", "my_org").rebuild("my_source", orderingId=1234) as session:
+            session.streamBatchUpdate(documents(2))
+            session.addOrUpdateDocument(documents(1)[0])
+            assert not olderThanAdapter.called
+
+        assert [request.qs["statustype"] for request in statusAdapter.request_history] == [["rebuild"], ["idle"]]
+        assert batchAdapter.called_once and documentAdapter.called_once and olderThanAdapter.called_once
+
+    def testFailedRebuildSessionDoesNotDeleteOlderDocuments(self, requests_mock):
+        statusAdapter = requests_mock.post(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status")
+        olderThanAdapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/olderthan")
+
+        with pytest.raises(RuntimeError):
+            with Source("my_key", "my_org").rebuild("my_source"):
+                raise RuntimeError("crawl failed")
+
+        assert not olderThanAdapter.called
+        assert statusAdapter.last_request.qs["statustype"] == ["idle"]
+
+    @pytest.mark.parametrize("batch", [False, True])
+    def testRebuildSessionWithFailedPushDoesNotDeleteOlderDocuments(self, fileContainerAdapter, uploadAdapter,
+                                                                     requests_mock, batch):
+        statusAdapter = requests_mock.post(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status")
+        requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch", status_code=500)
+        requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents", status_code=500)
+        olderThanAdapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/olderthan")
+        source = Source("my_key", "my_org", retry_options=RetryOptions(documents=RetryPolicy(max_retries=0),
+                                                                       file_container_push=RetryPolicy(max_retries=0)))
+
+        with pytest.raises(Error):
+            with source.rebuild("my_source") as session:
+                if batch:
+                    with pytest.raises(BatchChunkError):
+                        session.streamBatchUpdate(documents(2))
+                else:
+                    assert session.addOrUpdateDocument(documents(1)[0]).status_code == 500
+                assert len(session.failures) == 1
+
+        assert not olderThanAdapter.called
+        assert statusAdapter.last_request.qs["statustype"] == ["idle"]
+
+    @pytest.mark.parametrize("batch", [False, True])
+    def testRebuildSessionWithCaughtExceptionDoesNotDeleteOlderDocuments(self, requests_mock, batch):
+        statusAdapter = requests_mock.post(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status")
+        requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents",
+            exc=requests.ConnectionError)
+        olderThanAdapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/olderthan")
+        source = Source("my_key", "my_org", retry_options=RetryOptions(documents=RetryPolicy(max_retries=0)))
+
+        def failingDocuments():
+            raise RuntimeError("crawl failed")
+            yield
+
+        with pytest.raises(Error):
+            with source.rebuild("my_source") as session:
+                try:
+                    if batch:
+                        session.streamBatchUpdate(failingDocuments())
+                    else:
+                        session.addOrUpdateDocument(documents(1)[0])
+                except (requests.ConnectionError, RuntimeError):
+                    pass
+                assert len(session.failures) == 1
+
+        assert not olderThanAdapter.called
+        assert statusAdapter.last_request.qs["statustype"] == ["idle"]
+
+    def testResumedRebuildSessionDeletesOlderDocuments(self, fileContainerAdapter, uploadAdapter, requests_mock):
+        requests_mock.post("https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status")
+        requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch",
+            [{"status_code": 500}, {"status_code": 200}])
+        olderThanAdapter = requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/olderthan")
+        source = Source("my_key", "my_org", retry_options=RetryOptions(file_container_push=RetryPolicy(max_retries=0)))
+
+        with source.rebuild("my_source") as session:
+            with pytest.raises(BatchChunkError) as error:
+                session.streamBatchUpdate(documents(2))
+            assert len(session.resumeBatchUpdate(error.value)) == 1
+            assert session.failures == []
+
+        assert olderThanAdapter.called_once
+
+    @pytest.mark.parametrize("failedStatus", ["rebuild", "idle"])
+    def testRebuildSessionRaisesWhenTheStatusIsNotUpdated(self, requests_mock, failedStatus):
+        requests_mock.post("https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status",
+                           additional_matcher=lambda request: request.qs["statustype"] == [failedStatus],
+                           status_code=400)
+        requests_mock.post("https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status",
+                           additional_matcher=lambda request: request.qs["statustype"] != [failedStatus])
+        requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/olderthan")
+
+        with pytest.raises(Error, match=failedStatus.upper()):
+            with Source("my_key", "my_org").rebuild("my_source"):
+                pass
+
+    def testRebuildSessionRaisesWhenOlderDocumentsAreNotDeleted(self, requests_mock):
+        statusAdapter = requests_mock.post(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/status")
+        requests_mock.delete(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/olderthan",
+            status_code=400)
+
+        with pytest.raises(Error, match="older documents"):
+            with Source("my_key", "my_org").rebuild("my_source"):
+                pass
+
+        assert statusAdapter.last_request.qs["statustype"] == ["idle"]
+
+    def testRebuildSessionsHaveIncreasingOrderingIds(self):
+        source = Source("my_key", "my_org")
+        assert source.rebuild("my_source").orderingId < source.rebuild("my_source").orderingId
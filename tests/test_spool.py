@@ -0,0 +1,85 @@
+import json
+import os
+import pytest
+from push_api_clientpy import BatchChunkError, DocumentBuilder, Error, Source, Spool, SpoolOptions
+
+
+@pytest.fixture
+def fileContainerAdapter(requests_mock):
+    return requests_mock.post(
+        "https://api.cloud.coveo.com/push/v1/organizations/my_org/files",
+        json={"uploadUri": "https://the.upload.uri", "fileId": "the_file_id", "requiredHeaders": {"foo": "bar"}})
+
+
+@pytest.fixture
+def uploadAdapter(requests_mock):
+    return requests_mock.put("https://the.upload.uri")
+
+
+@pytest.fixture
+def pushAdapter(requests_mock):
+    return requests_mock.put(
+        "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id", json={})
+
+
+def uploadedBodies(uploadAdapter):
+    return [json.loads(request.body.read()) for request in uploadAdapter.request_history]
+
+
+def document(i):
+    return DocumentBuilder(f"https://foo.com/{i}", f"title {i}").withData("x" * 100)
+
+
+class TestSpool:
+
+    def testShipsOneFileContainerPerSegment(self, tmp_path, fileContainerAdapter, uploadAdapter, pushAdapter):
+        with Spool(Source("my_key", "my_org"), "my_source", str(tmp_path), SpoolOptions(max_segment_size=1024, fsync=False)) as spool:
+            for i in range(20):
+                spool.addOrUpdate(document(i))
+            spool.delete("https://foo.com/old", deleteChildren=True)
+
+        bodies = uploadedBodies(uploadAdapter)
+        assert len(bodies) == pushAdapter.call_count > 1
+        assert [doc["documentId"] for body in bodies for doc in body["addOrUpdate"]] == [f"https://foo.com/{i}" for i in range(20)]
+        assert bodies[-1]["delete"] == [{"documentId": "https://foo.com/old", "deleteChildren": True}]
+        assert sorted(os.listdir(tmp_path)) == ["checkpoint"]
+
+    def testAddAfterDeleteStartsANewSegment(self, tmp_path, fileContainerAdapter, uploadAdapter, pushAdapter):
+        with Spool(Source("my_key", "my_org"), "my_source", str(tmp_path), SpoolOptions(fsync=False)) as spool:
+            spool.delete("https://foo.com/0")
+            spool.addOrUpdate(document(0))
+
+        assert [(len(body["addOrUpdate"]), len(body["delete"])) for body in uploadedBodies(uploadAdapter)] == [(0, 1), (1, 0)]
+
+    def testShipsSegmentsLeftByAProcessThatDied(self, tmp_path, fileContainerAdapter, uploadAdapter, pushAdapter):
+        (tmp_path / "checkpoint").write_text("3")
+        (tmp_path / "segment-00000003.ready").write_bytes(b'a{"documentId":"acknowledged"}\n')
+        (tmp_path / "segment-00000004.ready").write_bytes(b'a{"documentId":"sealed"}\n')
+        (tmp_path / "segment-00000005.open").write_bytes(b'a{"documentId":"written"}\na{"documentId":"trunc')
+
+        with Spool(Source("my_key", "my_org"), "my_source", str(tmp_path), SpoolOptions(fsync=False)) as spool:
+            spool.addOrUpdate(document(0))
+
+        assert [[doc["documentId"] for doc in body["addOrUpdate"]] for body in uploadedBodies(uploadAdapter)] == [
+            ["sealed"], ["written"], ["https://foo.com/0"]]
+        assert (tmp_path / "checkpoint").read_text() == "6"
+
+    def testFailedSegmentIsKeptForTheNextSpool(self, tmp_path, fileContainerAdapter, uploadAdapter, requests_mock):
+        requests_mock.put(
+            "https://api.cloud.coveo.com/push/v1/organizations/my_org/sources/my_source/documents/batch?fileId=the_file_id",
+            [{"status_code": 400}, {"status_code": 200}])
+
+        spool = Spool(Source("my_key", "my_org"), "my_source", str(tmp_path), SpoolOptions(fsync=False))
+        spool.addOrUpdate(document(0))
+        with pytest.raises(BatchChunkError):
+            spool.close()
+        assert os.listdir(tmp_path) == ["segment-00000000.ready"]
+
+        Spool(Source("my_key", "my_org"), "my_source", str(tmp_path), SpoolOptions(fsync=False)).close()
+        assert uploadAdapter.call_count == 2
+        assert os.listdir(tmp_path) == ["checkpoint"]
+
+    def testItemLargerThanASegmentRaises(self, tmp_path):
+        with Spool(Source("my_key", "my_org"), "my_source", str(tmp_path), SpoolOptions(max_segment_size=100)) as spool:
+            with pytest.raises(Error):
+                spool.addOrUpdate(document(0))